@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 import os
+import time
+import uuid
 import folium
 from streamlit_folium import st_folium
+from nucleo import agrupamento, banco, consulta, exportacao, instrumentacao, mapa, paginacao
 
 # Configuração da página
 logo_icon_path = os.path.join(os.path.dirname(__file__), "image", "app", "Logo.png")
@@ -13,89 +16,354 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Instrumentação do rerun: tempo das etapas, tamanhos dos payloads e uso dos caches
+# (log JSON com SIOUT_LOG_RERUNS; painel na barra lateral com ?depuracao=1 ou SIOUT_DEPURACAO=1)
+if 'id_sessao' not in st.session_state:
+    st.session_state.id_sessao = uuid.uuid4().hex[:12]
+medicao = instrumentacao.MedicaoRerun(st.session_state.id_sessao)
+painel_depuracao = instrumentacao.DEPURACAO or st.query_params.get("depuracao") == "1"
+
 # Título principal
 st.markdown("<h1 style='text-align: center;'>Ferramenta de Comparação de Registros - SNISB vs SIOUT-RS</h1>", unsafe_allow_html=True)
 st.markdown("---")
 
-# Função para formatar texto para exibição
-def formatar_texto_exibicao(texto):
-    """Formata texto para exibição amigável nos filtros"""
-    if pd.isna(texto):
-        return texto
-    
-    texto_str = str(texto)
-    
-    # Mapeamento de textos específicos
-    mapeamento = {
-        'forte_inidicio_agua_satelite': 'Forte Indício de Água (Satélite)',
-        'compatível com polígono ana': 'Compatível com Polígono ANA',
-        'totalmente compatível': 'Totalmente Compatível',
-        'compatível parcialmente': 'Compatível Parcialmente',
-        'compatível apenas geograficamente': 'Compatível Apenas Geograficamente',
-        'incompatível': 'Incompatível',
-        'não aplicado': 'Não Aplicado'
-    }
-    
-    texto_lower = texto_str.lower()
-    if texto_lower in mapeamento:
-        return mapeamento[texto_lower]
-    
-    # Substituir underscores por espaços e capitalizar
-    texto_formatado = texto_str.replace('_', ' ').title()
-    return texto_formatado
-
 # Função para carregar os dados com cache
-@st.cache_data
+# (cache_resource: a fonte é compartilhada, sem cópia serializada a cada rerun)
+@st.cache_resource
 def carregar_dados():
-    """Carrega o arquivo de dados CSV e retorna um DataFrame otimizado"""
+    """Carrega o snapshot colunar dos dados (convertendo o CSV/XLSX se necessário) e retorna a fonte de dados"""
     try:
-        csv_path = os.path.join(os.path.dirname(__file__), "RELATORIO_FINAL_SNISB_SIOUT.csv")
-        
-        if not os.path.exists(csv_path):
-            st.error("Arquivo de dados não encontrado. Procure por RELATORIO_FINAL_SNISB_SIOUT.csv na pasta do aplicativo.")
-            return None
-        
         # Configurar pandas para não truncar strings longas
         pd.set_option('display.max_colwidth', None)
         
-        # Carregar CSV com tipos específicos para otimizar memória
-        dtype_dict = {
-            'POLIGONO_ANA': str,
-            'CODIGO_SNISB': str,
-            'CODIGO_BARRAGEM_ENTIDADE': str,
-            'AUTORIZACAO_NUM': str,
-            'AUTORIZACAO_SIOUT': str
+        # Converter a origem em snapshot Arrow apenas quando o hash do arquivo mudar e
+        # ler a tabela de atributos via memory-map (POLIGONO_ANA fica no armazém de geometrias).
+        # Se o arquivo for substituído, a fonte aplica só as linhas alteradas (ver fonte.atual())
+        return consulta.carregar()
+        
+    except FileNotFoundError:
+        st.error("Arquivo de dados não encontrado. Procure por RELATORIO_FINAL_SNISB_SIOUT.csv na pasta do aplicativo.")
+        return None
+    except Exception as e:
+        st.error(f"Erro ao carregar os dados: {e}")
+        return None
+
+# Backend opcional em banco (SIOUT_URL_BANCO): filtros e páginas resolvidos em SQL, com pool de conexões
+@st.cache_resource
+def conectar_banco():
+    """Retorna as consultas no banco configurado, ou None sem banco"""
+    if not banco.URL_BANCO:
+        return None
+    try:
+        return banco.ConsultaSQL(banco.criar_engine())
+    except Exception as e:
+        st.warning(f"Banco de dados indisponível, usando a base em memória: {e}")
+        return None
+
+# Função auxiliar para obter opções de filtro do catálogo (montado uma vez por versão dos dados)
+def gerar_opcoes_filtro(base, coluna):
+    """Retorna as opções únicas de um filtro a partir do catálogo da base"""
+    opcoes = base.catalogo.get(coluna)
+    return opcoes.valores if opcoes is not None else []
+
+# Configuração das colunas da tabela (montada uma vez por conjunto de colunas)
+@st.cache_resource
+def configuracao_colunas(colunas):
+    """Retorna o column_config da tabela paginada"""
+    return {col: st.column_config.TextColumn(width="medium") for col in colunas}
+
+# Fragmentos da página (reexecutados sozinhos quando os próprios widgets mudam). A sessão guarda
+# apenas a especificação dos filtros (e página e visão do mapa); dados, posições das linhas,
+# páginas e payloads ficam uma única vez no processo, nos caches compartilhados da base
+def ir_para_pagina(numero):
+    """Callback dos botões de paginação (executado antes do rerun do fragmento da tabela)"""
+    st.session_state.pagina_atual = numero
+
+def resultado_da_sessao():
+    """Resultado dos filtros da sessão, resolvido nos caches compartilhados (a sessão guarda só a especificação)"""
+    fonte_dados = carregar_dados()
+    return consulta.aplicar_filtros(fonte_dados.base, st.session_state.especificacao_filtros, conectar_banco())
+
+@st.fragment
+def secao_tabela():
+    """Tabela paginada do resultado dos filtros, com os controles de paginação"""
+    resultado = resultado_da_sessao()
+    with instrumentacao.medicao_fragmento(medicao, "tabela", resultado.base.caches) as medicao_tabela:
+        total_paginas = resultado.total_paginas()
+        
+        # Inicializar página atual no session_state (e ajustá-la se o filtro reduziu o total de páginas)
+        if 'pagina_atual' not in st.session_state:
+            st.session_state.pagina_atual = 1
+        st.session_state.pagina_atual = paginacao.limitar_pagina(st.session_state.pagina_atual, total_paginas)
+        
+        # Obter apenas as linhas da página atual, já com WKT e estilos de status
+        # (páginas vizinhas são preparadas em segundo plano)
+        with medicao_tabela.etapa("pagina"):
+            pagina_tabela = consulta.paginar(resultado, st.session_state.pagina_atual)
+        with medicao_tabela.etapa("tabela"):
+            st.dataframe(
+                consulta.estilizar(pagina_tabela),
+                width='stretch',
+                height=600,
+                column_config=configuracao_colunas(tuple(pagina_tabela.dados.columns))
+            )
+        
+        # Controles de paginação abaixo da tabela (próximo ao dataset)
+        paginas_visiveis = paginacao.paginas_visiveis(st.session_state.pagina_atual, total_paginas)
+        
+        # Estilo CSS para os botões de paginação
+        st.markdown("""
+        <style>
+        /* Botões de paginação - Secondary */
+        div[data-testid="column"] button[kind="secondary"] {
+            background-color: #f8f9fa !important;
+            color: #495057 !important;
+            border: 1px solid #dee2e6 !important;
+            padding: 0.25rem 0.5rem !important;
+            font-size: 0.875rem !important;
+            height: 2rem !important;
         }
         
-        df = pd.read_csv(
-            csv_path, 
-            dtype=dtype_dict, 
-            encoding='utf-8-sig',
-            parse_dates=['DATA_DO_CADASTRO']
-        )
+        /* Botões de paginação - Primary (página selecionada) */
+        button[kind="primary"], div[data-testid="column"] button[kind="primary"] {
+            background-color: #cfe2ff !important;
+            color: #084298 !important;
+            border: 1px solid #9ec5fe !important;
+            padding: 0.25rem 0.5rem !important;
+            font-size: 0.875rem !important;
+            font-weight: 600 !important;
+            height: 2rem !important;
+        }
         
-        return df
+        button[kind="primary"]:hover {
+            background-color: #b6d4fe !important;
+            color: #052c65 !important;
+        }
         
-    except Exception as e:
-        st.error(f"Erro ao carregar o arquivo CSV: {e}")
-        return None
+        .stButton button[kind="primary"] p {
+            color: #084298 !important;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+        
+        # Criar colunas centralizadas para os botões de paginação
+        total_botoes = len(paginas_visiveis) + 2  # +2 para botões anterior/próximo
+        espaco_lateral = (10 - total_botoes) / 2 if total_botoes < 10 else 0.5
+        
+        colunas_layout = [espaco_lateral] + [0.5] + [0.8] * len(paginas_visiveis) + [0.5] + [espaco_lateral]
+        colunas = st.columns(colunas_layout)
+        
+        col_offset = 1  # Começar após o espaço lateral
+        
+        # Botão Anterior
+        with colunas[col_offset]:
+            st.button(
+                "◀",
+                key="prev",
+                disabled=(st.session_state.pagina_atual == 1),
+                use_container_width=True,
+                on_click=ir_para_pagina,
+                args=(st.session_state.pagina_atual - 1,)
+            )
+        
+        # Botões de número de página
+        for idx, pagina in enumerate(paginas_visiveis, start=1):
+            with colunas[col_offset + idx]:
+                if pagina == '...':
+                    st.markdown("<p style='text-align: center; margin-top: 0.25rem;'>...</p>", unsafe_allow_html=True)
+                else:
+                    st.button(
+                        str(pagina),
+                        key=f"page_{pagina}",
+                        type="primary" if pagina == st.session_state.pagina_atual else "secondary",
+                        use_container_width=True,
+                        on_click=ir_para_pagina,
+                        args=(pagina,)
+                    )
+        
+        # Botão Próximo
+        with colunas[col_offset + len(paginas_visiveis) + 1]:
+            st.button(
+                "▶",
+                key="next",
+                disabled=(st.session_state.pagina_atual == total_paginas),
+                use_container_width=True,
+                on_click=ir_para_pagina,
+                args=(st.session_state.pagina_atual + 1,)
+            )
 
-# Função auxiliar para gerar opções de filtro com cache
-@st.cache_data
-def gerar_opcoes_filtro(_df, coluna):
-    """Gera opções únicas para filtros com cache"""
-    if coluna not in _df.columns:
-        return []
-    return sorted(_df[coluna].dropna().unique().tolist())
+@st.fragment
+def secao_exportacao():
+    """Botão de download com as opções de formato e de polígonos"""
+    resultado = resultado_da_sessao()
+    tem_filtros = len(resultado.especificacao.ativos) > 0
+    with instrumentacao.medicao_fragmento(medicao, "exportacao", resultado.base.caches):
+        # Botão de download abaixo da paginação
+        st.markdown("")
+        
+        col1, col2, col3 = st.columns([1, 1, 1])
+        
+        with col2:
+            # Texto do botão
+            texto_botao = "Baixar Dados Filtrados" if tem_filtros else "Baixar Todos os Dados"
+            
+            # Usar popover para mostrar opções de formato
+            with st.popover(texto_botao, use_container_width=True):
+                st.markdown("**Escolha o formato do arquivo:**")
+                
+                timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
+                prefixo = "dados_filtrados" if tem_filtros else "dados_completos"
+                
+                # Tratamento da coluna POLIGONO_ANA (WKT), a mais pesada do arquivo
+                opcoes_poligonos = {
+                    "Completos": exportacao.POLIGONOS_COMPLETOS,
+                    "Truncados (limite do Excel)": exportacao.POLIGONOS_TRUNCADOS,
+                    "Não incluir": exportacao.POLIGONOS_OMITIDOS
+                }
+                opcao_poligonos = st.radio(
+                    "Polígonos ANA (WKT)",
+                    list(opcoes_poligonos.keys()),
+                    horizontal=True,
+                    key="exportacao_poligonos"
+                )
+                poligonos = opcoes_poligonos[opcao_poligonos]
+                
+                # Um botão por formato; o arquivo só é gerado quando o botão é clicado,
+                # escrito em lotes em disco e memorizado por estado de filtros, formato e polígonos
+                def gerar_exportacao(formato, sessao=st.session_state.id_sessao):
+                    """Conteúdo do arquivo exportado (lido e fechado), com o tempo e o tamanho registrados na instrumentação"""
+                    inicio = time.perf_counter()
+                    arquivo, conteudo = consulta.ler_exportacao(resultado, formato, poligonos)
+                    instrumentacao.registrar_exportacao(
+                        sessao, formato, time.perf_counter() - inicio, arquivo.nbytes,
+                        linhas=resultado.total, poligonos=poligonos
+                    )
+                    return conteudo
+                
+                for formato, (rotulo, mime) in exportacao.FORMATOS.items():
+                    st.download_button(
+                        label=rotulo,
+                        data=lambda formato=formato: gerar_exportacao(formato),
+                        file_name=f"{prefixo}_{timestamp}.{formato}",
+                        mime=mime,
+                        use_container_width=True,
+                        key=f"download_{formato}",
+                        # Baixar não muda nada na página: sem rerun
+                        on_click="ignore"
+                    )
 
-# Carregar os dados
-df = carregar_dados()
+@st.fragment
+def secao_mapa():
+    """Mapa das barragens filtradas; zoom e arraste reexecutam só este fragmento"""
+    resultado = resultado_da_sessao()
+    with instrumentacao.medicao_fragmento(medicao, "mapa", resultado.base.caches) as medicao_mapa:
+        # Adicionar CSS para o spinner de carregamento
+        st.markdown("""
+        <style>
+        @keyframes spin {
+            0% { transform: rotate(0deg); }
+            100% { transform: rotate(360deg); }
+        }
+        .loading-spinner {
+            text-align: center;
+            padding: 40px;
+        }
+        .loading-spinner::after {
+            content: "";
+            display: inline-block;
+            width: 40px;
+            height: 40px;
+            border: 4px solid #f3f3f3;
+            border-top: 4px solid #3498db;
+            border-radius: 50%;
+            animation: spin 1s linear infinite;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+        
+        # Mostrar spinner de carregamento
+        loading_placeholder = st.empty()
+        loading_placeholder.markdown('<div class="loading-spinner"></div>', unsafe_allow_html=True)
+        
+        # Verificar se existem colunas de latitude e longitude
+        tem_coordenadas = 'LATITUDE' in resultado.base.tabela.columns and 'LONGITUDE' in resultado.base.tabela.columns
+        
+        if tem_coordenadas:
+            # Última visão do mapa (zoom, centro e limites devolvidos pelo st_folium),
+            # descartada quando os filtros mudam para o mapa voltar a enquadrar os dados
+            estado_filtros = resultado.especificacao.chave(resultado.base.versao)
+            if st.session_state.get('mapa_filtros') != estado_filtros:
+                st.session_state.mapa_filtros = estado_filtros
+                st.session_state.pop('mapa_barragens', None)
+            visao_mapa = st.session_state.get('mapa_barragens') or {}
+            
+            # Mapa Folium das barragens filtradas com coordenadas válidas (polígonos ANA e pontos
+            # agrupados para o zoom e a área visível, ou tiles vetoriais da versão dos dados)
+            with st.spinner('Carregando polígonos ANA e pontos das barragens...'), medicao_mapa.etapa("mapa"):
+                mapa_montado = mapa.montar_mapa(
+                    resultado,
+                    visao_mapa.get('zoom'),
+                    agrupamento.limites_leaflet(visao_mapa.get('bounds'))
+                )
+            if mapa_montado is not None and mapa_montado.payload is not None:
+                medicao_mapa.registrar_bytes("payload_mapa", mapa_montado.payload.nbytes)
+            
+            if mapa_montado is not None:
+                # Remover spinner e exibir mapa
+                loading_placeholder.empty()
+                centro_mapa = visao_mapa.get('center')
+                if painel_depuracao:
+                    # HTML do mapa renderizado à parte (custo extra só com o painel aberto)
+                    medicao_mapa.registrar_bytes("html_mapa", len(mapa_montado.mapa.get_root().render()))
+                inicio_st_folium = time.perf_counter()
+                st_folium(
+                    mapa_montado.mapa,
+                    key='mapa_barragens',
+                    width=None,
+                    height=650,
+                    returned_objects=['zoom', 'center', 'bounds'],
+                    zoom=visao_mapa.get('zoom'),
+                    center=(centro_mapa['lat'], centro_mapa['lng']) if centro_mapa else None,
+                    feature_group_to_add=mapa_montado.grupos_dinamicos or None,
+                    # Controle de camadas (permite ligar/desligar sem recarregar)
+                    layer_control=folium.LayerControl(position='topright', collapsed=False)
+                )
+                medicao_mapa.registrar_etapa("st_folium", time.perf_counter() - inicio_st_folium)
+            else:
+                st.info("Nenhuma coordenada válida encontrada nos dados filtrados.")
+        else:
+            st.info("Colunas LATITUDE e LONGITUDE não encontradas no dataset.")
+
+# Carregar os dados (versão vigente da origem; os caches da base são por versão)
+with medicao.etapa("carregar"):
+    fonte = carregar_dados()
+    base = None
+    if fonte is not None:
+        try:
+            base = fonte.atual()
+        except Exception as e:
+            # Origem sendo substituída ou inválida: continua com a versão já carregada
+            st.warning(f"Não foi possível atualizar os dados: {e}")
+            base = fonte.base
+df = base.tabela if base is not None else None
+if base is not None:
+    medicao.acompanhar_caches(base.caches)
+
+if base is not None:
+    if st.session_state.get('versao_dados') not in (None, base.versao) and fonte.ultimo_delta is not None:
+        resumo = fonte.ultimo_delta.resumo()
+        st.toast(
+            f"Dados atualizados: {resumo['inseridas']} inseridos, "
+            f"{resumo['atualizadas']} alterados, {resumo['removidas']} removidos"
+        )
+    st.session_state.versao_dados = base.versao
 
 if df is not None:
     # Tabs para diferentes visualizações
     tab1, tab2 = st.tabs(["Visualizar Dados", "Ajuda/Glossário"])
     
     with tab1:
+        inicio_filtros = time.perf_counter()
         st.markdown("<h3 style='text-align: center;'>Filtros de Dados</h3>", unsafe_allow_html=True)
         st.markdown("")
         
@@ -104,9 +372,10 @@ if df is not None:
         col_data1, col_data2, col_data3 = st.columns([1, 1, 1])
         
         # Obter limites de data
-        if 'DATA_DO_CADASTRO' in df.columns:
-            data_min = pd.to_datetime(df['DATA_DO_CADASTRO'].min()).date()
-            data_max = pd.to_datetime(df['DATA_DO_CADASTRO'].max()).date()
+        periodo = None
+        limites_datas = consulta.limites_datas(base)
+        if limites_datas is not None:
+            data_min, data_max = limites_datas
             
             with col_data2:
                 col_inicio, col_fim = st.columns(2)
@@ -129,6 +398,7 @@ if df is not None:
                         format="DD/MM/YYYY",
                         label_visibility="visible"
                     )
+            periodo = (data_inicio, data_fim)
         
         st.markdown("")
         
@@ -137,7 +407,7 @@ if df is not None:
         
         with col_fis1:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Situação Cadastro SNISB</small></p>", unsafe_allow_html=True)
-            opcoes_cadastro = gerar_opcoes_filtro(df, 'SITUACAO_CADASTRO_SNISB')
+            opcoes_cadastro = gerar_opcoes_filtro(base, 'SITUACAO_CADASTRO_SNISB')
             filtro_cadastro = st.multiselect(
                 "Situação Cadastro SNISB",
                 opcoes_cadastro,
@@ -148,47 +418,43 @@ if df is not None:
         
         with col_fis2:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Situação Massa D'água</small></p>", unsafe_allow_html=True)
-            if 'SITUACAO_MASSA_DAGUA' in df.columns:
-                opcoes_massa_raw = sorted(df['SITUACAO_MASSA_DAGUA'].dropna().unique().tolist())
-                # Criar mapeamento de exibição para valores reais
-                opcoes_massa_dict = {formatar_texto_exibicao(opt): opt for opt in opcoes_massa_raw}
-                opcoes_massa_display = list(opcoes_massa_dict.keys())
+            if 'SITUACAO_MASSA_DAGUA' in base.catalogo:
+                # Opções com texto de exibição e mapeamento para valores reais (do catálogo)
+                opcoes_massa = base.catalogo['SITUACAO_MASSA_DAGUA']
                 
                 filtro_massa_display = st.multiselect(
                     "Situação Massa D'água",
-                    opcoes_massa_display,
+                    opcoes_massa.exibicao,
                     default=[],
                     label_visibility="collapsed",
                     placeholder="Selecione..."
                 )
                 # Converter de volta para valores reais
-                filtro_massa = [opcoes_massa_dict[opt] for opt in filtro_massa_display]
+                filtro_massa = opcoes_massa.valores_de(filtro_massa_display)
             else:
                 filtro_massa = []
         
         with col_fis3:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Situação Comparação SIOUT</small></p>", unsafe_allow_html=True)
-            if 'SITUACAO_COMPARACAO_SIOUT' in df.columns:
-                opcoes_comparacao_raw = sorted(df['SITUACAO_COMPARACAO_SIOUT'].dropna().unique().tolist())
-                # Criar mapeamento de exibição para valores reais
-                opcoes_comparacao_dict = {formatar_texto_exibicao(opt): opt for opt in opcoes_comparacao_raw}
-                opcoes_comparacao_display = list(opcoes_comparacao_dict.keys())
+            if 'SITUACAO_COMPARACAO_SIOUT' in base.catalogo:
+                # Opções com texto de exibição e mapeamento para valores reais (do catálogo)
+                opcoes_comparacao = base.catalogo['SITUACAO_COMPARACAO_SIOUT']
                 
                 filtro_comparacao_display = st.multiselect(
                     "Situação Comparação SIOUT",
-                    opcoes_comparacao_display,
+                    opcoes_comparacao.exibicao,
                     default=[],
                     label_visibility="collapsed",
                     placeholder="Selecione..."
                 )
                 # Converter de volta para valores reais
-                filtro_comparacao = [opcoes_comparacao_dict[opt] for opt in filtro_comparacao_display]
+                filtro_comparacao = opcoes_comparacao.valores_de(filtro_comparacao_display)
             else:
                 filtro_comparacao = []
         
         with col_fis4:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Código SNISB</small></p>", unsafe_allow_html=True)
-            codigos_unicos = gerar_opcoes_filtro(df, 'CODIGO_SNISB')
+            codigos_unicos = gerar_opcoes_filtro(base, 'CODIGO_SNISB')
             filtro_codigo = st.multiselect(
                 "Código SNISB",
                 codigos_unicos,
@@ -205,7 +471,7 @@ if df is not None:
         
         with col_uso1:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Finalidade de Uso (SNISB)</small></p>", unsafe_allow_html=True)
-            opcoes_uso = gerar_opcoes_filtro(df, 'USO_SNISB')
+            opcoes_uso = gerar_opcoes_filtro(base, 'USO_SNISB')
             filtro_uso = st.multiselect(
                 "Finalidade de Uso",
                 opcoes_uso,
@@ -217,7 +483,7 @@ if df is not None:
         
         with col_uso2:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Número de Autorização</small></p>", unsafe_allow_html=True)
-            opcoes_autorizacao = gerar_opcoes_filtro(df, 'AUTORIZACAO_NUM')
+            opcoes_autorizacao = gerar_opcoes_filtro(base, 'AUTORIZACAO_NUM')
             filtro_autorizacao = st.multiselect(
                 "Número de Autorização",
                 opcoes_autorizacao,
@@ -229,7 +495,7 @@ if df is not None:
         
         with col_uso3:
             st.markdown("<p style='text-align: center; margin-bottom: 0;'><small>Empreendedor</small></p>", unsafe_allow_html=True)
-            empreendedores_unicos = gerar_opcoes_filtro(df, 'EMPREENDEDOR_SNISB')
+            empreendedores_unicos = gerar_opcoes_filtro(base, 'EMPREENDEDOR_SNISB')
             filtro_empreendedor = st.multiselect(
                 "Empreendedor",
                 empreendedores_unicos,
@@ -239,26 +505,9 @@ if df is not None:
                 key="filtro_empreendedor_snisb"
             ) if empreendedores_unicos else []
         
-        # Aplicar os filtros
-        df_filtrado = df.copy()
-        filtros_ativos = []
-        
-        # Filtro de data
-        if 'DATA_DO_CADASTRO' in df.columns:
-            data_inicio_dt = pd.to_datetime(data_inicio)
-            data_fim_dt = pd.to_datetime(data_fim)
-            data_min_dt = pd.to_datetime(data_min)
-            data_max_dt = pd.to_datetime(data_max)
-            
-            if data_inicio_dt > data_min_dt or data_fim_dt < data_max_dt:
-                df_filtrado = df_filtrado[
-                    (df_filtrado['DATA_DO_CADASTRO'] >= data_inicio_dt) & 
-                    (df_filtrado['DATA_DO_CADASTRO'] <= data_fim_dt)
-                ]
-                filtros_ativos.append('DATA_DO_CADASTRO')
-        
-        # Dicionário de filtros para aplicação dinâmica
-        filtros = {
+        # Especificação dos filtros (valores por coluna e período; o período só conta se for mais
+        # estreito que o dos dados)
+        especificacao = consulta.especificar(base, {
             'CODIGO_SNISB': filtro_codigo,
             'SITUACAO_CADASTRO_SNISB': filtro_cadastro,
             'SITUACAO_MASSA_DAGUA': filtro_massa,
@@ -266,481 +515,41 @@ if df is not None:
             'USO_SNISB': filtro_uso,
             'AUTORIZACAO_NUM': filtro_autorizacao,
             'EMPREENDEDOR_SNISB': filtro_empreendedor
-        }
-        
-        # Aplicar filtros dinamicamente
-        for coluna, valores in filtros.items():
-            if valores and coluna in df_filtrado.columns:
-                if coluna in ['CODIGO_SNISB', 'AUTORIZACAO_NUM', 'EMPREENDEDOR_SNISB']:
-                    df_filtrado = df_filtrado[df_filtrado[coluna].astype(str).isin(valores)]
-                else:
-                    df_filtrado = df_filtrado[df_filtrado[coluna].isin(valores)]
-                filtros_ativos.append(coluna)
+        }, periodo)
+        
+        # Resolver todos os filtros no índice invertido (OU dentro de cada filtro, E entre filtros),
+        # reaproveitando resultados já calculados para o mesmo estado de filtros. O resultado são
+        # apenas as posições das linhas; tabela e mapa buscam somente o que exibem
+        # Com o banco publicado na mesma versão dos dados, filtros e páginas são consultados nele
+        medicao.registrar_etapa("barra_filtros", time.perf_counter() - inicio_filtros)
+        with medicao.etapa("filtrar"):
+            resultado = consulta.aplicar_filtros(base, especificacao, conectar_banco())
+        total_filtrado = resultado.total
+        # Especificação compartilhada com os fragmentos da tabela, da exportação e do mapa, que
+        # reobtêm as posições do cache (a sessão não guarda cópias de dados)
+        st.session_state.especificacao_filtros = especificacao
         
         # Definir texto baseado se há filtros ativos
-        tem_filtros = len(filtros_ativos) > 0
+        tem_filtros = len(especificacao.ativos) > 0
         titulo_tabela = "Dados Filtrados" if tem_filtros else "Tabela Completa"
         
         # Mostrar contador de registros filtrados
-        st.markdown(f"<p style='text-align: center;'>Mostrando <strong>{len(df_filtrado):,}</strong> registros de um total de <strong>{len(df):,}</strong></p>", unsafe_allow_html=True)
+        st.markdown(f"<p style='text-align: center;'>Mostrando <strong>{total_filtrado:,}</strong> registros de um total de <strong>{len(df):,}</strong></p>", unsafe_allow_html=True)
         
         st.markdown("---")
         st.markdown(f"<h3 style='text-align: center;'>{titulo_tabela}</h3>", unsafe_allow_html=True)
         
-        if len(df_filtrado) > 0:
-            # Sistema de paginação
-            registros_por_pagina = 50
-            total_paginas = (len(df_filtrado) - 1) // registros_por_pagina + 1
-            
-            # Inicializar página atual no session_state
-            if 'pagina_atual' not in st.session_state:
-                st.session_state.pagina_atual = 1
-            
-            # Calcular índices para a página atual
-            inicio = (st.session_state.pagina_atual - 1) * registros_por_pagina
-            fim = min(inicio + registros_por_pagina, len(df_filtrado))
-            
-            # Obter dados da página atual
-            df_pagina = df_filtrado.iloc[inicio:fim].copy()
-            
-            # Aplicar estilização na tabela
-            def colorir_situacao(val):
-                """Aplica cores baseadas no valor da situação"""
-                if pd.isna(val):
-                    return ''
-                val_str = str(val).lower()
-                if 'totalmente compatível' in val_str or 'selecionado' in val_str or 'compatível com polígono' in val_str:
-                    return 'background-color: #d4edda; color: #155724'
-                elif 'parcialmente' in val_str or 'apenas geograficamente' in val_str:
-                    return 'background-color: #fff3cd; color: #856404'
-                elif 'incompatível' in val_str or 'descartado' in val_str:
-                    return 'background-color: #f8d7da; color: #721c24'
-                return ''
-            
-            # Aplicar estilização se as colunas existirem
-            colunas_estilo = []
-            if 'SITUACAO_CADASTRO_SNISB' in df_pagina.columns:
-                colunas_estilo.append('SITUACAO_CADASTRO_SNISB')
-            if 'SITUACAO_MASSA_DAGUA' in df_pagina.columns:
-                colunas_estilo.append('SITUACAO_MASSA_DAGUA')
-            if 'SITUACAO_COMPARACAO_SIOUT' in df_pagina.columns:
-                colunas_estilo.append('SITUACAO_COMPARACAO_SIOUT')
-            
-            if colunas_estilo:
-                styled_df = df_pagina.style.map(colorir_situacao, subset=colunas_estilo)
-                st.dataframe(styled_df, width='stretch', height=600, column_config={
-                    col: st.column_config.TextColumn(width="medium") for col in df_pagina.columns
-                })
-            else:
-                st.dataframe(df_pagina, width='stretch', height=600, column_config={
-                    col: st.column_config.TextColumn(width="medium") for col in df_pagina.columns
-                })
-            
-            # Controles de paginação abaixo da tabela (próximo ao dataset)
-            # Função para gerar os números de página
-            def gerar_paginas_visiveis(pagina_atual, total_paginas):
-                """Gera lista de páginas visíveis com reticências"""
-                paginas = []
-                
-                # Sempre mostrar primeira página
-                paginas.append(1)
-                
-                # Mostrar páginas ao redor da atual
-                inicio_range = max(2, pagina_atual - 2)
-                fim_range = min(total_paginas - 1, pagina_atual + 2)
-                
-                # Adicionar reticências antes se necessário
-                if inicio_range > 2:
-                    paginas.append('...')
-                
-                # Adicionar páginas do range
-                for p in range(inicio_range, fim_range + 1):
-                    paginas.append(p)
-                
-                # Adicionar reticências depois se necessário
-                if fim_range < total_paginas - 1:
-                    paginas.append('...')
-                
-                # Sempre mostrar última página se houver mais de uma
-                if total_paginas > 1:
-                    paginas.append(total_paginas)
-                
-                return paginas
-            
-            paginas_visiveis = gerar_paginas_visiveis(st.session_state.pagina_atual, total_paginas)
-            
-            # Estilo CSS para os botões de paginação
-            st.markdown("""
-            <style>
-            /* Botões de paginação - Secondary */
-            div[data-testid="column"] button[kind="secondary"] {
-                background-color: #f8f9fa !important;
-                color: #495057 !important;
-                border: 1px solid #dee2e6 !important;
-                padding: 0.25rem 0.5rem !important;
-                font-size: 0.875rem !important;
-                height: 2rem !important;
-            }
-            
-            /* Botões de paginação - Primary (página selecionada) */
-            button[kind="primary"], div[data-testid="column"] button[kind="primary"] {
-                background-color: #cfe2ff !important;
-                color: #084298 !important;
-                border: 1px solid #9ec5fe !important;
-                padding: 0.25rem 0.5rem !important;
-                font-size: 0.875rem !important;
-                font-weight: 600 !important;
-                height: 2rem !important;
-            }
-            
-            button[kind="primary"]:hover {
-                background-color: #b6d4fe !important;
-                color: #052c65 !important;
-            }
-            
-            .stButton button[kind="primary"] p {
-                color: #084298 !important;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            # Criar colunas centralizadas para os botões de paginação
-            total_botoes = len(paginas_visiveis) + 2  # +2 para botões anterior/próximo
-            espaco_lateral = (10 - total_botoes) / 2 if total_botoes < 10 else 0.5
-            
-            colunas_layout = [espaco_lateral] + [0.5] + [0.8] * len(paginas_visiveis) + [0.5] + [espaco_lateral]
-            colunas = st.columns(colunas_layout)
-            
-            col_offset = 1  # Começar após o espaço lateral
-            
-            # Botão Anterior
-            with colunas[col_offset]:
-                if st.button("◀", key="prev", disabled=(st.session_state.pagina_atual == 1), use_container_width=True):
-                    st.session_state.pagina_atual -= 1
-                    st.rerun()
-            
-            # Botões de número de página
-            for idx, pagina in enumerate(paginas_visiveis, start=1):
-                with colunas[col_offset + idx]:
-                    if pagina == '...':
-                        st.markdown("<p style='text-align: center; margin-top: 0.25rem;'>...</p>", unsafe_allow_html=True)
-                    else:
-                        if st.button(
-                            str(pagina),
-                            key=f"page_{pagina}",
-                            type="primary" if pagina == st.session_state.pagina_atual else "secondary",
-                            use_container_width=True
-                        ):
-                            st.session_state.pagina_atual = pagina
-                            st.rerun()
-            
-            # Botão Próximo
-            with colunas[col_offset + len(paginas_visiveis) + 1]:
-                if st.button("▶", key="next", disabled=(st.session_state.pagina_atual == total_paginas), use_container_width=True):
-                    st.session_state.pagina_atual += 1
-                    st.rerun()
-            
-            # Botão de download abaixo da paginação
-            st.markdown("")
-            
-            col1, col2, col3 = st.columns([1, 1, 1])
-            
-            with col2:
-                # Texto do botão
-                texto_botao = "Baixar Dados Filtrados" if tem_filtros else "Baixar Todos os Dados"
-                
-                # Usar popover para mostrar opções de formato
-                with st.popover(texto_botao, use_container_width=True):
-                    st.markdown("**Escolha o formato do arquivo:**")
-                    
-                    from io import BytesIO, StringIO
-                    
-                    timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-                    prefixo = "dados_filtrados" if tem_filtros else "dados_completos"
-                    
-                    # Botão Excel
-                    buffer_xlsx = BytesIO()
-                    with pd.ExcelWriter(buffer_xlsx, engine='openpyxl') as writer:
-                        df_filtrado.to_excel(writer, index=False, sheet_name='Dados')
-                    buffer_xlsx.seek(0)
-                    
-                    st.download_button(
-                        label="Excel (.xlsx)",
-                        data=buffer_xlsx,
-                        file_name=f"{prefixo}_{timestamp}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True,
-                        key="download_xlsx"
-                    )
-                    
-                    # Botão CSV
-                    buffer_csv = StringIO()
-                    df_filtrado.to_csv(buffer_csv, index=False, encoding='utf-8-sig', sep=';')
-                    dados_csv = buffer_csv.getvalue().encode('utf-8-sig')
-                    
-                    st.download_button(
-                        label="CSV (.csv)",
-                        data=dados_csv,
-                        file_name=f"{prefixo}_{timestamp}.csv",
-                        mime="text/csv",
-                        use_container_width=True,
-                        key="download_csv"
-                    )
-                    
-                    # Botão JSON
-                    buffer_json = StringIO()
-                    df_filtrado.to_json(buffer_json, orient='records', force_ascii=False, indent=2, date_format='iso')
-                    dados_json = buffer_json.getvalue().encode('utf-8')
-                    
-                    st.download_button(
-                        label="JSON (.json)",
-                        data=dados_json,
-                        file_name=f"{prefixo}_{timestamp}.json",
-                        mime="application/json",
-                        use_container_width=True,
-                        key="download_json"
-                    )
+        if total_filtrado > 0:
+            # Tabela, exportação e mapa são fragmentos: paginar, trocar a opção de exportação ou
+            # mover o mapa reexecuta apenas o fragmento, que lê o resultado dos filtros da sessão
+            secao_tabela()
+            secao_exportacao()
             
             # Mapa de localização
             st.markdown("---")
             st.markdown("<h3 style='text-align: center;'>Mapa de Localização</h3>", unsafe_allow_html=True)
             st.markdown("")
-            
-            # Adicionar CSS para o spinner de carregamento
-            st.markdown("""
-            <style>
-            @keyframes spin {
-                0% { transform: rotate(0deg); }
-                100% { transform: rotate(360deg); }
-            }
-            .loading-spinner {
-                text-align: center;
-                padding: 40px;
-            }
-            .loading-spinner::after {
-                content: "";
-                display: inline-block;
-                width: 40px;
-                height: 40px;
-                border: 4px solid #f3f3f3;
-                border-top: 4px solid #3498db;
-                border-radius: 50%;
-                animation: spin 1s linear infinite;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            # Mostrar spinner de carregamento
-            loading_placeholder = st.empty()
-            loading_placeholder.markdown('<div class="loading-spinner"></div>', unsafe_allow_html=True)
-            
-            # Verificar se existem colunas de latitude e longitude
-            tem_coordenadas = 'LATITUDE' in df_filtrado.columns and 'LONGITUDE' in df_filtrado.columns
-            
-            if tem_coordenadas:
-                # Preparar dados do mapa usando colunas LATITUDE e LONGITUDE diretamente
-                colunas_mapa = ['LATITUDE', 'LONGITUDE']
-                colunas_popup = ['CODIGO_SNISB', 'SITUACAO_CADASTRO_SNISB', 'SITUACAO_MASSA_DAGUA', 'SITUACAO_COMPARACAO_SIOUT']
-                for col in colunas_popup:
-                    if col in df_filtrado.columns:
-                        colunas_mapa.append(col)
-                
-                # Adicionar coluna POLIGONO_ANA se existir (para uso posterior)
-                if 'POLIGONO_ANA' in df_filtrado.columns:
-                    colunas_mapa.append('POLIGONO_ANA')
-                
-                df_mapa = df_filtrado[colunas_mapa].copy()
-                
-                # Renomear para lowercase para consistência
-                df_mapa = df_mapa.rename(columns={'LATITUDE': 'latitude', 'LONGITUDE': 'longitude'})
-                
-                # Converter para numérico e remover valores inválidos
-                df_mapa['latitude'] = pd.to_numeric(df_mapa['latitude'], errors='coerce')
-                df_mapa['longitude'] = pd.to_numeric(df_mapa['longitude'], errors='coerce')
-                df_mapa = df_mapa.dropna(subset=['latitude', 'longitude'])
-                
-                # Validar coordenadas do Brasil (aproximado)
-                df_mapa = df_mapa[
-                    (df_mapa['latitude'] >= -34) & (df_mapa['latitude'] <= 6) &
-                    (df_mapa['longitude'] >= -74) & (df_mapa['longitude'] <= -28)
-                ]
-                
-                if len(df_mapa) > 0:
-                    # Calcular centro do mapa
-                    center_lat = df_mapa['latitude'].mean()
-                    center_lon = df_mapa['longitude'].mean()
-                    
-                    # Criar mapa Folium com imagem de satélite Esri (como base fixa, sem aparecer no controle)
-                    mapa = folium.Map(
-                        location=[center_lat, center_lon],
-                        zoom_start=7,
-                        tiles=None  # Não usar tiles padrão
-                    )
-                    
-                    # Adicionar tiles de satélite como base sem controle
-                    folium.TileLayer(
-                        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-                        attr='Esri World Imagery',
-                        name='Satélite Esri',
-                        overlay=False,
-                        control=False  # Não mostrar no controle de camadas
-                    ).add_to(mapa)
-                    
-                    # Criar grupos de camadas para controle independente (apenas as camadas controláveis)
-                    grupo_poligonos = folium.FeatureGroup(name='🗺️ Polígonos ANA', show=True)
-                    grupo_pontos = folium.FeatureGroup(name='🔵 Pontos das Barragens', show=True)
-                    
-                    # Adicionar polígonos ANA ao grupo
-                    with st.spinner('Carregando polígonos ANA...'):
-                            from shapely import wkt
-                            import json
-                            
-                            # Obter polígonos únicos apenas dos registros filtrados
-                            poligonos_unicos = df_mapa[df_mapa['POLIGONO_ANA'].notna()]['POLIGONO_ANA'].unique()
-                            
-                            # Criar um único FeatureCollection para todos os polígonos (mais eficiente)
-                            features = []
-                            poligonos_validos = 0
-                            poligonos_invalidos = 0
-                            
-                            for poligono_wkt in poligonos_unicos:
-                                try:
-                                    # Verificar se o polígono está completo (termina com ))
-                                    if not str(poligono_wkt).endswith('))'):
-                                        poligonos_invalidos += 1
-                                        continue
-                                    
-                                    # Converter WKT para geometria Shapely
-                                    geom = wkt.loads(poligono_wkt)
-                                    
-                                    # Simplificar geometria agressivamente para melhor performance
-                                    geom_simplified = geom.simplify(0.002, preserve_topology=True)
-                                    
-                                    # Criar feature GeoJSON
-                                    feature = {
-                                        "type": "Feature",
-                                        "geometry": geom_simplified.__geo_interface__,
-                                        "properties": {"tipo": "Polígono ANA"}
-                                    }
-                                    features.append(feature)
-                                    poligonos_validos += 1
-                                except Exception:
-                                    # Ignorar polígonos com erro de parsing
-                                    poligonos_invalidos += 1
-                                    continue
-                            
-                            # Adicionar todos os polígonos de uma vez como FeatureCollection
-                            if features:
-                                feature_collection = {
-                                    "type": "FeatureCollection",
-                                    "features": features
-                                }
-                                
-                                folium.GeoJson(
-                                    feature_collection,
-                                    style_function=lambda x: {
-                                        'fillColor': '#4A90E2',
-                                        'color': '#2E5C8A',
-                                        'weight': 1,
-                                        'fillOpacity': 0.45,
-                                        'interactive': False
-                                    }
-                                ).add_to(grupo_poligonos)
-                            
-                    # Adicionar grupo de polígonos ao mapa
-                    grupo_poligonos.add_to(mapa)
-                    
-                    # Adicionar pontos das barragens ao grupo
-                    with st.spinner('Carregando pontos das barragens...'):
-                            # Processar todos os pontos de uma vez (mais eficiente)
-                            for idx, row in df_mapa.iterrows():
-                                # Definir cor baseada na situação do cadastro SNISB
-                                situacao_cadastro = str(row.get('SITUACAO_CADASTRO_SNISB', '')).lower()
-                                situacao_comparacao = str(row.get('SITUACAO_COMPARACAO_SIOUT', '')).lower()
-                                
-                                # Hierarquia de cores:
-                                if 'descartado' in situacao_cadastro:
-                                    cor = '#DC143C'
-                                elif 'totalmente compatível' in situacao_comparacao:
-                                    cor = '#28A745'
-                                elif 'compatível parcialmente' in situacao_comparacao:
-                                    cor = '#FFC107'
-                                elif 'compatível apenas geograficamente' in situacao_comparacao:
-                                    cor = '#FF8C00'
-                                elif 'incompatível' in situacao_comparacao:
-                                    cor = '#8B0000'
-                                elif 'selecionado para validação' in situacao_cadastro:
-                                    cor = '#007BFF'
-                                else:
-                                    cor = '#808080'
-                                
-                                # Criar conteúdo do popup (simplificado)
-                                popup_html = f"""<div style='font-family: Arial; font-size: 11px; min-width: 200px;'>
-                                    <b>Código:</b> {row.get('CODIGO_SNISB', 'N/A')}<br>
-                                    <b>Cadastro SNISB:</b> {row.get('SITUACAO_CADASTRO_SNISB', 'N/A')}<br>
-                                    <b>Massa D'água:</b> {row.get('SITUACAO_MASSA_DAGUA', 'N/A')}<br>
-                                    <b>Comparação SIOUT:</b> {row.get('SITUACAO_COMPARACAO_SIOUT', 'N/A')}
-                                </div>"""
-                                
-                                folium.CircleMarker(
-                                    location=[row['latitude'], row['longitude']],
-                                    radius=5,
-                                    color='#FFFFFF',
-                                    fill=True,
-                                    fillColor=cor,
-                                    fillOpacity=0.7,
-                                    weight=1,
-                                    popup=folium.Popup(popup_html, max_width=250, lazy=True)
-                                ).add_to(grupo_pontos)
-                    
-                    # Adicionar grupo de pontos ao mapa
-                    grupo_pontos.add_to(mapa)
-                    
-                    # Adicionar controle de camadas (permite ligar/desligar sem recarregar)
-                    folium.LayerControl(position='topright', collapsed=False).add_to(mapa)
-                    
-                    # Adicionar CSS customizado para deixar o controle de camadas mais transparente
-                    custom_css = """
-                    <style>
-                    .leaflet-control-layers {
-                        background-color: rgba(255, 255, 255, 0.85) !important;
-                        border: 1px solid grey !important;
-                        border-radius: 5px !important;
-                    }
-                    .leaflet-control-layers-expanded {
-                        padding: 6px 8px 6px 6px !important;
-                    }
-                    </style>
-                    """
-                    mapa.get_root().html.add_child(folium.Element(custom_css))
-                    
-                    # Adicionar legenda
-                    legenda_html = """
-                    <div style="position: fixed; 
-                                bottom: 30px; right: 30px; width: 200px; 
-                                background-color: rgba(255, 255, 255, 0.9); z-index:9999; 
-                                border:1px solid grey; border-radius: 5px;
-                                padding: 8px; font-size: 10px;
-                                font-family: Arial;">
-                        <h4 style="margin: 0 0 6px 0; text-align: center; font-size: 11px;">Legenda</h4>
-                        <p style="margin: 3px 0;"><span style="background-color: #28A745; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Totalmente Compatível</p>
-                        <p style="margin: 3px 0;"><span style="background-color: #FFC107; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Parcialmente Compatível</p>
-                        <p style="margin: 3px 0;"><span style="background-color: #FF8C00; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Compatível Geo</p>
-                        <p style="margin: 3px 0;"><span style="background-color: #8B0000; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Incompatível</p>
-                        <p style="margin: 3px 0;"><span style="background-color: #DC143C; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Descartado</p>
-                        <hr style="margin: 6px 0; border: 0; border-top: 1px solid #ccc;">
-                        <p style="margin: 3px 0;"><span style="background-color: #4A90E2; width: 12px; height: 12px; display: inline-block; border: 1px solid #2E5C8A;"></span> Polígonos ANA</p>
-                    </div>
-                    """
-                    mapa.get_root().html.add_child(folium.Element(legenda_html))
-                    
-                    # Remover spinner e exibir mapa
-                    loading_placeholder.empty()
-                    st_folium(mapa, width=None, height=650, returned_objects=[])
-                else:
-                    st.info("Nenhuma coordenada válida encontrada nos dados filtrados.")
-            else:
-                st.info("Colunas LATITUDE e LONGITUDE não encontradas no dataset.")
+            secao_mapa()
         else:
             st.warning("Nenhum registro encontrado com os filtros selecionados.")
     
@@ -799,7 +608,7 @@ if df is not None:
             
             **SITUACAO_COMPARACAO_SIOUT**: Resultado da comparação entre os dados SNISB e SIOUT (Totalmente compatível, Compatível parcialmente, Compatível apenas geograficamente, Incompatível).
             
-            **SITUACAO_MASSA_DAGUA**: Indica se a barragem está localizada dentro de uma massa d'água mapeada pela ANA (Compatível com polígono ANA, Não aplicado).
+            **SITUACAO_MASSA_DAGUA**: Indica se a barragem está localizada dentro de uma massa d'água mapeada pela ANA (Compatível com polígono ANA, Sem polígono ANA, Não aplicado).
             
             **GID**: Identificador geográfico único do registro.
             
@@ -831,7 +640,8 @@ if df is not None:
             ### SITUACAO_MASSA_DAGUA
             
             - **Compatível com polígono ANA**: A barragem está localizada dentro de uma massa d'água mapeada pela ANA (Agência Nacional de Águas).
-            - **Não aplicado**: Situação não analisada (geralmente para registros descartados).
+            - **Sem polígono ANA**: A barragem foi analisada, mas não está dentro de nenhuma massa d'água mapeada pela ANA.
+            - **Não aplicado**: Situação não analisada (registros descartados ou sem coordenadas válidas).
             
             ### SITUACAO_COMPARACAO_SIOUT
             
@@ -979,3 +789,33 @@ if os.path.exists(logo_path):
     )
 else:
     st.markdown("<p style='text-align: center; color: #666; font-size: 12px;'>Desenvolvido por Agência Zetta</p>", unsafe_allow_html=True)
+
+# Fim do rerun: log JSON e, se pedido, painel de depuração na barra lateral
+evento_rerun = medicao.concluir(
+    versao=base.versao if base is not None else None,
+    linhas=len(df) if df is not None else 0
+)
+if painel_depuracao:
+    with st.sidebar:
+        st.markdown("### Depuração do rerun")
+        st.markdown(f"Sessão `{evento_rerun['sessao']}` · total **{evento_rerun['segundos'] * 1000:.0f} ms**")
+        st.dataframe(instrumentacao.tabela_etapas(evento_rerun), hide_index=True, width='stretch')
+        if evento_rerun['bytes']:
+            st.markdown("**Payloads**")
+            st.dataframe(
+                pd.DataFrame([(nome, tamanho / 1024) for nome, tamanho in evento_rerun['bytes'].items()], columns=["payload", "KB"]),
+                hide_index=True,
+                width='stretch'
+            )
+        if base is not None:
+            st.markdown("**Caches** (acertos e falhas deste rerun da sessão; taxa, entradas e MB do processo)")
+            estatisticas = {nome: cache.estatisticas() for nome, cache in base.caches.items()}
+            st.dataframe(instrumentacao.tabela_caches(evento_rerun, estatisticas), hide_index=True, width='stretch')
+        exportacoes = instrumentacao.exportacoes_recentes()
+        if exportacoes:
+            st.markdown("**Exportações recentes (processo)**")
+            st.dataframe(
+                pd.DataFrame(exportacoes)[["momento", "formato", "linhas", "segundos", "bytes"]],
+                hide_index=True,
+                width='stretch'
+            )
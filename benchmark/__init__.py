@@ -0,0 +1 @@
+"""Benchmarks do pipeline carregar → filtrar → paginar → exportar → mapa sobre dados sintéticos"""
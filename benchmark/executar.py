@@ -0,0 +1,340 @@
+"""Benchmark do pipeline do aplicativo (carregar → filtrar → paginar → exportar → mapa), sem interface.
+
+Cada escala (número de barragens) roda em um processo próprio, sobre o
+relatório sintético de ``benchmark.sintetico``, e executa as mesmas chamadas
+que o app.py faz a cada rerun (funções de ``nucleo.consulta`` e
+``nucleo.mapa``): ingestão a frio e carga do snapshot, filtros (cache limpo),
+página da tabela, Styler das colunas de situação, exportações por formato e
+payloads e HTML do mapa folium, além da junção ponto-em-polígono
+(``nucleo.juncao``) completa e incremental. Para cada etapa são registrados
+o tempo de parede (mediana das repetições), o pico de RSS do processo durante
+a etapa e o tamanho do payload produzido.
+
+Os resultados são gravados em ``benchmark/resultados/`` e podem ser guardados
+como referência (``--salvar-referencia``) e comparados com uma referência
+anterior (``--comparar``); a comparação termina com código 1 se alguma etapa
+ficou mais lenta que a tolerância.
+
+Uso::
+
+    python -m benchmark.executar --linhas 10000 100000 [--repeticoes 3] [--formatos csv parquet]
+                                 [--salvar-referencia NOME] [--comparar NOME] [--tolerancia 0.25]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Execução direta (python benchmark/executar.py): o pacote nucleo fica na raiz do repositório
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmark import sintetico  # noqa: E402
+from nucleo import consulta, dados, exportacao, ingestao, juncao, mapa  # noqa: E402
+
+PASTA_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PASTA_RESULTADOS = os.path.join(PASTA_BENCHMARK, "resultados")
+PASTA_REFERENCIAS = os.path.join(PASTA_BENCHMARK, "referencias")
+
+ESCALAS_PADRAO = [10_000, 100_000]
+
+# Intervalo entre amostras do RSS durante uma etapa (segundos)
+INTERVALO_AMOSTRAGEM = 0.005
+
+# Na comparação, etapas mais rápidas que este tempo (segundos) não contam como regressão (ruído)
+TEMPO_MINIMO_COMPARACAO = 0.02
+
+# Fração das barragens com coordenadas alteradas na junção incremental
+FRACAO_ALTERADAS_JUNCAO = 0.01
+
+# Zoom aproximado do mapa, com a área visível de uma janela típica
+ZOOM_APROXIMADO = 12
+JANELA_GRAUS = (0.12, 0.25)
+
+_TAMANHO_PAGINA_MEMORIA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_atual():
+    """RSS atual do processo em bytes (/proc/self/statm; pico do processo onde não houver /proc)"""
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * _TAMANHO_PAGINA_MEMORIA
+    except OSError:
+        # ru_maxrss: KiB no Linux, bytes no macOS
+        fator = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * fator
+
+
+class AmostradorRSS:
+    """Pico de RSS do processo enquanto o bloco executa, amostrado por uma thread"""
+
+    def __enter__(self):
+        self.pico = rss_atual()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def _amostrar(self):
+        while not self._parar.wait(INTERVALO_AMOSTRAGEM):
+            self.pico = max(self.pico, rss_atual())
+
+    def __exit__(self, *excecao):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_atual())
+        return False
+
+
+class Medicoes:
+    """Etapas medidas de uma escala: tempo (mediana), pico de RSS e bytes do payload"""
+
+    def __init__(self, repeticoes):
+        self.repeticoes = repeticoes
+        self.etapas = []
+
+    def medir(self, nome, funcao, tamanho=None, preparar=None, repeticoes=None):
+        """Executa funcao (precedida de preparar, fora da medição) e registra a etapa; retorna o último resultado
+
+        tamanho: função que recebe o resultado e devolve os bytes do payload
+        """
+        tempos, pico, resultado = [], 0, None
+        for _ in range(repeticoes or self.repeticoes):
+            if preparar is not None:
+                preparar()
+            with AmostradorRSS() as amostrador:
+                inicio = time.perf_counter()
+                resultado = funcao()
+                tempos.append(time.perf_counter() - inicio)
+            pico = max(pico, amostrador.pico)
+        etapa = {
+            "etapa": nome,
+            "segundos": round(statistics.median(tempos), 6),
+            "pico_rss_mb": round(pico / 2**20, 1),
+            "bytes": int(tamanho(resultado)) if tamanho is not None else None
+        }
+        self.etapas.append(etapa)
+        print(
+            f"  {nome:<32} {etapa['segundos']:>9.4f} s  {etapa['pico_rss_mb']:>8.1f} MB"
+            + (f"  {etapa['bytes'] / 2**20:>9.2f} MB de payload" if etapa["bytes"] is not None else ""),
+            file=sys.stderr
+        )
+        return resultado
+
+
+def _remover_snapshots(pasta):
+    """Apaga snapshot, armazém de geometrias e manifesto da pasta (próxima carga converte a origem a frio)"""
+    padroes = [f"{ingestao.NOME_BASE}.*.arrow", os.path.basename(ingestao.caminho_manifesto(pasta))]
+    for padrao in padroes:
+        for caminho in glob.glob(os.path.join(pasta, padrao)):
+            os.remove(caminho)
+
+
+def cenarios_filtros(base):
+    """Estados de filtros típicos do app, derivados do catálogo da base: (nome, EspecificacaoFiltros)"""
+    def valores(coluna, quantidade):
+        opcoes = base.catalogo.get(coluna)
+        return list(opcoes.valores[:quantidade]) if opcoes is not None else []
+
+    cenarios = [("sem_filtros", consulta.especificar(base, {}))]
+    cenarios.append(("situacao", consulta.especificar(base, {
+        'SITUACAO_COMPARACAO_SIOUT': valores('SITUACAO_COMPARACAO_SIOUT', 1)
+    })))
+    cenarios.append(("uso_e_cadastro", consulta.especificar(base, {
+        'USO_SNISB': valores('USO_SNISB', 2),
+        'SITUACAO_CADASTRO_SNISB': valores('SITUACAO_CADASTRO_SNISB', 1)
+    })))
+    limites = consulta.limites_datas(base)
+    if limites is not None:
+        inicio, fim = limites
+        cenarios.append(("periodo", consulta.especificar(base, {}, (inicio + (fim - inicio) / 4, fim - (fim - inicio) / 4))))
+    cenarios.append(("codigos", consulta.especificar(base, {'CODIGO_SNISB': valores('CODIGO_SNISB', 50)})))
+    return cenarios
+
+
+def html_mapa(resultado, zoom=None, limites=None):
+    """HTML do mapa folium como montado pelo app, incluindo os grupos que o st_folium envia à parte"""
+    montado = mapa.montar_mapa(resultado, zoom, limites)
+    for grupo in montado.grupos_dinamicos:
+        grupo.add_to(montado.mapa)
+    return montado.mapa.get_root().render()
+
+
+def executar_escala(linhas, semente, repeticoes, formatos):
+    """Mede todas as etapas do pipeline para um número de barragens; retorna o resultado da escala"""
+    inicio = time.perf_counter()
+    pasta = sintetico.garantir_dados(linhas, semente)
+    geracao = time.perf_counter() - inicio
+    caminho_fonte = ingestao.localizar_fonte(pasta)
+    print(f"{linhas} barragens ({os.path.getsize(caminho_fonte) / 2**20:.1f} MB de CSV)", file=sys.stderr)
+
+    medicoes = Medicoes(repeticoes)
+    # Carga: conversão a frio (CSV → snapshot Arrow + armazém de geometrias) e carga do snapshot já existente
+    medicoes.medir("ingestao_frio", lambda: dados.carregar(pasta), preparar=lambda: _remover_snapshots(pasta), repeticoes=1)
+    base = medicoes.medir("carregar", lambda: dados.carregar(pasta), tamanho=lambda b: b.tabela.memory_usage(deep=True).sum())
+    medicoes.medir("armazem_geometrias", lambda: base.geometrias, repeticoes=1)
+    medicoes.medir("grade_agrupamento", lambda: base.grade, repeticoes=1)
+    medicoes.medir("indice_espacial", lambda: base.espacial, repeticoes=1)
+
+    # Filtros: resultado calculado no índice invertido (cache limpo a cada repetição)
+    cenarios = cenarios_filtros(base)
+    for nome, especificacao in cenarios:
+        medicoes.medir(
+            f"filtrar[{nome}]",
+            lambda: consulta.aplicar_filtros(base, especificacao),
+            tamanho=lambda resultado: resultado.posicoes.nbytes,
+            preparar=base.cache_filtros.limpar
+        )
+
+    # Tabela: primeira e última página do resultado sem filtros, e o Styler das colunas de situação
+    completo = consulta.aplicar_filtros(base, cenarios[0][1])
+    for nome, numero in (("primeira", 1), ("ultima", completo.total_paginas())):
+        pagina = medicoes.medir(
+            f"pagina[{nome}]",
+            lambda: consulta.paginar(completo, numero),
+            tamanho=lambda p: p.dados.memory_usage(deep=True).sum(),
+            preparar=base.cache_paginas.limpar
+        )
+    medicoes.medir("estilo_pagina", lambda: consulta.estilizar(pagina).to_html(), tamanho=len)
+
+    # Exportações do resultado de um filtro típico (arquivo gerado em lotes, cache limpo a cada repetição)
+    filtrado = consulta.aplicar_filtros(base, cenarios[1][1])
+    for formato in formatos:
+        medicoes.medir(
+            f"exportar[{formato}]",
+            lambda: consulta.exportar(filtrado, formato),
+            tamanho=lambda arquivo: os.path.getsize(arquivo.caminho),
+            preparar=base.cache_exportacoes.limpar
+        )
+    base.cache_exportacoes.limpar()
+
+    # Mapa: payloads do zoom inicial (RS inteiro) e de um zoom aproximado, e o HTML do folium
+    posicoes = consulta.posicoes_mapa(completo)
+    centro = (float(base.grade.latitude[posicoes].mean()), float(base.grade.longitude[posicoes].mean()))
+    meia_altura, meia_largura = JANELA_GRAUS
+    limites = (centro[0] - meia_altura, centro[1] - meia_largura, centro[0] + meia_altura, centro[1] + meia_largura)
+    for zoom, area in ((mapa.ZOOM_INICIAL, None), (ZOOM_APROXIMADO, limites)):
+        medicoes.medir(
+            f"payload_mapa[z{zoom}]",
+            lambda: consulta.montar_payload_mapa(completo, zoom, area),
+            tamanho=lambda payload: payload.nbytes,
+            preparar=base.cache_mapa.limpar
+        )
+    medicoes.medir(f"html_mapa[z{mapa.ZOOM_INICIAL}]", lambda: html_mapa(completo), tamanho=len)
+
+    # Junção ponto-em-polígono (barragens × polígonos distintos da origem): índice, execução
+    # completa e incremental com uma fração das barragens movida
+    fonte = ingestao.ler_fonte(caminho_fonte)
+    indice_poligonos = medicoes.medir("juncao[indice]", lambda: juncao.IndicePoligonos(*juncao.camada_da_fonte(fonte)))
+    anterior, _ = medicoes.medir("juncao[completa]", lambda: juncao.juntar(fonte, indice_poligonos))
+    alterada = fonte.copy()
+    movidas = np.random.default_rng(semente).choice(len(fonte), max(1, int(len(fonte) * FRACAO_ALTERADAS_JUNCAO)), replace=False)
+    alterada.loc[movidas, 'LATITUDE'] = alterada.loc[movidas, 'LATITUDE'] + 0.001
+    medicoes.medir("juncao[incremental]", lambda: juncao.juntar(alterada, indice_poligonos, anterior))
+
+    return {
+        "linhas": linhas,
+        "bytes_fonte": os.path.getsize(caminho_fonte),
+        "poligonos_distintos": len(base.geometrias),
+        "segundos_geracao": round(geracao, 3),
+        "etapas": medicoes.etapas
+    }
+
+
+def executar(escalas, semente, repeticoes, formatos):
+    """Executa cada escala em um subprocesso (RSS isolado entre escalas) e junta os resultados"""
+    resultados = []
+    for linhas in escalas:
+        comando = [
+            sys.executable, "-m", "benchmark.executar", "--escala-interna", str(linhas),
+            "--semente", str(semente), "--repeticoes", str(repeticoes), "--formatos", *formatos
+        ]
+        saida = subprocess.run(comando, cwd=RAIZ, check=True, stdout=subprocess.PIPE, text=True).stdout
+        resultados.append(json.loads(saida))
+    return {
+        "data": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "processadores": os.cpu_count(),
+        "semente": semente,
+        "repeticoes": repeticoes,
+        "escalas": resultados
+    }
+
+
+def gravar_json(dados_json, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(dados_json, arquivo, ensure_ascii=False, indent=2)
+
+
+def comparar(atual, referencia, tolerancia):
+    """Etapas mais lentas que a referência além da tolerância, por escala; retorna as regressões"""
+    regressoes = []
+    anteriores = {
+        (escala["linhas"], etapa["etapa"]): etapa
+        for escala in referencia["escalas"] for etapa in escala["etapas"]
+    }
+    for escala in atual["escalas"]:
+        for etapa in escala["etapas"]:
+            anterior = anteriores.get((escala["linhas"], etapa["etapa"]))
+            if anterior is None:
+                continue
+            razao = etapa["segundos"] / max(anterior["segundos"], 1e-9)
+            regrediu = razao > 1 + tolerancia and etapa["segundos"] >= TEMPO_MINIMO_COMPARACAO
+            print(
+                f"{escala['linhas']:>9} {etapa['etapa']:<32} {anterior['segundos']:>9.3f} s → {etapa['segundos']:>9.3f} s"
+                f"  ({razao:5.2f}×)  RSS {anterior['pico_rss_mb']:>8.1f} → {etapa['pico_rss_mb']:>8.1f} MB"
+                + ("  REGRESSÃO" if regrediu else "")
+            )
+            if regrediu:
+                regressoes.append((escala["linhas"], etapa["etapa"], razao))
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline carregar → filtrar → paginar → exportar → mapa")
+    parser.add_argument("--linhas", type=int, nargs="+", default=ESCALAS_PADRAO, help="escalas (número de barragens)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições por etapa (vale a mediana)")
+    parser.add_argument("--formatos", nargs="+", default=list(exportacao.FORMATOS), choices=list(exportacao.FORMATOS))
+    parser.add_argument("--salvar-referencia", metavar="NOME", help="grava o resultado em benchmark/referencias/NOME.json")
+    parser.add_argument("--comparar", metavar="NOME", help="compara com benchmark/referencias/NOME.json")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="aumento de tempo aceito na comparação (fração)")
+    parser.add_argument("--escala-interna", type=int, help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.escala_interna is not None:
+        # Subprocesso de uma escala: resultado em JSON na saída padrão
+        resultado = executar_escala(
+            argumentos.escala_interna, argumentos.semente, argumentos.repeticoes, argumentos.formatos
+        )
+        json.dump(resultado, sys.stdout)
+        raise SystemExit(0)
+
+    resultado = executar(argumentos.linhas, argumentos.semente, argumentos.repeticoes, argumentos.formatos)
+    caminho_resultado = os.path.join(PASTA_RESULTADOS, f"{pd.Timestamp.now():%Y%m%d_%H%M%S}.json")
+    gravar_json(resultado, caminho_resultado)
+    print(f"Resultado gravado em {caminho_resultado}")
+    if argumentos.salvar_referencia:
+        caminho_referencia = os.path.join(PASTA_REFERENCIAS, f"{argumentos.salvar_referencia}.json")
+        gravar_json(resultado, caminho_referencia)
+        print(f"Referência gravada em {caminho_referencia}")
+    if argumentos.comparar:
+        with open(os.path.join(PASTA_REFERENCIAS, f"{argumentos.comparar}.json"), encoding="utf-8") as arquivo:
+            encontradas = comparar(resultado, json.load(arquivo), argumentos.tolerancia)
+        print(f"{len(encontradas)} etapas com regressão acima de {argumentos.tolerancia:.0%}")
+        raise SystemExit(1 if encontradas else 0)
@@ -0,0 +1,126 @@
+"""Tempo de cada rerun do app.py (camada de interface) sob o AppTest do Streamlit, com orçamentos por interação.
+
+O aplicativo roda sem navegador (``streamlit.testing.v1.AppTest``) sobre o
+relatório sintético de ``benchmark.sintetico`` (via ``SIOUT_PASTA_DADOS``),
+com o snapshot já convertido, e executa uma sequência fixa de interações:
+primeira execução, seleção de um filtro, troca de página, rerun sem mudanças e
+volta ao estado sem filtros (já em cache). Cada rerun é comparado ao seu
+orçamento de tempo; o comando termina com código 1 se algum for excedido ou se
+o script levantar exceção.
+
+O AppTest reexecuta o script inteiro mesmo para widgets dentro de fragmentos
+(tabela, exportação e mapa), então o tempo de troca de página medido aqui é um
+limite superior do rerun do fragmento no navegador.
+
+Uso::
+
+    python -m benchmark.interface --linhas 10000 100000 [--fator-orcamento 1.0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmark import sintetico  # noqa: E402
+from nucleo import ingestao  # noqa: E402
+
+CAMINHO_APP = os.path.join(RAIZ, "app.py")
+
+# Orçamento (segundos) de cada rerun, para até 100 mil barragens; acima disso é escalado linearmente
+ORCAMENTOS = {
+    "primeira_execucao": 10.0,
+    "filtro": 1.5,
+    "pagina": 1.0,
+    "sem_mudancas": 0.75,
+    "filtro_em_cache": 1.0
+}
+LINHAS_ORCAMENTO = 100_000
+
+# Tempo máximo de um rerun no AppTest (segundos)
+TEMPO_LIMITE = 600
+
+
+def _interacoes(app):
+    """Sequência de interações: (nome, função que prepara o próximo rerun)"""
+    def selecionar_filtro():
+        seletor = app.multiselect(key="filtro_uso_snisb")
+        seletor.select(seletor.options[0])
+
+    def limpar_filtro():
+        seletor = app.multiselect(key="filtro_uso_snisb")
+        seletor.set_value([])
+
+    return [
+        ("primeira_execucao", lambda: None),
+        ("filtro", selecionar_filtro),
+        ("pagina", lambda: app.button(key="next").click()),
+        ("sem_mudancas", lambda: None),
+        ("filtro_em_cache", limpar_filtro)
+    ]
+
+
+def medir_reruns(linhas):
+    """Executa as interações no AppTest e retorna o tempo de cada rerun (processo com SIOUT_PASTA_DADOS definido)"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(CAMINHO_APP, default_timeout=TEMPO_LIMITE)
+    tempos = {}
+    for nome, preparar in _interacoes(app):
+        preparar()
+        inicio = time.perf_counter()
+        app.run()
+        tempos[nome] = round(time.perf_counter() - inicio, 4)
+        if app.exception:
+            raise RuntimeError(f"Exceção no rerun '{nome}': {app.exception[0].value}")
+        if app.error:
+            raise RuntimeError(f"Erro exibido no rerun '{nome}': {app.error[0].value}")
+    return {"linhas": linhas, "reruns": tempos}
+
+
+def orcamento(nome, linhas, fator=1.0):
+    """Orçamento do rerun para o número de barragens"""
+    return ORCAMENTOS[nome] * max(1.0, linhas / LINHAS_ORCAMENTO) * fator
+
+
+def executar(escalas, semente, fator):
+    """Mede cada escala em um subprocesso (caches do Streamlit isolados); retorna (resultados, excedidos)"""
+    resultados, excedidos = [], []
+    for linhas in escalas:
+        pasta = sintetico.garantir_dados(linhas, semente)
+        # Snapshot convertido antes: a primeira execução mede a carga, não a ingestão
+        ingestao.garantir_snapshot(pasta)
+        ambiente = dict(os.environ, SIOUT_PASTA_DADOS=pasta)
+        comando = [sys.executable, "-m", "benchmark.interface", "--escala-interna", str(linhas)]
+        saida = subprocess.run(comando, cwd=RAIZ, env=ambiente, check=True, stdout=subprocess.PIPE, text=True).stdout
+        resultado = json.loads(saida)
+        resultados.append(resultado)
+        for nome, segundos in resultado["reruns"].items():
+            limite = orcamento(nome, linhas, fator)
+            estourou = segundos > limite
+            print(f"{linhas:>9} {nome:<20} {segundos:>8.3f} s  (orçamento {limite:.2f} s)" + ("  EXCEDIDO" if estourou else ""))
+            if estourou:
+                excedidos.append((linhas, nome, segundos, limite))
+    return resultados, excedidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempo dos reruns do app.py no AppTest, com orçamentos por interação")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--fator-orcamento", type=float, default=1.0, help="multiplica todos os orçamentos")
+    parser.add_argument("--escala-interna", type=int, help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.escala_interna is not None:
+        json.dump(medir_reruns(argumentos.escala_interna), sys.stdout)
+        raise SystemExit(0)
+
+    _, encontrados = executar(argumentos.linhas, argumentos.semente, argumentos.fator_orcamento)
+    print(f"{len(encontrados)} reruns acima do orçamento")
+    raise SystemExit(1 if encontrados else 0)
@@ -0,0 +1,197 @@
+"""Memória do processo com muitas sessões sobre a mesma base (dados compartilhados, estado leve por sessão).
+
+Simula, em um único processo, o que o servidor do Streamlit faz com várias
+sessões abertas: a base é carregada uma única vez (como o ``st.cache_resource``
+do app.py) e cada sessão guarda apenas o seu estado — a especificação dos
+filtros, a página e a visão do mapa — e refaz, a cada "rerun", as mesmas
+chamadas do aplicativo (filtros, página, Styler e payloads do mapa). As
+sessões percorrem um conjunto fixo de estados de filtros, como usuários que
+consultam os mesmos recortes, então os caches compartilhados da base ficam
+estáveis depois do aquecimento.
+
+O RSS do processo é medido com 1, 10, 50... sessões abertas; o comando termina
+com código 1 se o crescimento entre a primeira e a última medida passar da
+tolerância, isto é, se os caches compartilhados crescerem com as sessões.
+
+A simulação não passa pelo app.py, então não veria uma sessão que guardasse
+dados no ``st.session_state``. Por isso, sessões reais do app.py também são
+executadas no ``AppTest`` (filtro e troca de página), e o comando termina com
+código 1 se o estado de alguma delas tiver valores que não sejam a
+``EspecificacaoFiltros`` ou escalares (ex.: DataFrame, array, resultado dos
+filtros).
+
+Uso::
+
+    python -m benchmark.sessoes --linhas 10000 [--sessoes 1 10 50 100 200] [--estados 8]
+                                [--tolerancia-mb 16] [--sessoes-app 10]
+"""
+import argparse
+import datetime
+import gc
+import os
+import pickle
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+
+from benchmark import sintetico  # noqa: E402
+from benchmark.executar import JANELA_GRAUS, ZOOM_APROXIMADO, rss_atual  # noqa: E402
+from nucleo import banco, consulta, mapa  # noqa: E402
+
+SESSOES_PADRAO = [1, 10, 50, 100, 200]
+
+# Páginas visitadas por sessão (1 a PAGINAS_VISITADAS)
+PAGINAS_VISITADAS = 3
+
+# Crescimento de RSS aceito entre a primeira e a última medida: o maior entre os dois
+TOLERANCIA_MB = 16.0
+TOLERANCIA_RELATIVA = 0.05
+
+# Sessões do app.py executadas no AppTest para conferir o conteúdo do st.session_state
+SESSOES_APP = 10
+CAMINHO_APP = os.path.join(RAIZ, "app.py")
+TEMPO_LIMITE = 600
+
+# Valores aceitos no st.session_state além da EspecificacaoFiltros (e de tuplas, listas e
+# dicionários deles: seleções dos multiselects, chave dos filtros e visão do mapa)
+ESCALARES = (str, int, float, bool, type(None), datetime.date)
+
+
+def estados_filtros(base, quantidade, semente):
+    """Especificações de filtros percorridas pelas sessões (a primeira sem filtros)"""
+    estados = [consulta.EspecificacaoFiltros()]
+    for filtros, intervalo_datas in banco.casos_aleatorios(base, quantidade - 1, semente):
+        estados.append(consulta.EspecificacaoFiltros(filtros, intervalo_datas))
+    return estados
+
+
+def visoes_mapa(base, semente):
+    """Visões do mapa (zoom, limites): a inicial e uma aproximada em torno de uma barragem"""
+    visoes = [(mapa.ZOOM_INICIAL, None)]
+    validos = np.flatnonzero(base.grade.validos) if 'LATITUDE' in base.tabela.columns else []
+    if len(validos):
+        posicao = np.random.default_rng(semente).choice(validos)
+        latitude, longitude = base.grade.latitude[posicao], base.grade.longitude[posicao]
+        meia_altura, meia_largura = JANELA_GRAUS[0] / 2, JANELA_GRAUS[1] / 2
+        limites = (latitude - meia_altura, longitude - meia_largura, latitude + meia_altura, longitude + meia_largura)
+        visoes.append((ZOOM_APROXIMADO, limites))
+    return visoes
+
+
+def rerun(base, estado):
+    """Chamadas de um rerun do aplicativo a partir do estado da sessão (o resultado não fica na sessão)"""
+    resultado = consulta.aplicar_filtros(base, estado["especificacao_filtros"])
+    pagina = consulta.paginar(resultado, estado["pagina_atual"])
+    consulta.estilizar(pagina)
+    zoom, limites = estado["visao_mapa"]
+    consulta.montar_payload_mapa(resultado, zoom, limites)
+    return resultado.total
+
+
+def abrir_sessao(indice, estados, visoes):
+    """Estado de uma sessão nova (equivalente ao st.session_state do app.py)"""
+    return {
+        "especificacao_filtros": estados[indice % len(estados)],
+        "pagina_atual": indice // len(estados) % PAGINAS_VISITADAS + 1,
+        "visao_mapa": visoes[indice % len(visoes)]
+    }
+
+
+def medir(linhas, contagens, quantidade_estados, semente, pasta=None):
+    """RSS do processo (MB) e tamanho médio do estado por sessão (bytes) para cada número de sessões abertas"""
+    pasta = sintetico.garantir_dados(linhas, semente, pasta=pasta)
+    base = consulta.carregar(pasta).base
+    estados = estados_filtros(base, quantidade_estados, semente)
+    visoes = visoes_mapa(base, semente)
+
+    # Aquecimento: todas as combinações de estado, página e visão passam pelos caches compartilhados
+    combinacoes = len(estados) * PAGINAS_VISITADAS * len(visoes)
+    for indice in range(combinacoes):
+        rerun(base, abrir_sessao(indice, estados, visoes))
+
+    sessoes, medidas = [], []
+    for contagem in sorted(contagens):
+        while len(sessoes) < contagem:
+            estado = abrir_sessao(len(sessoes), estados, visoes)
+            rerun(base, estado)
+            sessoes.append(estado)
+        # Um rerun de cada sessão aberta antes da medida
+        for estado in sessoes:
+            rerun(base, estado)
+        gc.collect()
+        tamanho_estado = sum(len(pickle.dumps(estado)) for estado in sessoes) / len(sessoes)
+        medidas.append({"sessoes": contagem, "rss_mb": round(rss_atual() / 2**20, 1), "bytes_por_sessao": int(tamanho_estado)})
+    tamanho_tabela = int(base.tabela.memory_usage(deep=True).sum())
+    return medidas, tamanho_tabela
+
+
+def valores_pesados(estado):
+    """Chaves do estado de sessão cujo valor não é a especificação dos filtros nem escalar"""
+    def leve(valor):
+        if isinstance(valor, (consulta.EspecificacaoFiltros,) + ESCALARES):
+            return True
+        if isinstance(valor, (tuple, list)):
+            return all(leve(item) for item in valor)
+        if isinstance(valor, dict):
+            return all(leve(item) for item in valor.values())
+        return False
+
+    return sorted(chave for chave, valor in estado.items() if not leve(valor))
+
+
+def estados_app(pasta, quantidade):
+    """st.session_state de sessões reais do app.py (AppTest): cada uma filtra por um uso e avança uma página"""
+    from streamlit.testing.v1 import AppTest
+
+    consulta.PASTA_DADOS = pasta
+    estados = []
+    for indice in range(quantidade):
+        app = AppTest.from_file(CAMINHO_APP, default_timeout=TEMPO_LIMITE)
+        app.run()
+        seletor = app.multiselect(key="filtro_uso_snisb")
+        if seletor.options:
+            seletor.select(seletor.options[indice % len(seletor.options)])
+            app.run()
+        if not app.button(key="next").disabled:
+            app.button(key="next").click()
+            app.run()
+        if app.exception:
+            raise RuntimeError(f"Exceção na sessão {indice}: {app.exception[0].value}")
+        estados.append({chave: app.session_state[chave] for chave in app.session_state})
+    return estados
+
+
+def verificar(medidas, tolerancia_mb=TOLERANCIA_MB):
+    """Crescimento do RSS (MB) entre a primeira e a última medida e se ficou dentro da tolerância"""
+    inicial, final = medidas[0]["rss_mb"], medidas[-1]["rss_mb"]
+    crescimento = final - inicial
+    return crescimento, crescimento <= max(tolerancia_mb, inicial * TOLERANCIA_RELATIVA)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RSS do processo com várias sessões sobre a mesma base")
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--sessoes", type=int, nargs="+", default=SESSOES_PADRAO)
+    parser.add_argument("--estados", type=int, default=8, help="estados de filtros distintos percorridos pelas sessões")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--tolerancia-mb", type=float, default=TOLERANCIA_MB)
+    parser.add_argument("--sessoes-app", type=int, default=SESSOES_APP, help="sessões do app.py executadas no AppTest")
+    argumentos = parser.parse_args()
+
+    resultados, bytes_tabela = medir(argumentos.linhas, argumentos.sessoes, argumentos.estados, argumentos.semente)
+    for medida in resultados:
+        print(f"{medida['sessoes']:>6} sessões  {medida['rss_mb']:>9.1f} MB  ({medida['bytes_por_sessao']} bytes de estado por sessão)")
+    aumento, dentro = verificar(resultados, argumentos.tolerancia_mb)
+    print(f"Crescimento: {aumento:.1f} MB (uma cópia da tabela por sessão custaria {bytes_tabela / 2**20:.1f} MB cada)")
+
+    estados_reais = estados_app(sintetico.garantir_dados(argumentos.linhas, argumentos.semente), argumentos.sessoes_app)
+    pesados = {chave for estado in estados_reais for chave in valores_pesados(estado)}
+    tamanho_real = sum(len(pickle.dumps(estado)) for estado in estados_reais) / max(len(estados_reais), 1)
+    print(f"{len(estados_reais)} sessões do app.py: {tamanho_real:.0f} bytes de st.session_state por sessão")
+    for chave in sorted(pesados):
+        print(f"DADOS NA SESSÃO: st.session_state[{chave!r}]")
+    raise SystemExit(0 if dentro and not pesados else 1)
@@ -0,0 +1,164 @@
+"""Gerador de relatórios SNISB × SIOUT sintéticos, com o mesmo esquema do relatório real.
+
+As barragens ficam dentro do Rio Grande do Sul e parte delas compartilha o
+mesmo polígono ANA (reuso parecido com o de POLIGONO_ANA: cerca de 0,4
+polígono distinto por barragem, com alguns polígonos muito repetidos). Os
+polígonos têm número de vértices variável (distribuição log-normal, de
+dezenas a milhares), para que o tamanho dos WKT se aproxime do real. O
+gerador também produz um extrato SIOUT correspondente, usado pela comparação.
+
+Uso::
+
+    python -m benchmark.sintetico 100000 [--pasta benchmark/dados/100000] [--semente 0]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from nucleo import ingestao
+
+# Pasta padrão dos conjuntos gerados (um subdiretório por número de linhas)
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+
+# Polígonos distintos por barragem e fração de barragens sem polígono
+PROPORCAO_POLIGONOS = 0.4
+FRACAO_SEM_POLIGONO = 0.05
+
+# Vértices por polígono: log-normal com mediana ~120, limitada ao intervalo abaixo
+MEDIANA_VERTICES = 120
+DISPERSAO_VERTICES = 0.8
+LIMITES_VERTICES = (8, 4000)
+
+# Área aproximada do Rio Grande do Sul (sul, oeste, norte, leste)
+LIMITES_RS = (-33.5, -57.5, -27.2, -49.8)
+
+NOME_EXTRATO_SIOUT = "EXTRATO_SIOUT.csv"
+
+SITUACOES_CADASTRO = (['Selecionado para validação', 'Descartado por duplicidade', 'Descartado por hierarquia'], [0.7, 0.2, 0.1])
+SITUACOES_COMPARACAO = ['Totalmente compatível', 'Compatível parcialmente', 'Compatível apenas geograficamente', 'Incompatível', 'Não aplicado']
+SITUACOES_MASSA = ['Compatível com polígono ANA', 'forte_inidicio_agua_satelite', 'Não aplicado']
+USOS = ['Irrigação', 'Dessedentação Animal', 'Industrial', 'Abastecimento Humano', 'Paisagismo', 'Aquicultura']
+MATERIAIS = ['Terra', 'Concreto', 'CCR', 'Sem Informação']
+
+
+def _poligonos(gerador, quantidade):
+    """WKT de polígonos irregulares (massas d'água) com número de vértices variável; retorna (wkts, centros)"""
+    sul, oeste, norte, leste = LIMITES_RS
+    centros = np.column_stack([gerador.uniform(oeste, leste, quantidade), gerador.uniform(sul, norte, quantidade)])
+    vertices = np.clip(
+        np.round(gerador.lognormal(np.log(MEDIANA_VERTICES), DISPERSAO_VERTICES, quantidade)), *LIMITES_VERTICES
+    ).astype(np.int64)
+    raios = gerador.uniform(0.002, 0.02, quantidade)
+    wkts = np.empty(quantidade, dtype=object)
+    # Polígonos com o mesmo número de vértices são montados juntos (vetorizado no shapely)
+    for n in np.unique(vertices):
+        grupo = np.flatnonzero(vertices == n)
+        angulos = np.linspace(0, 2 * np.pi, n, endpoint=False)
+        ruido = 1 + 0.15 * gerador.standard_normal((len(grupo), n))
+        x = centros[grupo, 0, None] + raios[grupo, None] * ruido * np.cos(angulos)
+        y = centros[grupo, 1, None] + raios[grupo, None] * ruido * np.sin(angulos) * 0.8
+        aneis = np.stack([x, y], axis=-1)
+        aneis = np.concatenate([aneis, aneis[:, :1]], axis=1)
+        wkts[grupo] = shapely.to_wkt(shapely.polygons(aneis), rounding_precision=6)
+    return wkts, centros
+
+
+def gerar_relatorio(linhas, semente=0):
+    """Relatório sintético com as colunas do RELATORIO_FINAL_SNISB_SIOUT"""
+    gerador = np.random.default_rng(semente)
+    total_poligonos = max(1, int(linhas * PROPORCAO_POLIGONOS))
+    wkts, centros = _poligonos(gerador, total_poligonos)
+
+    # Reuso desigual: alguns polígonos (grandes reservatórios) concentram muitas barragens
+    pesos = gerador.pareto(1.5, total_poligonos) + 1
+    id_poligono = gerador.choice(total_poligonos, linhas, p=pesos / pesos.sum())
+    sem_poligono = gerador.random(linhas) < FRACAO_SEM_POLIGONO
+    poligono = wkts[id_poligono]
+    poligono[sem_poligono] = None
+
+    sul, oeste, norte, leste = LIMITES_RS
+    longitude = np.where(sem_poligono, gerador.uniform(oeste, leste, linhas), centros[id_poligono, 0])
+    latitude = np.where(sem_poligono, gerador.uniform(sul, norte, linhas), centros[id_poligono, 1])
+    longitude = longitude + gerador.normal(0, 0.001, linhas)
+    latitude = latitude + gerador.normal(0, 0.001, linhas)
+
+    empreendedores = np.array([f'EMPREENDEDOR {i}' for i in range(max(1, linhas // 3))], dtype=object)
+    autorizacoes = np.char.add(
+        np.char.add(gerador.integers(1, 9999, linhas).astype(str), '/20'),
+        gerador.integers(10, 25, linhas).astype(str)
+    ).astype(object)
+    cadastro, pesos_cadastro = SITUACOES_CADASTRO
+    return pd.DataFrame({
+        'CODIGO_SNISB': (100000 + np.arange(linhas)).astype(str),
+        'DATA_DO_CADASTRO': pd.Timestamp('2010-01-01') + pd.to_timedelta(gerador.integers(0, 5000, linhas), unit='D'),
+        'CODIGO_BARRAGEM_ENTIDADE': np.char.add('RS', np.arange(linhas).astype(str)),
+        'CODIGO_SIOUT': gerador.integers(1, 999999, linhas),
+        'AUTORIZACAO_NUM': autorizacoes,
+        'AUTORIZACAO_SIOUT': np.where(gerador.random(linhas) < 0.6, autorizacoes, np.roll(autorizacoes, 1)),
+        'USO_SNISB': gerador.choice(USOS, linhas),
+        'USO_SIOUT': gerador.choice(USOS, linhas),
+        'EMPREENDEDOR_SNISB': gerador.choice(empreendedores, linhas),
+        'EMPREENDEDOR_SIOUT': gerador.choice(empreendedores, linhas),
+        'SITUACAO_CADASTRO_SNISB': gerador.choice(cadastro, linhas, p=pesos_cadastro),
+        'SITUACAO_COMPARACAO_SIOUT': gerador.choice(SITUACOES_COMPARACAO, linhas),
+        'SITUACAO_MASSA_DAGUA': np.where(sem_poligono, 'Não aplicado', gerador.choice(SITUACOES_MASSA, linhas)),
+        'GID': np.arange(linhas),
+        'ALTURA_MAX_FUNDACAO': gerador.uniform(1, 20, linhas).round(2),
+        'ALTURA_MAX_NIVEL_TERRENO': gerador.uniform(1, 15, linhas).round(2),
+        'CAPACIDADE_TOTAL': gerador.uniform(1e3, 1e6, linhas).round(0),
+        'COROAMENTO': gerador.uniform(2, 8, linhas).round(2),
+        'TIPO_DE_MATERIAL': gerador.choice(MATERIAIS, linhas),
+        'LATITUDE': latitude.round(6),
+        'LONGITUDE': longitude.round(6),
+        'ID_SIOUT': gerador.integers(1, 999999, linhas),
+        'POLIGONO_ANA': poligono
+    })
+
+
+def gerar_extrato_siout(relatorio, semente=0):
+    """Extrato SIOUT com ~75% das barragens, coordenadas deslocadas e parte dos campos divergentes"""
+    gerador = np.random.default_rng(semente + 1)
+    presentes = gerador.random(len(relatorio)) < 0.75
+    origem = relatorio[presentes]
+    n = len(origem)
+    divergente = gerador.random((n, 4)) < 0.3
+    extrato = pd.DataFrame({
+        'ID_SIOUT': np.arange(1, n + 1),
+        'CODIGO_SIOUT': origem['CODIGO_BARRAGEM_ENTIDADE'].str.replace('RS', '', regex=False).to_numpy(dtype=object),
+        'AUTORIZACAO_SIOUT': origem['AUTORIZACAO_NUM'].to_numpy(dtype=object),
+        'USO_SIOUT': origem['USO_SNISB'].str.upper().to_numpy(dtype=object),
+        'EMPREENDEDOR_SIOUT': (origem['EMPREENDEDOR_SNISB'] + ' LTDA').to_numpy(dtype=object),
+        'LATITUDE': origem['LATITUDE'].to_numpy() + gerador.normal(0, 0.0008, n),
+        'LONGITUDE': origem['LONGITUDE'].to_numpy() + gerador.normal(0, 0.0008, n)
+    })
+    for coluna, divergir in zip(['EMPREENDEDOR_SIOUT', 'USO_SIOUT', 'CODIGO_SIOUT', 'AUTORIZACAO_SIOUT'], divergente.T):
+        extrato.loc[divergir, coluna] = extrato[coluna].to_numpy()[gerador.permutation(n)][divergir]
+    return extrato
+
+
+def garantir_dados(linhas, semente=0, pasta=None):
+    """Gera (uma única vez) o relatório e o extrato SIOUT sintéticos; retorna a pasta dos dados"""
+    pasta = pasta or os.path.join(PASTA_DADOS, f"{linhas}_{semente}")
+    caminho_relatorio = os.path.join(pasta, ingestao.NOME_BASE + ".csv")
+    caminho_extrato = os.path.join(pasta, NOME_EXTRATO_SIOUT)
+    if os.path.exists(caminho_relatorio) and os.path.exists(caminho_extrato):
+        return pasta
+    os.makedirs(pasta, exist_ok=True)
+    relatorio = gerar_relatorio(linhas, semente)
+    gerar_extrato_siout(relatorio, semente).to_csv(caminho_extrato, index=False, encoding='utf-8-sig')
+    temporario = caminho_relatorio + ".tmp"
+    relatorio.to_csv(temporario, index=False, encoding='utf-8-sig')
+    os.replace(temporario, caminho_relatorio)
+    return pasta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um relatório SNISB × SIOUT sintético")
+    parser.add_argument("linhas", type=int)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--pasta", help="pasta de destino (padrão: benchmark/dados/<linhas>_<semente>)")
+    argumentos = parser.parse_args()
+    print(f"Dados gerados em {garantir_dados(argumentos.linhas, argumentos.semente, argumentos.pasta)}")
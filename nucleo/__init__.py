@@ -0,0 +1 @@
+"""Núcleo de dados da Ferramenta de Comparação de Registros SNISB vs SIOUT-RS"""
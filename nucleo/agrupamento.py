@@ -0,0 +1,162 @@
+"""Agrupamento espacial dos pontos das barragens conforme o zoom do mapa.
+
+Cada ponto recebe no carregamento as coordenadas inteiras da sua célula no
+nível mais fino de uma grade hierárquica (Web Mercator). A célula de um ponto
+em qualquer zoom é obtida por um deslocamento de bits dessas coordenadas, de
+modo que agrupar uma seleção é apenas um np.unique sobre inteiros. O número de
+grupos devolvidos depende da área visível, não da quantidade de registros.
+
+A área visível é arredondada para a faixa de células que a cobre
+(``celulas_visiveis``); as linhas dessa faixa vêm do índice espacial
+(ver ``nucleo.espacial``).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from nucleo.status import CORES_STATUS
+
+# Nível mais fino da grade (células de 2^-NIVEL_MAXIMO do mundo em cada eixo)
+NIVEL_MAXIMO = 26
+
+# Níveis da grade abaixo do tile de cada zoom: 2 = tiles de 256 px em células de 64 px
+_NIVEIS_POR_TILE = 2
+
+# A partir deste zoom os pontos são exibidos individualmente
+ZOOM_PONTOS_INDIVIDUAIS = 13
+
+# Células extras ao redor da área visível (evita pontos surgindo nas bordas ao arrastar)
+MARGEM_CELULAS = 1
+
+# Área considerada válida para os pontos (sul, oeste, norte, leste): Brasil aproximado
+LIMITES_BRASIL = (-34.0, -74.0, 6.0, -28.0)
+
+_LATITUDE_MAXIMA = 85.05112878
+
+
+def coordenadas_grade(latitude, longitude, nivel=NIVEL_MAXIMO):
+    """Coordenadas inteiras (coluna, linha) das células Web Mercator no nível informado"""
+    latitude = np.clip(np.asarray(latitude, dtype=float), -_LATITUDE_MAXIMA, _LATITUDE_MAXIMA)
+    longitude = np.asarray(longitude, dtype=float)
+    x = (longitude + 180.0) / 360.0
+    seno = np.sin(np.radians(latitude))
+    y = 0.5 - np.log((1 + seno) / (1 - seno)) / (4 * np.pi)
+    n = 1 << nivel
+    coluna = np.clip(np.floor(x * n), 0, n - 1).astype(np.uint32)
+    linha = np.clip(np.floor(y * n), 0, n - 1).astype(np.uint32)
+    return coluna, linha
+
+
+def nivel_para_zoom(zoom):
+    """Nível da grade usado para agrupar no zoom informado"""
+    return min(int(zoom) + _NIVEIS_POR_TILE, NIVEL_MAXIMO)
+
+
+def celulas_visiveis(zoom, limites):
+    """Faixa de células (nível, coluna mín/máx, linha mín/máx) que cobre a área visível, com margem
+
+    Serve também como chave de cache: áreas dentro das mesmas células dão o mesmo agrupamento.
+    """
+    sul, oeste, norte, leste = limites
+    nivel = nivel_para_zoom(zoom)
+    colunas, linhas = coordenadas_grade([norte, sul], [oeste, leste], nivel)
+    return (
+        nivel,
+        int(colunas[0]) - MARGEM_CELULAS, int(colunas[1]) + MARGEM_CELULAS,
+        int(linhas[0]) - MARGEM_CELULAS, int(linhas[1]) + MARGEM_CELULAS
+    )
+
+
+def limites_leaflet(bounds):
+    """Converte os limites de um mapa Leaflet ({_southWest, _northEast}) em (sul, oeste, norte, leste)"""
+    try:
+        sudoeste, nordeste = bounds['_southWest'], bounds['_northEast']
+        limites = (sudoeste['lat'], sudoeste['lng'], nordeste['lat'], nordeste['lng'])
+    except (KeyError, TypeError):
+        return None
+    if any(valor is None for valor in limites):
+        return None
+    return tuple(float(valor) for valor in limites)
+
+
+def limites_celulas(area):
+    """Limites (sul, oeste, norte, leste) de uma faixa de células devolvida por celulas_visiveis"""
+    nivel, coluna_min, coluna_max, linha_min, linha_max = area
+    n = 1 << nivel
+    oeste, leste = (np.array([coluna_min, coluna_max + 1]) / n) * 360.0 - 180.0
+    norte, sul = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.array([linha_min, linha_max + 1]) / n))))
+    return float(sul), float(oeste), float(norte), float(leste)
+
+
+@dataclass(frozen=True)
+class Agrupamento:
+    """Grupos de pontos de uma seleção, em um zoom e área visível
+
+    latitude/longitude: centro (média) de cada grupo; total: pontos por grupo;
+    contagens: pontos por grupo e código de status (colunas na ordem de CORES_STATUS);
+    individuais: posições das linhas exibidas como pontos isolados.
+    """
+    latitude: np.ndarray
+    longitude: np.ndarray
+    total: np.ndarray
+    contagens: np.ndarray
+    individuais: np.ndarray
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, campo).nbytes for campo in self.__dataclass_fields__)
+
+
+class GradeHierarquica:
+    """Grade hierárquica pré-calculada sobre LATITUDE/LONGITUDE de todas as linhas"""
+
+    def __init__(self, tabela, status):
+        latitude = pd.to_numeric(tabela['LATITUDE'], errors='coerce').to_numpy(dtype=float)
+        longitude = pd.to_numeric(tabela['LONGITUDE'], errors='coerce').to_numpy(dtype=float)
+        sul, oeste, norte, leste = LIMITES_BRASIL
+        self.validos = (latitude >= sul) & (latitude <= norte) & (longitude >= oeste) & (longitude <= leste)
+        self.latitude = np.where(self.validos, latitude, 0.0)
+        self.longitude = np.where(self.validos, longitude, 0.0)
+        self.coluna, self.linha = coordenadas_grade(self.latitude, self.longitude)
+        self.status = np.asarray(status, dtype=np.int64)
+
+    def agrupar(self, posicoes, zoom):
+        """Agrupa as posições (já restritas à área visível) no zoom informado
+
+        Grupos com um único ponto e todos os pontos a partir de ZOOM_PONTOS_INDIVIDUAIS
+        são devolvidos em ``individuais``.
+        """
+        posicoes = np.asarray(posicoes, dtype=np.int64)
+        posicoes = posicoes[self.validos[posicoes]]
+
+        n_status = len(CORES_STATUS)
+        if zoom >= ZOOM_PONTOS_INDIVIDUAIS or len(posicoes) == 0:
+            vazio = np.empty(0)
+            return Agrupamento(
+                vazio, vazio, np.empty(0, dtype=np.int64), np.empty((0, n_status), dtype=np.int64), posicoes
+            )
+
+        deslocamento = NIVEL_MAXIMO - nivel_para_zoom(zoom)
+        celulas = (
+            (self.coluna[posicoes] >> deslocamento).astype(np.uint64) << np.uint64(32)
+        ) | (self.linha[posicoes] >> deslocamento).astype(np.uint64)
+        _, grupo, total = np.unique(celulas, return_inverse=True, return_counts=True)
+
+        isolados = total[grupo] == 1
+        agrupados = ~isolados
+        grupo = grupo[agrupados]
+        selecionadas = posicoes[agrupados]
+        manter = total > 1
+        # Reindexa apenas os grupos com mais de um ponto
+        novo_indice = np.cumsum(manter) - 1
+        grupo = novo_indice[grupo]
+        n_grupos = int(manter.sum())
+
+        soma_lat = np.bincount(grupo, weights=self.latitude[selecionadas], minlength=n_grupos)
+        soma_lon = np.bincount(grupo, weights=self.longitude[selecionadas], minlength=n_grupos)
+        total = total[manter]
+        contagens = np.bincount(
+            grupo * n_status + self.status[selecionadas], minlength=n_grupos * n_status
+        ).reshape(n_grupos, n_status)
+        return Agrupamento(soma_lat / total, soma_lon / total, total, contagens, posicoes[isolados])
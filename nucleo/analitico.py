@@ -0,0 +1,235 @@
+"""Motor analítico embarcado (DuckDB) sobre o snapshot Arrow: filtros, contagens e exportações em SQL.
+
+A tabela do snapshot (lida via memory-map) e os WKT do armazém de geometrias
+são registrados no DuckDB sem cópia. O mesmo estado de filtros usado pelo
+índice invertido vira uma única consulta (``IN`` por coluna, ``BETWEEN`` no
+período), executada em paralelo pelo DuckDB, e as exportações CSV são gravadas
+direto em arquivo por ``COPY ... TO``, sem montar DataFrames no processo do
+aplicativo, com os mesmos bytes do caminho em lotes.
+
+Opcional: ativado com ``SIOUT_MOTOR=duckdb`` e o pacote ``duckdb`` instalado;
+quando ativo, a base (``BaseDados.filtrar``/``contar``/``exportar``) resolve
+nele os filtros, as contagens e as exportações CSV. Os demais formatos (JSON,
+JSON Lines, Parquet e XLSX) continuam gerados pelo caminho em lotes de
+``nucleo.exportacao`` sobre as posições filtradas pelo motor: o ``COPY`` do
+DuckDB escreve datas, números, escapes e tipos de outro jeito, e o arquivo
+baixado não pode mudar com ``SIOUT_MOTOR``.
+
+Uso::
+
+    python -m nucleo.analitico verificar [pasta_dados] [--casos 50]
+"""
+import argparse
+import codecs
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from nucleo import exportacao, geometria, indice, ingestao
+
+# Motor habilitado por variável de ambiente
+ATIVO = os.environ.get("SIOUT_MOTOR", "").lower() == "duckdb"
+
+# Formatos gravados pelo COPY do DuckDB (byte a byte iguais aos do caminho em lotes): extensão -> opções do COPY
+OPCOES_COPY = {
+    'csv': "FORMAT csv, DELIMITER ';', HEADER true"
+}
+
+TABELA_BARRAGENS = "barragens"
+TABELA_POLIGONOS = "poligonos_ana"
+COLUNA_POSICAO = "posicao"
+
+
+def disponivel():
+    """Indica se o pacote duckdb está instalado"""
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _identificador(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _literal(texto):
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+class MotorAnalitico:
+    """Conexão DuckDB com a tabela de atributos e os polígonos registrados como tabelas Arrow"""
+
+    def __init__(self, tabela, poligonos):
+        import duckdb
+
+        self.colunas = list(tabela.column_names)
+        posicoes = pa.array(np.arange(tabela.num_rows, dtype=np.int64))
+        self._tabelas = {
+            TABELA_BARRAGENS: tabela.append_column(COLUNA_POSICAO, posicoes),
+            TABELA_POLIGONOS: poligonos
+        }
+        self._conexao = duckdb.connect()
+
+        # Datas sem hora são exportadas como DATE (mesmo texto do pandas: AAAA-MM-DD)
+        self._datas_sem_hora = set()
+        for campo in tabela.schema:
+            if pa.types.is_timestamp(campo.type):
+                coluna = _identificador(campo.name)
+                with self._cursor() as cursor:
+                    sem_hora = cursor.execute(
+                        f"SELECT coalesce(bool_and(CAST({coluna} AS DATE) = {coluna}), true) FROM {TABELA_BARRAGENS}"
+                    ).fetchone()[0]
+                if sem_hora:
+                    self._datas_sem_hora.add(campo.name)
+
+    @classmethod
+    def abrir(cls, caminho_snapshot, armazem):
+        """Motor sobre o snapshot gravado pela ingestão e o armazém de geometrias da mesma versão"""
+        return cls(ingestao.abrir_snapshot(caminho_snapshot), armazem.tabela_wkt())
+
+    def _cursor(self):
+        """Cursor próprio da consulta (seguro entre threads), com as tabelas Arrow registradas sem cópia"""
+        cursor = self._conexao.cursor()
+        for nome, tabela in self._tabelas.items():
+            cursor.register(nome, tabela)
+        return cursor
+
+    def _onde(self, filtros, intervalo_datas=None):
+        """Cláusula WHERE e parâmetros equivalentes a IndiceFiltros.filtrar"""
+        condicoes, parametros = [], []
+        for coluna, valores in filtros.items():
+            if valores and coluna in self.colunas:
+                valores = list(valores)
+                condicoes.append(f"b.{_identificador(coluna)} IN ({', '.join('?' * len(valores))})")
+                parametros += [str(valor) if isinstance(valor, np.str_) else valor for valor in valores]
+        if intervalo_datas is not None and indice.COLUNA_DATA in self.colunas:
+            condicoes.append(f"b.{_identificador(indice.COLUNA_DATA)} BETWEEN ? AND ?")
+            parametros += [pd.Timestamp(data).to_pydatetime() for data in intervalo_datas]
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def _selecao(self, poligonos):
+        """Colunas exportadas, com ID_POLIGONO_ANA substituído pelo WKT conforme a opção de polígonos"""
+        expressoes = []
+        for coluna in self.colunas:
+            if coluna == geometria.COLUNA_ID:
+                if poligonos == exportacao.POLIGONOS_OMITIDOS:
+                    continue
+                wkt = "p.wkt"
+                if poligonos == exportacao.POLIGONOS_TRUNCADOS:
+                    wkt = f"left(p.wkt, {exportacao.LIMITE_CARACTERES_EXCEL})"
+                expressoes.append(f"{wkt} AS {_identificador(geometria.COLUNA_GEOMETRIA)}")
+            elif coluna in self._datas_sem_hora:
+                expressoes.append(f"CAST(b.{_identificador(coluna)} AS DATE) AS {_identificador(coluna)}")
+            else:
+                expressoes.append(f"b.{_identificador(coluna)}")
+        return ", ".join(expressoes)
+
+    def contar(self, filtros, intervalo_datas=None):
+        """Número de linhas que atendem aos filtros"""
+        onde, parametros = self._onde(filtros, intervalo_datas)
+        with self._cursor() as cursor:
+            return int(cursor.execute(f"SELECT count(*) FROM {TABELA_BARRAGENS} b{onde}", parametros).fetchone()[0])
+
+    def filtrar(self, filtros, intervalo_datas=None):
+        """Posições (ordenadas) das linhas que atendem aos filtros"""
+        onde, parametros = self._onde(filtros, intervalo_datas)
+        with self._cursor() as cursor:
+            resultado = cursor.execute(
+                f"SELECT {COLUNA_POSICAO} FROM {TABELA_BARRAGENS} b{onde} ORDER BY {COLUNA_POSICAO}", parametros
+            ).fetchnumpy()
+        return np.asarray(resultado[COLUNA_POSICAO], dtype=np.int64)
+
+    def consulta_exportacao(self, filtros, intervalo_datas=None, poligonos=exportacao.POLIGONOS_COMPLETOS):
+        """SQL (e parâmetros) das linhas exportadas, na ordem da tabela"""
+        onde, parametros = self._onde(filtros, intervalo_datas)
+        juncao = ""
+        if geometria.COLUNA_ID in self.colunas and poligonos != exportacao.POLIGONOS_OMITIDOS:
+            juncao = f" LEFT JOIN {TABELA_POLIGONOS} p ON p.id = b.{_identificador(geometria.COLUNA_ID)}"
+        sql = (
+            f"SELECT {self._selecao(poligonos)} FROM {TABELA_BARRAGENS} b{juncao}{onde} "
+            f"ORDER BY b.{COLUNA_POSICAO}"
+        )
+        return sql, parametros
+
+    def exportar(self, filtros, intervalo_datas, formato, poligonos=exportacao.POLIGONOS_COMPLETOS, pasta=None):
+        """Grava as linhas filtradas com COPY ... TO em um arquivo temporário e retorna o ArquivoExportado"""
+        if formato not in OPCOES_COPY:
+            raise ValueError(f"Formato não exportado pelo motor analítico: {formato}")
+        sql, parametros = self.consulta_exportacao(filtros, intervalo_datas, poligonos)
+        descritor, caminho = tempfile.mkstemp(suffix=f".{formato}", prefix="exportacao_", dir=pasta)
+        os.close(descritor)
+        # CSV recebe o BOM UTF-8 (como no caminho em lotes), que o COPY não grava
+        destino = caminho + ".corpo" if formato == 'csv' else caminho
+        try:
+            with self._cursor() as cursor:
+                cursor.execute(f"COPY ({sql}) TO {_literal(destino)} ({OPCOES_COPY[formato]})", parametros)
+            if formato == 'csv':
+                with open(caminho, 'wb') as arquivo, open(destino, 'rb') as corpo:
+                    arquivo.write(codecs.BOM_UTF8)
+                    shutil.copyfileobj(corpo, arquivo, 1 << 20)
+                os.remove(destino)
+        except BaseException:
+            for temporario in {caminho, destino}:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+            raise
+        return exportacao.ArquivoExportado(caminho)
+
+
+def _conteudo(arquivo):
+    """Bytes de um ArquivoExportado, removido em seguida"""
+    try:
+        with open(arquivo.caminho, 'rb') as aberto:
+            return aberto.read()
+    finally:
+        arquivo.remover()
+
+
+def verificar_equivalencia(base, motor, casos=50, semente=0):
+    """Compara filtros, contagens e arquivos exportados do motor com a base em memória; retorna as divergências
+
+    O esperado vem do índice invertido da base (não de ``base.filtrar``, que usa o próprio motor quando
+    habilitado), e os arquivos do COPY são comparados byte a byte com os do caminho em lotes.
+    """
+    from nucleo.banco import casos_aleatorios
+
+    opcoes_poligonos = [exportacao.POLIGONOS_COMPLETOS, exportacao.POLIGONOS_TRUNCADOS, exportacao.POLIGONOS_OMITIDOS]
+    divergencias = []
+    for numero, (filtros, intervalo_datas) in enumerate(casos_aleatorios(base, casos, semente)):
+        caso = f"filtros={filtros} período={intervalo_datas}"
+        esperadas = base.indice.filtrar(filtros, intervalo_datas)
+        if not np.array_equal(motor.filtrar(filtros, intervalo_datas), esperadas):
+            divergencias.append(f"filtrar: {caso}")
+        if motor.contar(filtros, intervalo_datas) != len(esperadas):
+            divergencias.append(f"contar: {caso}")
+        poligonos = opcoes_poligonos[numero % len(opcoes_poligonos)]
+        for formato in OPCOES_COPY:
+            obtido = _conteudo(motor.exportar(filtros, intervalo_datas, formato, poligonos))
+            lotes = exportacao.gerar_lotes(base.tabela, esperadas, base.geometrias, poligonos)
+            if obtido != _conteudo(exportacao.exportar_arquivo(lotes, formato)):
+                divergencias.append(f"exportar[{formato}, {poligonos}]: {caso}")
+    return divergencias
+
+
+if __name__ == "__main__":
+    from nucleo import dados
+
+    parser = argparse.ArgumentParser(description="Motor analítico (DuckDB) sobre o snapshot dos dados")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    parser_verificar = subcomandos.add_parser("verificar", help="compara o motor com a base em memória")
+    parser_verificar.add_argument("pasta", nargs="?", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser_verificar.add_argument("--casos", type=int, default=50)
+    argumentos = parser.parse_args()
+
+    base_dados = dados.carregar(argumentos.pasta)
+    motor_analitico = MotorAnalitico.abrir(base_dados.caminho_snapshot, base_dados.geometrias)
+    encontradas = verificar_equivalencia(base_dados, motor_analitico, argumentos.casos)
+    for divergencia in encontradas:
+        print(f"DIVERGÊNCIA {divergencia}")
+    print(f"{argumentos.casos} casos verificados, {len(encontradas)} divergências")
+    raise SystemExit(1 if encontradas else 0)
@@ -0,0 +1,225 @@
+"""Atualização incremental da base quando o arquivo de origem muda.
+
+A mudança é detectada pelo hash do conteúdo (tamanho e mtime servem apenas de
+atalho, ver ``ingestao.hash_fonte``). O novo extrato é comparado com a base
+vigente por CODIGO_SNISB (e ordem de ocorrência, para códigos repetidos) e por
+um hash de cada linha, incluindo o WKT do polígono. Linhas iguais são
+reaproveitadas da base vigente; apenas as inseridas e alteradas vêm do novo
+extrato, e só os polígonos ainda ausentes do armazém de geometrias são
+interpretados e simplificados. O snapshot resultante é gravado com o hash da
+nova origem, que passa a ser a versão da base (``BaseDados.versao``) usada
+como chave por todos os caches.
+
+O novo extrato ainda é lido e comparado por inteiro (o CSV não permite ler só
+as linhas alteradas), e a nova base é carregada do snapshot gravado. Quando as
+linhas mantêm as posições (nenhuma inserida ou removida), o índice e o
+catálogo das colunas sem mudanças são reaproveitados da base anterior; do
+contrário são refeitos. Status é sempre recalculado, e grade e índice espacial
+são montados sob demanda. A base anterior continua válida para quem ainda a
+usa: seus arquivos (snapshot, geometrias, exportações) só são removidos quando
+ela deixa de ser referenciada.
+"""
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from nucleo import dados, geometria, ingestao
+
+# Coluna que identifica a barragem entre extratos
+COLUNA_CHAVE = 'CODIGO_SNISB'
+
+# Acima desta fração de linhas inseridas ou alteradas, a origem é convertida por completo
+LIMITE_DELTA = 0.5
+
+_MULTIPLICADOR_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+@dataclass(frozen=True)
+class Delta:
+    """Diferenças entre a base vigente e um novo extrato
+
+    origem: para cada linha do novo extrato, a posição da linha igual na base vigente (-1 = inserida ou alterada);
+    inseridas/atualizadas: posições no novo extrato; removidas: posições na base vigente.
+    """
+    origem: np.ndarray
+    inseridas: np.ndarray
+    atualizadas: np.ndarray
+    removidas: np.ndarray
+
+    @property
+    def alteradas(self):
+        """Linhas do novo extrato que não vêm da base vigente"""
+        return len(self.inseridas) + len(self.atualizadas)
+
+    def resumo(self):
+        return {
+            "inseridas": len(self.inseridas),
+            "atualizadas": len(self.atualizadas),
+            "removidas": len(self.removidas),
+            "mantidas": int((self.origem >= 0).sum())
+        }
+
+
+def _chaves(df):
+    """CODIGO_SNISB e número da ocorrência de cada linha (distingue códigos repetidos)"""
+    codigo = df[COLUNA_CHAVE].astype(object)
+    ocorrencia = codigo.groupby(codigo, dropna=False, sort=False).cumcount()
+    return pd.MultiIndex.from_arrays([codigo.to_numpy(), ocorrencia.to_numpy()])
+
+
+def _normalizar_para_hash(serie):
+    """Representação estável entre CSV e snapshot: datas em ns, números em float, demais valores como objeto"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.astype('datetime64[ns]')
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    serie = serie.astype(object)
+    return serie.where(serie.notna(), None)
+
+
+def _hash_textos(valores):
+    """Hash de cada texto (0 para ausentes), calculado uma vez por valor distinto"""
+    codigos, distintos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=True)
+    hashes = np.append(pd.util.hash_array(np.asarray(distintos, dtype=object)), np.uint64(0))
+    return hashes[codigos]
+
+
+def hash_linhas(df, colunas, hash_geometria):
+    """Hash de cada linha sobre as colunas de atributos, combinado ao hash do WKT do polígono"""
+    atributos = pd.DataFrame({coluna: _normalizar_para_hash(df[coluna]) for coluna in colunas})
+    hashes = pd.util.hash_pandas_object(atributos, index=False).to_numpy()
+    return hashes ^ (hash_geometria * _MULTIPLICADOR_HASH)
+
+
+def calcular_delta(base, nova):
+    """Delta entre a base vigente e o novo extrato (lido com ingestao.ler_fonte); None se as colunas mudaram"""
+    colunas_atual = [coluna for coluna in base.tabela.columns if coluna != geometria.COLUNA_ID]
+    colunas_nova = [coluna for coluna in nova.columns if coluna != geometria.COLUNA_GEOMETRIA]
+    if COLUNA_CHAVE not in nova.columns or set(colunas_atual) != set(colunas_nova):
+        return None
+    if (geometria.COLUNA_ID in base.tabela.columns) != (geometria.COLUNA_GEOMETRIA in nova.columns):
+        return None
+
+    geometria_atual = np.zeros(len(base.tabela), dtype=np.uint64)
+    geometria_nova = np.zeros(len(nova), dtype=np.uint64)
+    if geometria.COLUNA_ID in base.tabela.columns:
+        ids = base.tabela[geometria.COLUNA_ID].to_numpy()
+        hashes_armazem = np.append(_hash_textos(base.geometrias.wkt(np.arange(len(base.geometrias)))), np.uint64(0))
+        geometria_atual = hashes_armazem[ids]
+        geometria_nova = _hash_textos(nova[geometria.COLUNA_GEOMETRIA])
+    hash_atual = hash_linhas(base.tabela, colunas_nova, geometria_atual)
+    hash_nova = hash_linhas(nova, colunas_nova, geometria_nova)
+
+    posicao_atual = _chaves(base.tabela).get_indexer(_chaves(nova))
+    existentes = posicao_atual >= 0
+    iguais = existentes & (hash_atual[np.where(existentes, posicao_atual, 0)] == hash_nova)
+    return Delta(
+        origem=np.where(iguais, posicao_atual, -1),
+        inseridas=np.flatnonzero(~existentes),
+        atualizadas=np.flatnonzero(existentes & ~iguais),
+        removidas=np.setdiff1d(np.arange(len(base.tabela)), posicao_atual[existentes], assume_unique=True)
+    )
+
+
+def aplicar_delta(base, nova, delta, caminho_fonte, hash_origem):
+    """Grava o snapshot da nova origem a partir da base vigente e das linhas alteradas do novo extrato"""
+    pasta = os.path.dirname(os.path.abspath(caminho_fonte))
+    mantidas = np.flatnonzero(delta.origem >= 0)
+    alteradas = np.flatnonzero(delta.origem < 0)
+
+    parte_nova = nova.iloc[alteradas]
+    tabela_geometrias = None
+    if geometria.COLUNA_GEOMETRIA in nova.columns:
+        wkts = parte_nova[geometria.COLUNA_GEOMETRIA].to_numpy(dtype=object)
+        com_poligono = pd.notna(wkts)
+        ids = np.full(len(wkts), geometria.SEM_POLIGONO, dtype=np.int64)
+        ids_novos, tabela_geometrias = base.geometrias.ampliar(wkts[com_poligono].astype(str))
+        ids[com_poligono] = ids_novos
+        posicao = nova.columns.get_loc(geometria.COLUNA_GEOMETRIA)
+        parte_nova = parte_nova.drop(columns=[geometria.COLUNA_GEOMETRIA])
+        parte_nova.insert(posicao, geometria.COLUNA_ID, ids.astype(np.int32))
+
+    # Mesma ordem de linhas e colunas do novo extrato, como em uma conversão completa
+    parte_mantida = base.tabela.iloc[delta.origem[mantidas]][parte_nova.columns]
+    parte_mantida.index = mantidas
+    parte_nova.index = alteradas
+    tabela = pd.concat([parte_mantida, parte_nova]).sort_index().reset_index(drop=True)
+
+    destino_geometrias = ingestao.caminho_geometrias(pasta, hash_origem)
+    if tabela_geometrias is not None:
+        geometria.gravar_tabela(tabela_geometrias, destino_geometrias)
+    else:
+        geometria.gravar_armazem([], destino_geometrias)
+    ingestao.gravar_snapshot(ingestao.otimizar_tipos(tabela), ingestao.caminho_snapshot(pasta, hash_origem))
+    ingestao.registrar_snapshot(caminho_fonte, hash_origem)
+
+
+def atualizar(base, pasta):
+    """Grava o snapshot da versão atual da origem a partir das diferenças e carrega a nova base; retorna (base, delta)
+
+    delta é None quando o conteúdo não mudou ou a origem foi convertida por completo.
+    """
+    caminho_fonte = ingestao.localizar_fonte(pasta)
+    if caminho_fonte is None:
+        return base, None
+    hash_origem = ingestao.hash_fonte(caminho_fonte, ingestao.ler_manifesto(pasta))
+    if hash_origem == base.versao:
+        return base, None
+
+    nova = ingestao.ler_fonte(caminho_fonte)
+    delta = calcular_delta(base, nova)
+    if delta is None or delta.alteradas > LIMITE_DELTA * max(len(nova), 1):
+        ingestao.converter_para_snapshot(caminho_fonte, hash_origem, nova)
+        return dados.carregar(pasta), None
+
+    aplicar_delta(base, nova, delta, caminho_fonte, hash_origem)
+    # Mesmas linhas nas mesmas posições, exceto as que não vêm da mesma posição da base vigente
+    posicoes_alteradas = None
+    if len(nova) == len(base.tabela):
+        posicoes_alteradas = np.flatnonzero(delta.origem != np.arange(len(nova)))
+    return dados.carregar(pasta, base, posicoes_alteradas), delta
+
+
+class FonteDados:
+    """Base vigente de uma pasta de dados, substituída por uma nova versão quando a origem muda
+
+    Compartilhada entre sessões: ``atual()`` é chamado a cada rerun e só consulta
+    tamanho e mtime da origem; o hash e o delta são calculados apenas quando eles mudam.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.base = dados.carregar(pasta)
+        self.ultimo_delta = None
+        self._assinatura = self._assinatura_fonte()
+        self._trava = threading.Lock()
+
+    def _assinatura_fonte(self):
+        caminho = ingestao.localizar_fonte(self.pasta)
+        if caminho is None:
+            return None
+        stat = os.stat(caminho)
+        return caminho, stat.st_size, stat.st_mtime_ns
+
+    @property
+    def versao(self):
+        return self.base.versao
+
+    def atual(self):
+        """Base da versão vigente da origem, atualizada por delta se o arquivo mudou"""
+        assinatura = self._assinatura_fonte()
+        if assinatura is None or assinatura == self._assinatura:
+            return self.base
+        with self._trava:
+            if assinatura != self._assinatura:
+                anterior = self.base
+                self.base, delta = atualizar(anterior, self.pasta)
+                self._assinatura = assinatura
+                if self.base is not anterior:
+                    self.ultimo_delta = delta
+                    # Os arquivos da versão anterior (snapshot, geometrias e exportações) são removidos
+                    # quando a última referência a ela (reruns e downloads em andamento) deixa de existir
+        return self.base
@@ -0,0 +1,403 @@
+"""Backend opcional em PostgreSQL/PostGIS: filtros, contagem, paginação e área do mapa executados em SQL.
+
+A tabela de atributos é publicada uma vez por versão dos dados (``publicar``),
+com a posição de cada linha na base em memória (coluna ``posicao``), para que
+os resultados dos dois caminhos sejam comparáveis linha a linha. As consultas
+(``ConsultaSQL``) usam um engine SQLAlchemy com pool de conexões: filtros de
+múltipla seleção viram ``IN`` com parâmetros, o período vira ``BETWEEN``, as
+páginas são lidas por keyset (``posicao > :ultima``) quando a página anterior
+já foi lida e por ``OFFSET`` nos saltos, e a área visível do mapa usa o índice
+GiST (``geom && ST_MakeEnvelope``).
+
+Em outros bancos (ex.: SQLite, usado como substituto local do Postgres) as
+mesmas consultas rodam sem as colunas geométricas, com a área resolvida pelas
+colunas de coordenadas e de caixa envolvente. ``verificar_equivalencia``
+compara os resultados com a base em memória.
+
+Uso::
+
+    python -m nucleo.banco publicar [pasta_dados] [--url postgresql://...]
+    python -m nucleo.banco verificar [pasta_dados] [--url ...] [--casos 50]
+
+Requer ``sqlalchemy`` e um driver do banco (``psycopg2-binary`` para PostgreSQL).
+"""
+import argparse
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from nucleo import cache, espacial, geometria, indice, paginacao, status
+
+# URL do banco (SQLAlchemy); sem ela o aplicativo usa apenas a base em memória
+URL_BANCO = os.environ.get("SIOUT_URL_BANCO")
+
+TABELA_BARRAGENS = "barragens"
+TABELA_POLIGONOS = "poligonos_ana"
+TABELA_METADADOS = "metadados_base"
+
+# Pool de conexões por processo
+TAMANHO_POOL = 5
+CONEXOES_EXTRAS = 10
+RECICLAR_CONEXOES_S = 1800
+
+# Código do sistema de referência dos dados (SIRGAS 2000)
+SRID = 4674
+
+# Limites do cache de posições dos filtros (compartilhado entre sessões, como na base em memória)
+CAPACIDADE_CACHE_FILTROS = 256
+LIMITE_BYTES_CACHE_FILTROS = 64 * 1024 * 1024
+
+# Limites de páginas já lidas (última posição de cada página) mantidos para a paginação por keyset
+CAPACIDADE_LIMITES_PAGINAS = 1024
+
+# Intervalo entre leituras da versão publicada (segundos): após uma nova publicação, o banco
+# volta a ser usado quando a base em memória chega à mesma versão
+INTERVALO_VERSAO_S = 30.0
+
+# Colunas auxiliares da tabela publicada (não fazem parte da tabela de atributos)
+COLUNA_POSICAO = 'posicao'
+COLUNA_VALIDO = 'ponto_valido'
+
+
+def criar_engine(url=None):
+    """Engine SQLAlchemy com pool de conexões (pre-ping e reciclagem para conexões longas)"""
+    try:
+        import sqlalchemy as sa
+    except ImportError as erro:
+        raise RuntimeError("O backend de banco requer o pacote 'sqlalchemy'") from erro
+    url = url or URL_BANCO
+    if not url:
+        raise RuntimeError("Informe a URL do banco (SIOUT_URL_BANCO ou --url)")
+    if url.startswith("sqlite"):
+        return sa.create_engine(url)
+    return sa.create_engine(
+        url,
+        pool_size=TAMANHO_POOL,
+        max_overflow=CONEXOES_EXTRAS,
+        pool_pre_ping=True,
+        pool_recycle=RECICLAR_CONEXOES_S
+    )
+
+
+def _copiar_postgres(tabela, conexao, colunas, linhas):
+    """Método de inserção do pandas.to_sql via COPY (PostgreSQL)"""
+    buffer = io.StringIO()
+    pd.DataFrame(linhas, columns=colunas).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    nome = f'"{tabela.schema}"."{tabela.name}"' if tabela.schema else f'"{tabela.name}"'
+    lista_colunas = ", ".join(f'"{coluna}"' for coluna in colunas)
+    with conexao.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {nome} ({lista_colunas}) FROM STDIN WITH CSV", buffer)
+
+
+def _para_sql(df):
+    """Categorias como texto (o banco guarda os valores, não os códigos)"""
+    return df.apply(lambda serie: serie.astype(object) if isinstance(serie.dtype, pd.CategoricalDtype) else serie)
+
+
+def publicar(base, engine, tamanho_lote=20_000):
+    """Grava a tabela de atributos e os polígonos ANA da base no banco, com os índices das consultas"""
+    import sqlalchemy as sa
+
+    postgres = engine.dialect.name == "postgresql"
+    metodo = _copiar_postgres if postgres else "multi"
+
+    barragens = _para_sql(base.tabela)
+    barragens.insert(0, COLUNA_POSICAO, np.arange(len(barragens), dtype=np.int64))
+    barragens[COLUNA_VALIDO] = base.grade.validos
+
+    ids = np.arange(len(base.geometrias), dtype=np.int64)
+    validos = np.zeros(len(ids), dtype=bool)
+    validos[base.geometrias.ids_validos(ids)] = True
+    limites = base.geometrias.limites()
+    poligonos = pd.DataFrame({"id": ids, "wkt": base.geometrias.wkt(ids), "valido": validos})
+    for i, coluna in enumerate(geometria.COLUNAS_LIMITES):
+        poligonos[coluna] = limites[:, i]
+
+    with engine.begin() as conexao:
+        barragens.to_sql(TABELA_BARRAGENS, conexao, if_exists="replace", index=False, chunksize=tamanho_lote, method=metodo)
+        poligonos.to_sql(TABELA_POLIGONOS, conexao, if_exists="replace", index=False, chunksize=tamanho_lote, method=metodo)
+        pd.DataFrame({"versao": [base.versao]}).to_sql(TABELA_METADADOS, conexao, if_exists="replace", index=False)
+
+        comandos = [f'CREATE UNIQUE INDEX ON {TABELA_BARRAGENS} ({COLUNA_POSICAO})', f'CREATE UNIQUE INDEX ON {TABELA_POLIGONOS} (id)']
+        colunas_indexadas = [coluna for coluna in indice.COLUNAS_INDEXADAS + [indice.COLUNA_DATA] if coluna in barragens.columns]
+        if not postgres:
+            # Nomes explícitos: o SQLite exige nome em CREATE INDEX
+            comandos = [
+                f'CREATE UNIQUE INDEX ix_{TABELA_BARRAGENS}_{COLUNA_POSICAO} ON {TABELA_BARRAGENS} ({COLUNA_POSICAO})',
+                f'CREATE UNIQUE INDEX ix_{TABELA_POLIGONOS}_id ON {TABELA_POLIGONOS} (id)'
+            ] + [f'CREATE INDEX "ix_{TABELA_BARRAGENS}_{coluna}" ON {TABELA_BARRAGENS} ("{coluna}")' for coluna in colunas_indexadas]
+        else:
+            comandos += [f'CREATE INDEX ON {TABELA_BARRAGENS} ("{coluna}")' for coluna in colunas_indexadas]
+            comandos += [
+                f'ALTER TABLE {TABELA_BARRAGENS} ADD COLUMN geom geometry(Point, {SRID})',
+                f'UPDATE {TABELA_BARRAGENS} SET geom = ST_SetSRID(ST_MakePoint("LONGITUDE", "LATITUDE"), {SRID}) '
+                f'WHERE {COLUNA_VALIDO}',
+                f'CREATE INDEX ON {TABELA_BARRAGENS} USING GIST (geom)',
+                f'ALTER TABLE {TABELA_POLIGONOS} ADD COLUMN geom geometry(Geometry, {SRID})',
+                f'UPDATE {TABELA_POLIGONOS} SET geom = ST_GeomFromText(wkt, {SRID}) WHERE valido',
+                f'CREATE INDEX ON {TABELA_POLIGONOS} USING GIST (geom)',
+                f'ANALYZE {TABELA_BARRAGENS}',
+                f'ANALYZE {TABELA_POLIGONOS}'
+            ]
+        for comando in comandos:
+            conexao.execute(sa.text(comando))
+
+
+class ConsultaSQL:
+    """Filtros, contagem, páginas e área visível resolvidos no banco publicado por ``publicar``"""
+
+    def __init__(self, engine):
+        import sqlalchemy as sa
+
+        self._sa = sa
+        self.engine = engine
+        self.espacial = engine.dialect.name == "postgresql"
+        metadados = sa.MetaData()
+        self.barragens = sa.Table(TABELA_BARRAGENS, metadados, autoload_with=engine)
+        self.poligonos = sa.Table(TABELA_POLIGONOS, metadados, autoload_with=engine)
+        auxiliares = {COLUNA_POSICAO, COLUNA_VALIDO, "geom"}
+        self.colunas = [coluna for coluna in self.barragens.c if coluna.name not in auxiliares]
+        self._limites_paginas = cache.CacheLRU(CAPACIDADE_LIMITES_PAGINAS)
+        self.cache_filtros = cache.CacheLRU(CAPACIDADE_CACHE_FILTROS, LIMITE_BYTES_CACHE_FILTROS)
+        self._trava_versao = threading.Lock()
+        self._versao = None
+        self._versao_lida_em = None
+        # Primeira leitura já na criação: falha cedo se o banco ainda não foi publicado
+        self.versao
+
+    @property
+    def versao(self):
+        """Versão dos dados publicada, relida da tabela de metadados a cada INTERVALO_VERSAO_S
+
+        O banco só substitui a base em memória da mesma versão; as chaves dos caches incluem a
+        versão, então resultados de uma publicação anterior não são reaproveitados.
+        """
+        with self._trava_versao:
+            agora = time.monotonic()
+            if self._versao_lida_em is None or agora - self._versao_lida_em >= INTERVALO_VERSAO_S:
+                with self.engine.connect() as conexao:
+                    self._versao = conexao.execute(self._sa.text(f"SELECT versao FROM {TABELA_METADADOS}")).scalar_one()
+                self._versao_lida_em = agora
+            return self._versao
+
+    def _condicoes(self, filtros, intervalo_datas=None):
+        """Cláusulas WHERE equivalentes a IndiceFiltros.filtrar (OU dentro da coluna, E entre colunas)"""
+        condicoes = []
+        for coluna, valores in filtros.items():
+            if valores and coluna in self.barragens.c:
+                condicoes.append(self.barragens.c[coluna].in_(list(valores)))
+        if intervalo_datas is not None and indice.COLUNA_DATA in self.barragens.c:
+            inicio, fim = (pd.Timestamp(data).to_pydatetime() for data in intervalo_datas)
+            condicoes.append(self.barragens.c[indice.COLUNA_DATA].between(inicio, fim))
+        return condicoes
+
+    def _envelope_pontos(self, limites):
+        sa = self._sa
+        sul, oeste, norte, leste = limites
+        if self.espacial:
+            return self.barragens.c.geom.op("&&")(sa.func.ST_MakeEnvelope(oeste, sul, leste, norte, SRID))
+        return sa.and_(
+            self.barragens.c[COLUNA_VALIDO],
+            self.barragens.c.LATITUDE.between(sul, norte),
+            self.barragens.c.LONGITUDE.between(oeste, leste)
+        )
+
+    def _envelope_poligonos(self, limites):
+        sa = self._sa
+        sul, oeste, norte, leste = limites
+        if self.espacial:
+            return self.poligonos.c.geom.op("&&")(sa.func.ST_MakeEnvelope(oeste, sul, leste, norte, SRID))
+        return sa.and_(
+            self.poligonos.c.xmin <= leste, self.poligonos.c.xmax >= oeste,
+            self.poligonos.c.ymin <= norte, self.poligonos.c.ymax >= sul
+        )
+
+    def _posicoes(self, consulta):
+        with self.engine.connect() as conexao:
+            return np.asarray(conexao.execute(consulta).scalars().all(), dtype=np.int64)
+
+    def contar(self, filtros, intervalo_datas=None):
+        """Número de linhas que atendem aos filtros"""
+        sa = self._sa
+        consulta = sa.select(sa.func.count()).select_from(self.barragens).where(*self._condicoes(filtros, intervalo_datas))
+        with self.engine.connect() as conexao:
+            return int(conexao.execute(consulta).scalar_one())
+
+    def filtrar(self, filtros, intervalo_datas=None):
+        """Posições (ordenadas) das linhas que atendem aos filtros, memorizadas por estado normalizado dos filtros"""
+        def consultar():
+            posicao = self.barragens.c[COLUNA_POSICAO]
+            consulta = self._sa.select(posicao).where(*self._condicoes(filtros, intervalo_datas)).order_by(posicao)
+            posicoes = self._posicoes(consulta)
+            # Resultado compartilhado entre sessões: somente leitura
+            posicoes.setflags(write=False)
+            return posicoes
+
+        return self.cache_filtros.obter(cache.normalizar_filtros(filtros, intervalo_datas, self.versao), consultar)
+
+    def pagina(self, filtros, intervalo_datas, numero, registros_por_pagina=paginacao.REGISTROS_POR_PAGINA):
+        """Página da tabela (PaginaTabela), com o WKT dos polígonos e os estilos de status"""
+        sa = self._sa
+        posicao = self.barragens.c[COLUNA_POSICAO]
+        colunas = [
+            self.poligonos.c.wkt.label(geometria.COLUNA_GEOMETRIA) if coluna.name == geometria.COLUNA_ID else coluna
+            for coluna in self.colunas
+        ]
+        juncao = self.barragens
+        if geometria.COLUNA_ID in self.barragens.c:
+            juncao = self.barragens.outerjoin(self.poligonos, self.poligonos.c.id == self.barragens.c[geometria.COLUNA_ID])
+        consulta = (
+            sa.select(posicao, *colunas).select_from(juncao)
+            .where(*self._condicoes(filtros, intervalo_datas))
+            .order_by(posicao).limit(registros_por_pagina)
+        )
+
+        chave_filtros = cache.normalizar_filtros(filtros, intervalo_datas, self.versao)
+        if numero > 1:
+            # Keyset: continua a partir da última linha da página anterior, se ainda conhecida
+            # (lida uma única vez: pode sair do cache a qualquer momento); senão, OFFSET
+            ultima = self._limites_paginas.ler((chave_filtros, registros_por_pagina, numero - 1))
+            if ultima is not None:
+                consulta = consulta.where(posicao > ultima)
+            else:
+                consulta = consulta.offset((numero - 1) * registros_por_pagina)
+
+        with self.engine.connect() as conexao:
+            dados = pd.read_sql(consulta, conexao, index_col=COLUNA_POSICAO)
+        dados.index.name = None
+        if len(dados):
+            self._limites_paginas.guardar((chave_filtros, registros_por_pagina, numero), int(dados.index[-1]))
+
+        colunas_estilo = [coluna for coluna in status.COLUNAS_SITUACAO if coluna in dados.columns]
+        estilos = status.ClassificacaoStatus(dados).estilos(np.arange(len(dados)), colunas_estilo)
+        estilos.index = dados.index
+        return paginacao.PaginaTabela(dados, estilos, colunas_estilo)
+
+    def pontos_na_area(self, filtros, intervalo_datas, limites):
+        """Posições (ordenadas) das linhas filtradas com ponto válido dentro dos limites (sul, oeste, norte, leste)"""
+        posicao = self.barragens.c[COLUNA_POSICAO]
+        consulta = (
+            self._sa.select(posicao)
+            .where(*self._condicoes(filtros, intervalo_datas), self._envelope_pontos(limites))
+            .order_by(posicao)
+        )
+        return self._posicoes(consulta)
+
+    def poligonos_na_area(self, filtros, intervalo_datas, limites):
+        """Ids (ordenados) dos polígonos das linhas filtradas cuja caixa envolvente intersecta os limites"""
+        if geometria.COLUNA_ID not in self.barragens.c:
+            return np.empty(0, dtype=np.int64)
+        sa = self._sa
+        consulta = (
+            sa.select(self.poligonos.c.id).distinct()
+            .select_from(self.barragens.join(self.poligonos, self.poligonos.c.id == self.barragens.c[geometria.COLUNA_ID]))
+            .where(*self._condicoes(filtros, intervalo_datas), self.poligonos.c.valido, self._envelope_poligonos(limites))
+            .order_by(self.poligonos.c.id)
+        )
+        return self._posicoes(consulta)
+
+
+def casos_aleatorios(base, casos, semente):
+    """Estados de filtros aleatórios (1 a 3 colunas do catálogo, às vezes com período)"""
+    gerador = np.random.default_rng(semente)
+    colunas = list(base.catalogo)
+    datas = base.indice.datas
+    for _ in range(casos):
+        filtros = {}
+        for coluna in gerador.choice(colunas, size=min(len(colunas), int(gerador.integers(0, 4))), replace=False):
+            valores = base.catalogo[coluna].valores
+            escolhidos = gerador.choice(len(valores), size=min(len(valores), int(gerador.integers(1, 4))), replace=False)
+            filtros[str(coluna)] = [valores[i] for i in escolhidos]
+        intervalo_datas = None
+        if datas is not None and len(datas) and gerador.random() < 0.4:
+            inicio, fim = np.sort(gerador.choice(datas, 2))
+            intervalo_datas = (pd.Timestamp(inicio), pd.Timestamp(fim))
+        yield filtros, intervalo_datas
+
+
+def _limites_aleatorios(base, gerador):
+    """Caixa aleatória (sul, oeste, norte, leste) em torno de um ponto válido da base"""
+    validos = np.flatnonzero(base.grade.validos)
+    centro = gerador.choice(validos)
+    raio = gerador.uniform(0.05, 2.0)
+    latitude, longitude = base.grade.latitude[centro], base.grade.longitude[centro]
+    return latitude - raio, longitude - raio, latitude + raio, longitude + raio
+
+
+def _texto_pagina(dados):
+    """Valores da página como texto, para comparar resultados vindos de fontes com tipos diferentes"""
+    return dados.apply(lambda serie: serie.astype(object).map(lambda valor: None if pd.isna(valor) else str(valor)))
+
+
+def verificar_equivalencia(base, consulta, casos=50, semente=0):
+    """Compara filtros, contagens, páginas e área visível do banco com a base em memória; retorna as divergências"""
+    divergencias = []
+    gerador = np.random.default_rng(semente)
+    for filtros, intervalo_datas in casos_aleatorios(base, casos, semente):
+        caso = f"filtros={filtros} período={intervalo_datas}"
+        esperadas = base.filtrar(filtros, intervalo_datas)
+        if not np.array_equal(consulta.filtrar(filtros, intervalo_datas), esperadas):
+            divergencias.append(f"filtrar: {caso}")
+        if consulta.contar(filtros, intervalo_datas) != len(esperadas):
+            divergencias.append(f"contar: {caso}")
+
+        total_paginas = paginacao.contar_paginas(len(esperadas))
+        for numero in sorted({1, 2, total_paginas}):
+            if numero > total_paginas or not len(esperadas):
+                continue
+            obtida = consulta.pagina(filtros, intervalo_datas, numero)
+            esperada = base.pagina(filtros, intervalo_datas, numero)
+            if (
+                not obtida.dados.index.equals(esperada.dados.index)
+                or not _texto_pagina(obtida.dados).equals(_texto_pagina(esperada.dados[obtida.dados.columns]))
+                or not obtida.estilos.equals(esperada.estilos)
+            ):
+                divergencias.append(f"pagina {numero}: {caso}")
+
+        if base.grade.validos.any():
+            limites = _limites_aleatorios(base, gerador)
+            if not np.array_equal(
+                consulta.pontos_na_area(filtros, intervalo_datas, limites),
+                espacial.restringir(esperadas, base.espacial.pontos(limites))
+            ):
+                divergencias.append(f"pontos_na_area {limites}: {caso}")
+            if geometria.COLUNA_ID in base.tabela.columns:
+                ids = np.unique(base.tabela[geometria.COLUNA_ID].to_numpy()[esperadas]).astype(np.int64)
+                ids = base.geometrias.ids_validos(ids)
+                if not np.array_equal(
+                    consulta.poligonos_na_area(filtros, intervalo_datas, limites),
+                    espacial.restringir(ids, base.espacial.poligonos(limites))
+                ):
+                    divergencias.append(f"poligonos_na_area {limites}: {caso}")
+    return divergencias
+
+
+if __name__ == "__main__":
+    from nucleo import dados
+
+    parser = argparse.ArgumentParser(description="Backend PostgreSQL/PostGIS da base de barragens")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    for nome, ajuda in (("publicar", "grava a versão atual dos dados no banco"), ("verificar", "compara o banco com a base em memória")):
+        subparser = subcomandos.add_parser(nome, help=ajuda)
+        subparser.add_argument("pasta", nargs="?", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        subparser.add_argument("--url", default=URL_BANCO, help="URL SQLAlchemy do banco (padrão: SIOUT_URL_BANCO)")
+        if nome == "verificar":
+            subparser.add_argument("--casos", type=int, default=50)
+    argumentos = parser.parse_args()
+
+    base_dados = dados.carregar(argumentos.pasta)
+    engine_banco = criar_engine(argumentos.url)
+    if argumentos.comando == "publicar":
+        publicar(base_dados, engine_banco)
+        print(f"{len(base_dados.tabela)} barragens e {len(base_dados.geometrias)} polígonos publicados")
+    else:
+        encontradas = verificar_equivalencia(base_dados, ConsultaSQL(engine_banco), argumentos.casos)
+        for divergencia in encontradas:
+            print(f"DIVERGÊNCIA {divergencia}")
+        print(f"{argumentos.casos} casos verificados, {len(encontradas)} divergências")
+        raise SystemExit(1 if encontradas else 0)
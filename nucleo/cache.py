@@ -0,0 +1,138 @@
+"""Cache LRU limitado, seguro entre threads, com contadores de acertos e falhas (do processo e por thread).
+
+Usado para memorizar resultados compartilhados entre sessões do Streamlit
+(ex.: posições das linhas de cada combinação de filtros).
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class CacheLRU:
+    """Cache LRU limitado por número de entradas e (opcionalmente) por bytes
+
+    ao_remover: função chamada com cada valor descartado (ex.: apagar arquivo temporário)
+    """
+
+    def __init__(self, capacidade=256, limite_bytes=None, ao_remover=None):
+        self.capacidade = capacidade
+        self.limite_bytes = limite_bytes
+        self.ao_remover = ao_remover
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        # Contadores da thread atual (cada rerun do Streamlit roda na thread da sua sessão)
+        self._locais = threading.local()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        with self._trava:
+            return chave in self._itens
+
+    @staticmethod
+    def _tamanho(valor):
+        """Tamanho aproximado em bytes (nbytes para arrays, len para bytes/str)"""
+        nbytes = getattr(valor, "nbytes", None)
+        if nbytes is not None:
+            return nbytes
+        try:
+            return len(valor)
+        except TypeError:
+            return 0
+
+    def _contar(self, acerto):
+        """Conta um acerto ou uma falha no processo (sob a trava) e na thread atual"""
+        campo = "acertos" if acerto else "falhas"
+        setattr(self, campo, getattr(self, campo) + 1)
+        setattr(self._locais, campo, getattr(self._locais, campo, 0) + 1)
+
+    def contadores_thread(self):
+        """Acertos e falhas contados na thread atual (sem as consultas de outras sessões)"""
+        return getattr(self._locais, "acertos", 0), getattr(self._locais, "falhas", 0)
+
+    def obter(self, chave, calcular):
+        """Retorna o valor da chave, calculando-o (fora da trava) e guardando em caso de falha"""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._contar(True)
+                return self._itens[chave][0]
+            self._contar(False)
+
+        valor = calcular()
+        self.guardar(chave, valor)
+        return valor
+
+    def ler(self, chave, padrao=None):
+        """Retorna o valor da chave (numa única consulta sob a trava) ou o padrão, sem calcular nem guardar"""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._contar(True)
+                return self._itens[chave][0]
+            self._contar(False)
+            return padrao
+
+    def guardar(self, chave, valor):
+        """Insere (ou substitui) um valor, descartando os menos usados se necessário"""
+        tamanho = self._tamanho(valor)
+        removidos = []
+        with self._trava:
+            if chave in self._itens:
+                anterior, tamanho_anterior = self._itens.pop(chave)
+                self._bytes -= tamanho_anterior
+                removidos.append(anterior)
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            while self._itens and (
+                len(self._itens) > self.capacidade
+                or (self.limite_bytes is not None and self._bytes > self.limite_bytes and len(self._itens) > 1)
+            ):
+                _, (valor_removido, tamanho_removido) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_removido
+                removidos.append(valor_removido)
+        self._descartar(removidos)
+
+    def _descartar(self, valores):
+        if self.ao_remover is not None:
+            for valor in valores:
+                self.ao_remover(valor)
+
+    def limpar(self):
+        """Remove todas as entradas (os contadores são mantidos)"""
+        with self._trava:
+            removidos = [valor for valor, _ in self._itens.values()]
+            self._itens.clear()
+            self._bytes = 0
+        self._descartar(removidos)
+
+    def estatisticas(self):
+        """Contadores de uso do cache (de todo o processo)"""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "entradas": len(self._itens),
+                "capacidade": self.capacidade,
+                "bytes": self._bytes
+            }
+
+
+def normalizar_filtros(filtros, intervalo_datas=None, versao=None):
+    """Forma canônica (hashável) do estado dos filtros: colunas e valores ordenados, vazios ignorados"""
+    colunas = tuple(sorted(
+        (coluna, tuple(sorted({str(valor) for valor in valores})))
+        for coluna, valores in filtros.items()
+        if valores
+    ))
+    datas = None
+    if intervalo_datas is not None:
+        datas = tuple(pd.Timestamp(data).isoformat() for data in intervalo_datas)
+    return (versao, colunas, datas)
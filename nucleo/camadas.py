@@ -0,0 +1,259 @@
+"""Camadas do mapa Folium montadas a partir de payloads colunares já serializados.
+
+Em vez de um folium.CircleMarker (com HTML de popup próprio) por barragem, os
+pontos seguem para o navegador como um único objeto JSON com arrays de
+coordenadas, código de status e campos do popup (codificados por dicionário).
+O JavaScript desenha todos os pontos em um único canvas e monta o popup
+apenas quando o ponto é clicado. A cor vem do código de status calculado no
+carregamento (ver ``nucleo.status``).
+
+Quando existem tiles vetoriais da versão dos dados (ver ``nucleo.tiles``),
+polígonos e pontos vêm dos tiles e o navegador recebe apenas um bitset com os
+ids visíveis pelos filtros.
+
+Com o agrupamento por zoom (ver ``nucleo.agrupamento``), apenas os grupos da
+área visível e os pontos isolados são enviados, com contagens por status.
+
+Os payloads vêm prontos de ``nucleo.payload`` (memorizados na base), e as
+camadas só os interpolam no script: montar e renderizar o mapa de novo em um
+rerun custa apenas a cópia do texto.
+"""
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+
+from nucleo.payload import CAMPOS_POPUP, bitset_base64, json_script
+from nucleo.status import CORES_STATUS
+
+# Estilo dos polígonos ANA
+ESTILO_POLIGONOS = {
+    'fill': True,
+    'fillColor': '#4A90E2',
+    'color': '#2E5C8A',
+    'weight': 1,
+    'fillOpacity': 0.45
+}
+
+# Estilo dos pontos das barragens (fillColor vem do código de status)
+ESTILO_PONTOS = {
+    'radius': 5,
+    'fill': True,
+    'color': '#FFFFFF',
+    'weight': 1,
+    'fillOpacity': 0.7
+}
+
+# Função JavaScript de escape de HTML usada nos popups
+_JS_ESCAPAR = """
+            var escapar = function(texto) {
+                return String(texto).replace(/[&<>"']/g, function(c) {
+                    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                });
+            };
+"""
+
+# Desenho dos pontos de um payload colunar (variáveis dados, renderer, grupo e escapar)
+_JS_PONTOS = """
+            for (var i = 0; i < dados.lat.length; i++) {
+                var marcador = L.circleMarker([dados.lat[i], dados.lon[i]], {
+                    renderer: renderer,
+                    radius: {{ this.raio }},
+                    color: '#FFFFFF',
+                    weight: 1,
+                    fill: true,
+                    fillColor: dados.cores[dados.status[i]],
+                    fillOpacity: 0.7
+                });
+                marcador.indice = i;
+                grupo.addLayer(marcador);
+            }
+            grupo.on('click', function(e) {
+                var i = e.layer.indice;
+                if (i === undefined) {
+                    return;
+                }
+                var linhas = dados.campos.map(function(campo) {
+                    return '<b>' + campo.rotulo + ':</b> ' + escapar(campo.valores[campo.codigos[i]]);
+                });
+                L.popup({maxWidth: 250})
+                    .setLatLng(e.layer.getLatLng())
+                    .setContent("<div style='font-family: Arial; font-size: 11px; min-width: 200px;'>" + linhas.join('<br>') + '</div>')
+                    .openOn(e.layer._map);
+            });
+"""
+
+
+class CamadaPontos(MacroElement):
+    """Camada Leaflet com todos os pontos desenhados em um único canvas e popup montado no clique"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var dados = {{ this.dados_json }};
+            var renderer = L.canvas({padding: 0.5});
+            var grupo = L.featureGroup();
+""" + _JS_ESCAPAR + _JS_PONTOS + """
+            grupo.addTo({{ this._parent.get_name() }});
+            return grupo;
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, dados_json, raio=5):
+        super().__init__()
+        self._name = "CamadaPontos"
+        self.raio = raio
+        self.dados_json = dados_json
+
+
+class CamadaAgrupamentos(CamadaPontos):
+    """Camada de pontos agrupados por zoom: um marcador por grupo (com contagens por status) + pontos isolados
+
+    Clicar em um grupo aproxima o mapa em dois níveis de zoom, onde o grupo se divide.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var dados = {{ this.dados_json }};
+            var grupos = {{ this.grupos_json }};
+            var renderer = L.canvas({padding: 0.5});
+            var grupo = L.featureGroup();
+""" + _JS_ESCAPAR + _JS_PONTOS + """
+            for (var g = 0; g < grupos.lat.length; g++) {
+                var total = grupos.total[g];
+                var tamanho = Math.round(26 + 8 * Math.log10(total));
+                var icone = L.divIcon({
+                    className: '',
+                    iconSize: [tamanho, tamanho],
+                    html: "<div style='width: " + tamanho + "px; height: " + tamanho + "px; line-height: " + tamanho + "px; "
+                        + "border-radius: 50%; border: 2px solid #FFFFFF; box-sizing: border-box; opacity: 0.85; "
+                        + "background-color: " + dados.cores[grupos.predominante[g]] + "; color: #FFFFFF; "
+                        + "font-family: Arial; font-size: 11px; font-weight: bold; text-align: center;'>"
+                        + total.toLocaleString('pt-BR') + '</div>'
+                });
+                var linhas = [];
+                grupos.contagens[g].forEach(function(n, s) {
+                    if (n > 0) {
+                        linhas.push("<span style='color: " + dados.cores[s] + ";'>&#9679;</span> " + grupos.rotulos[s] + ': ' + n.toLocaleString('pt-BR'));
+                    }
+                });
+                L.marker([grupos.lat[g], grupos.lon[g]], {icon: icone})
+                    .bindTooltip("<div style='font-family: Arial; font-size: 11px;'><b>" + total.toLocaleString('pt-BR') + ' barragens</b><br>' + linhas.join('<br>') + '</div>')
+                    .on('click', function(e) {
+                        e.target._map.setView(e.target.getLatLng(), e.target._map.getZoom() + 2);
+                    })
+                    .addTo(grupo);
+            }
+            grupo.addTo({{ this._parent.get_name() }});
+            return grupo;
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, dados_json, grupos_json, raio=5):
+        super().__init__(dados_json, raio)
+        self._name = "CamadaAgrupamentos"
+        self.grupos_json = grupos_json
+
+
+class CamadaPoligonos(MacroElement):
+    """Camada Leaflet com os polígonos ANA de uma FeatureCollection já serializada (não interativa)"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.geoJSON({{ this.colecao_json }}, {
+            style: function() {
+                return {{ this.estilo_json }};
+            },
+            interactive: false
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, colecao_json):
+        super().__init__()
+        self._name = "CamadaPoligonos"
+        self.colecao_json = colecao_json
+        self.estilo_json = json_script(ESTILO_POLIGONOS)
+
+
+class CamadaTilesVetoriais(JSCSSMixin, MacroElement):
+    """Camada Leaflet.VectorGrid sobre tiles .pbf, exibindo apenas os ids visíveis pelos filtros
+
+    pontos=True: camada de barragens (cor por status, popup no clique);
+    pontos=False: camada de polígonos ANA (não interativa).
+    """
+
+    default_js = [
+        ("leaflet_vectorgrid", "https://unpkg.com/leaflet.vectorgrid@1.3.0/dist/Leaflet.VectorGrid.bundled.min.js")
+    ]
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var codificado = atob('{{ this.visiveis }}');
+            var visiveis = new Uint8Array(codificado.length);
+            for (var i = 0; i < codificado.length; i++) {
+                visiveis[i] = codificado.charCodeAt(i);
+            }
+            var visivel = function(id) {
+                return id >= 0 && (id >> 3) < visiveis.length && ((visiveis[id >> 3] >> (7 - (id & 7))) & 1) === 1;
+            };
+            var estilo = {{ this.estilo_json }};
+            var cores = {{ this.cores_json }};
+            var campos = {{ this.campos_json }};
+""" + _JS_ESCAPAR + """
+            var estilos = {};
+            estilos['{{ this.camada }}'] = function(propriedades) {
+                if (!visivel(propriedades['{{ this.propriedade_id }}'])) {
+                    return [];
+                }
+                {% if this.pontos %}
+                return L.extend({}, estilo, {fillColor: cores[propriedades.status]});
+                {% else %}
+                return estilo;
+                {% endif %}
+            };
+            var camada = L.vectorGrid.protobuf('{{ this.url }}', {
+                rendererFactory: L.canvas.tile,
+                vectorTileLayerStyles: estilos,
+                interactive: {{ 'true' if this.pontos else 'false' }},
+                minNativeZoom: {{ this.zoom_minimo }},
+                maxNativeZoom: {{ this.zoom_maximo }},
+                getFeatureId: function(feature) {
+                    return feature.properties['{{ this.propriedade_id }}'];
+                }
+            });
+            {% if this.pontos %}
+            camada.on('click', function(e) {
+                var propriedades = e.layer.properties;
+                var linhas = campos.map(function(campo) {
+                    var valor = propriedades[campo[0]];
+                    return '<b>' + campo[1] + ':</b> ' + escapar(valor === undefined ? 'N/A' : valor);
+                });
+                L.popup({maxWidth: 250})
+                    .setLatLng(e.latlng)
+                    .setContent("<div style='font-family: Arial; font-size: 11px; min-width: 200px;'>" + linhas.join('<br>') + '</div>')
+                    .openOn(camada._map);
+            });
+            {% endif %}
+            camada.addTo({{ this._parent.get_name() }});
+            return camada;
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url, camada, ids_visiveis, total, pontos, zoom_minimo, zoom_maximo):
+        super().__init__()
+        self._name = "CamadaTilesVetoriais"
+        self.url = url
+        self.camada = camada
+        self.pontos = pontos
+        self.propriedade_id = "pos" if pontos else "pid"
+        self.visiveis = bitset_base64(ids_visiveis, total)
+        self.zoom_minimo = zoom_minimo
+        self.zoom_maximo = zoom_maximo
+        self.estilo_json = json_script(ESTILO_PONTOS if pontos else ESTILO_POLIGONOS)
+        self.cores_json = json_script(CORES_STATUS)
+        self.campos_json = json_script(CAMPOS_POPUP)
@@ -0,0 +1,92 @@
+"""Catálogo de opções dos filtros, montado uma vez por versão dos dados.
+
+Para cada coluna filtrável guarda a lista ordenada de valores, os textos de
+exibição (e o mapeamento de volta para o valor real) e a contagem de linhas
+por valor, de modo que nenhum rerun precise recalcular opções.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from nucleo.indice import COLUNAS_INDEXADAS
+
+# Colunas cujas opções são exibidas com texto formatado
+COLUNAS_FORMATADAS = ['SITUACAO_MASSA_DAGUA', 'SITUACAO_COMPARACAO_SIOUT']
+
+
+def formatar_texto_exibicao(texto):
+    """Formata texto para exibição amigável nos filtros"""
+    if pd.isna(texto):
+        return texto
+    
+    texto_str = str(texto)
+    
+    # Mapeamento de textos específicos
+    mapeamento = {
+        'forte_inidicio_agua_satelite': 'Forte Indício de Água (Satélite)',
+        'compatível com polígono ana': 'Compatível com Polígono ANA',
+        'sem polígono ana': 'Sem Polígono ANA',
+        'totalmente compatível': 'Totalmente Compatível',
+        'compatível parcialmente': 'Compatível Parcialmente',
+        'compatível apenas geograficamente': 'Compatível Apenas Geograficamente',
+        'incompatível': 'Incompatível',
+        'não aplicado': 'Não Aplicado'
+    }
+    
+    texto_lower = texto_str.lower()
+    if texto_lower in mapeamento:
+        return mapeamento[texto_lower]
+    
+    # Substituir underscores por espaços e capitalizar
+    texto_formatado = texto_str.replace('_', ' ').title()
+    return texto_formatado
+
+
+@dataclass(frozen=True)
+class OpcoesFiltro:
+    """Opções de um filtro: valores reais, textos de exibição e contagens"""
+    valores: list
+    exibicao: list
+    valor_por_exibicao: dict
+    exibicao_por_valor: dict
+    contagens: dict
+
+    def valores_de(self, selecionados_exibicao):
+        """Converte as opções selecionadas (texto de exibição) de volta para os valores reais"""
+        return [self.valor_por_exibicao[opcao] for opcao in selecionados_exibicao]
+
+
+def montar_opcoes(serie, formatar=False):
+    """Monta as opções de filtro de uma coluna"""
+    contagens = serie.value_counts(dropna=True)
+    contagens = contagens[contagens > 0]
+    valores = sorted(contagens.index.tolist())
+    if formatar:
+        # Mantém o comportamento anterior: textos repetidos apontam para o último valor
+        valor_por_exibicao = {formatar_texto_exibicao(valor): valor for valor in valores}
+        exibicao_por_valor = {valor: formatar_texto_exibicao(valor) for valor in valores}
+    else:
+        valor_por_exibicao = {valor: valor for valor in valores}
+        exibicao_por_valor = dict(valor_por_exibicao)
+    return OpcoesFiltro(
+        valores=valores,
+        exibicao=list(valor_por_exibicao.keys()),
+        valor_por_exibicao=valor_por_exibicao,
+        exibicao_por_valor=exibicao_por_valor,
+        contagens={valor: int(contagens[valor]) for valor in valores}
+    )
+
+
+def montar_catalogo(df, colunas=None, anterior=None, alteradas=()):
+    """Monta o catálogo {coluna: OpcoesFiltro} das colunas filtráveis presentes na tabela
+
+    anterior: catálogo de uma tabela com as mesmas linhas; as colunas fora de ``alteradas`` são reaproveitadas.
+    """
+    return {
+        coluna: (
+            anterior[coluna] if anterior is not None and coluna in anterior and coluna not in alteradas
+            else montar_opcoes(df[coluna], formatar=coluna in COLUNAS_FORMATADAS)
+        )
+        for coluna in (colunas or COLUNAS_INDEXADAS)
+        if coluna in df.columns
+    }
@@ -0,0 +1,393 @@
+"""Comparação de registros SNISB × SIOUT-RS: recalcula SITUACAO_COMPARACAO_SIOUT.
+
+Reproduz a classificação descrita no glossário a partir dos extratos brutos do
+SNISB e do SIOUT, comparando empreendedor, uso, código e autorização. Para
+evitar comparar todos os pares, os candidatos vêm de dois bloqueios:
+
+- espacial: registros SIOUT a até RAIO_METROS da barragem (STRtree) ou dentro
+  do mesmo polígono ANA (ver ``nucleo.juncao``);
+- por atributo: mesmo código ou mesma autorização normalizados.
+
+Os campos de cada par candidato são pontuados de forma vetorizada; a
+similaridade de nomes (empreendedor) é calculada uma vez por par distinto de
+nomes e, em volumes grandes, distribuída em processos. Cada barragem fica com
+o melhor candidato, e o resultado traz a explicação campo a campo.
+
+"Compatível parcialmente" exige a proximidade geográfica (bloqueio espacial)
+além de algum campo compatível; pares distantes só são compatíveis se todos
+os campos conferem. Barragens descartadas no cadastro (SITUACAO_CADASTRO_SNISB)
+não são comparadas e ficam "Não aplicado", como no glossário.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from nucleo import geometria, ingestao, juncao
+
+# Situações atribuídas pela comparação (mesmos textos do relatório)
+SITUACAO_TOTAL = 'Totalmente compatível'
+SITUACAO_PARCIAL = 'Compatível parcialmente'
+SITUACAO_GEOGRAFICA = 'Compatível apenas geograficamente'
+SITUACAO_INCOMPATIVEL = 'Incompatível'
+SITUACAO_NAO_APLICADO = 'Não aplicado'
+
+COLUNA_SITUACAO = 'SITUACAO_COMPARACAO_SIOUT'
+
+# Situações da melhor para a pior (escolha do candidato de cada barragem)
+ORDEM_SITUACOES = [SITUACAO_TOTAL, SITUACAO_PARCIAL, SITUACAO_GEOGRAFICA, SITUACAO_INCOMPATIVEL]
+
+# Campos comparados: (campo, coluna no SNISB, coluna no SIOUT)
+CAMPOS = [
+    ('empreendedor', 'EMPREENDEDOR_SNISB', 'EMPREENDEDOR_SIOUT'),
+    ('uso', 'USO_SNISB', 'USO_SIOUT'),
+    ('codigo', 'CODIGO_BARRAGEM_ENTIDADE', 'CODIGO_SIOUT'),
+    ('autorizacao', 'AUTORIZACAO_NUM', 'AUTORIZACAO_SIOUT')
+]
+
+# Colunas do SIOUT copiadas para a barragem a partir do melhor candidato
+COLUNAS_SIOUT = ['ID_SIOUT', 'CODIGO_SIOUT', 'AUTORIZACAO_SIOUT', 'USO_SIOUT', 'EMPREENDEDOR_SIOUT']
+
+# Resultado da comparação de cada campo
+CAMPO_COMPATIVEL = 'compatível'
+CAMPO_DIVERGENTE = 'divergente'
+CAMPO_AUSENTE = 'ausente'
+
+# Distância máxima para considerar dois registros geograficamente próximos
+RAIO_METROS = 500.0
+
+# Similaridade mínima (Jaccard de palavras) para nomes de empreendedor compatíveis
+LIMIAR_EMPREENDEDOR = 0.8
+
+# Palavras ignoradas na comparação de nomes
+PALAVRAS_IGNORADAS = frozenset({'DE', 'DA', 'DO', 'DAS', 'DOS', 'E', 'LTDA', 'ME', 'EPP', 'SA', 'EIRELI', 'CIA'})
+
+# Valores de código/autorização repetidos em mais registros do que isto não formam bloco (ex.: '0')
+LIMITE_BLOCO = 50
+
+# Pares distintos de nomes a partir dos quais a similaridade é calculada em processos
+LIMITE_PARALELO = 200_000
+
+_METROS_POR_GRAU = 111_320.0
+_COS_LATITUDE_MINIMA = np.cos(np.radians(34.0))
+
+
+def _sem_acentos(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+
+def _texto(valor):
+    """Texto do valor sem acentos, em maiúsculas; None para ausentes"""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    texto = str(valor).strip()
+    if not texto or texto.upper() in ('NAN', 'N/A', 'NONE'):
+        return None
+    return _sem_acentos(texto).upper()
+
+
+def normalizar_nome(valor):
+    """Palavras significativas de um nome de empreendedor, ordenadas e separadas por espaço"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    palavras = sorted(set(re.findall(r'[A-Z0-9]+', texto)) - PALAVRAS_IGNORADAS)
+    return ' '.join(palavras) or None
+
+
+def normalizar_uso(valor):
+    """Finalidade de uso sem acentos, pontuação e espaços repetidos"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    return ' '.join(re.findall(r'[A-Z0-9]+', texto)) or None
+
+
+def normalizar_codigo(valor):
+    """Código sem pontuação, sem zeros à esquerda e sem o '.0' de leituras numéricas"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    texto = re.sub(r'\.0+$', '', texto)
+    return re.sub(r'[^A-Z0-9]', '', texto).lstrip('0') or None
+
+
+def normalizar_autorizacao(valor):
+    """Autorização como 'numero/ano' (ano com 4 dígitos) quando reconhecível"""
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    partes = re.fullmatch(r'\D*0*(\d+)\s*[/-]\s*(\d{2}|\d{4})\D*', texto)
+    if partes:
+        numero, ano = partes.groups()
+        if len(ano) == 2:
+            ano = ('20' if int(ano) < 50 else '19') + ano
+        return f"{numero}/{ano}"
+    return re.sub(r'[^A-Z0-9]', '', texto).lstrip('0') or None
+
+
+NORMALIZADORES = {
+    'empreendedor': normalizar_nome,
+    'uso': normalizar_uso,
+    'codigo': normalizar_codigo,
+    'autorizacao': normalizar_autorizacao
+}
+
+
+def _normalizar_coluna(df, coluna, normalizador):
+    """Aplica o normalizador uma vez por valor distinto da coluna"""
+    if coluna not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    codigos, valores = pd.factorize(df[coluna].astype(object), use_na_sentinel=True)
+    normalizados = np.array([normalizador(valor) for valor in valores] + [None], dtype=object)
+    return normalizados[codigos]
+
+
+def _coordenadas(df):
+    latitude = pd.to_numeric(df['LATITUDE'], errors='coerce').to_numpy(dtype=float)
+    longitude = pd.to_numeric(df['LONGITUDE'], errors='coerce').to_numpy(dtype=float)
+    return latitude, longitude
+
+
+def distancia_metros(lat1, lon1, lat2, lon2):
+    """Distância haversine (m) entre pares de coordenadas"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(valor, dtype=float)) for valor in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_008.8 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _jaccard(pares):
+    """Similaridade de Jaccard entre pares de nomes normalizados (palavras separadas por espaço)"""
+    similaridades = []
+    for nome_a, nome_b in pares:
+        a, b = set(nome_a.split()), set(nome_b.split())
+        similaridades.append(len(a & b) / len(a | b))
+    return similaridades
+
+
+def similaridade_nomes(nomes_a, nomes_b, trabalhadores=None):
+    """Similaridade (0 a 1) entre nomes normalizados, pareados posição a posição; NaN se algum é ausente
+
+    Calculada uma vez por par distinto; acima de LIMITE_PARALELO pares, em um pool de processos.
+    """
+    nomes_a = np.asarray(nomes_a, dtype=object)
+    nomes_b = np.asarray(nomes_b, dtype=object)
+    resultado = np.full(len(nomes_a), np.nan)
+    presentes = np.flatnonzero(pd.notna(nomes_a) & pd.notna(nomes_b))
+    if len(presentes) == 0:
+        return resultado
+
+    inverso, distintos = pd.MultiIndex.from_arrays([nomes_a[presentes], nomes_b[presentes]]).factorize()
+    pares = list(distintos)
+    trabalhadores = trabalhadores if trabalhadores is not None else (os.cpu_count() or 1)
+    if len(pares) >= LIMITE_PARALELO and trabalhadores > 1:
+        tamanho = -(-len(pares) // (trabalhadores * 4))
+        blocos = [pares[inicio:inicio + tamanho] for inicio in range(0, len(pares), tamanho)]
+        with ProcessPoolExecutor(max_workers=trabalhadores) as executor:
+            similaridades = [valor for bloco in executor.map(_jaccard, blocos) for valor in bloco]
+    else:
+        similaridades = _jaccard(pares)
+    resultado[presentes] = np.asarray(similaridades, dtype=float)[inverso]
+    return resultado
+
+
+class ExtratoSiout:
+    """Extrato do SIOUT normalizado, com STRtree dos pontos e índices por código e autorização"""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.campos = {
+            campo: _normalizar_coluna(self.df, coluna, NORMALIZADORES[campo]) for campo, _, coluna in CAMPOS
+        }
+        self.latitude, self.longitude = _coordenadas(self.df)
+        self._posicoes = np.flatnonzero(np.isfinite(self.latitude) & np.isfinite(self.longitude))
+        self._arvore = shapely.STRtree(shapely.points(self.longitude[self._posicoes], self.latitude[self._posicoes]))
+
+    def __len__(self):
+        return len(self.df)
+
+    def proximos(self, latitude, longitude, raio_metros=RAIO_METROS):
+        """Pares (posição da consulta, posição no SIOUT) a até raio_metros"""
+        validos = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+        if len(validos) == 0 or len(self._posicoes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # Raio em graus folgado (longitude encolhe com a latitude); a distância exata filtra depois
+        raio_graus = raio_metros / (_METROS_POR_GRAU * _COS_LATITUDE_MINIMA)
+        consulta, encontrados = self._arvore.query(
+            shapely.points(longitude[validos], latitude[validos]), predicate='dwithin', distance=raio_graus
+        )
+        consulta, encontrados = validos[consulta], self._posicoes[encontrados]
+        distancia = distancia_metros(
+            latitude[consulta], longitude[consulta], self.latitude[encontrados], self.longitude[encontrados]
+        )
+        perto = distancia <= raio_metros
+        return consulta[perto], encontrados[perto]
+
+
+def _pares_por_valor(valores_snisb, valores_siout):
+    """Pares (posição SNISB, posição SIOUT) com o mesmo valor normalizado, ignorando blocos grandes"""
+    snisb = pd.DataFrame({'valor': valores_snisb, 'snisb': np.arange(len(valores_snisb))}).dropna()
+    siout = pd.DataFrame({'valor': valores_siout, 'siout': np.arange(len(valores_siout))}).dropna()
+    for tabela in (snisb, siout):
+        tamanho = tabela.groupby('valor')['valor'].transform('size')
+        tabela.drop(tabela.index[tamanho > LIMITE_BLOCO], inplace=True)
+    pares = snisb.merge(siout, on='valor')
+    return pares['snisb'].to_numpy(dtype=np.int64), pares['siout'].to_numpy(dtype=np.int64)
+
+
+def _pares_por_poligono(df_snisb, latitude, longitude, extrato):
+    """Pares (posição SNISB, posição SIOUT) cujos pontos caem no mesmo polígono ANA da origem"""
+    geometrias, wkts = juncao.camada_da_fonte(df_snisb)
+    if len(geometrias) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    indice = juncao.IndicePoligonos(geometrias, wkts)
+    snisb = pd.DataFrame({'poligono': indice.localizar(latitude, longitude), 'snisb': np.arange(len(latitude))})
+    siout = pd.DataFrame({'poligono': indice.localizar(extrato.latitude, extrato.longitude), 'siout': np.arange(len(extrato))})
+    pares = snisb[snisb['poligono'] >= 0].merge(siout[siout['poligono'] >= 0], on='poligono')
+    return pares['snisb'].to_numpy(dtype=np.int64), pares['siout'].to_numpy(dtype=np.int64)
+
+
+def candidatos(df_snisb, extrato, raio_metros=RAIO_METROS, usar_poligonos=True):
+    """Pares candidatos (bloqueio espacial e por atributo), sem repetição, com a marca de proximidade geográfica"""
+    latitude, longitude = _coordenadas(df_snisb)
+    blocos_geograficos = [extrato.proximos(latitude, longitude, raio_metros)]
+    if usar_poligonos and geometria.COLUNA_GEOMETRIA in df_snisb.columns:
+        blocos_geograficos.append(_pares_por_poligono(df_snisb, latitude, longitude, extrato))
+    blocos_atributos = [
+        _pares_por_valor(_normalizar_coluna(df_snisb, coluna, NORMALIZADORES[campo]), extrato.campos[campo])
+        for campo, coluna, _ in CAMPOS if campo in ('codigo', 'autorizacao')
+    ]
+
+    n_siout = np.int64(max(len(extrato), 1))
+    geograficos = np.unique(np.concatenate([a * n_siout + b for a, b in blocos_geograficos]))
+    todos = np.unique(np.concatenate([geograficos] + [a * n_siout + b for a, b in blocos_atributos]))
+    return todos // n_siout, todos % n_siout, np.isin(todos, geograficos, assume_unique=True)
+
+
+def pontuar(campos_snisb, extrato, snisb, siout, trabalhadores=None):
+    """Resultado (compatível/divergente/ausente) de cada campo nos pares candidatos, e a similaridade dos nomes"""
+    resultados = {}
+    similaridade = np.full(len(snisb), np.nan)
+    for campo, _, _ in CAMPOS:
+        valores_a = campos_snisb[campo][snisb]
+        valores_b = extrato.campos[campo][siout]
+        ausente = pd.isna(valores_a) | pd.isna(valores_b)
+        if campo == 'empreendedor':
+            similaridade = similaridade_nomes(valores_a, valores_b, trabalhadores)
+            compativel = similaridade >= LIMIAR_EMPREENDEDOR
+        else:
+            compativel = ~ausente & (valores_a == valores_b)
+        resultados[campo] = np.where(ausente, CAMPO_AUSENTE, np.where(compativel, CAMPO_COMPATIVEL, CAMPO_DIVERGENTE))
+    return resultados, similaridade
+
+
+def classificar(resultados, geografico):
+    """Situação de cada par: todos os campos compatíveis, alguns (com proximidade), só a localização, ou nenhum"""
+    compativeis = sum((valores == CAMPO_COMPATIVEL).astype(np.int64) for valores in resultados.values())
+    situacao = np.where(geografico, SITUACAO_GEOGRAFICA, SITUACAO_INCOMPATIVEL).astype(object)
+    situacao[(compativeis > 0) & geografico] = SITUACAO_PARCIAL
+    situacao[compativeis == len(CAMPOS)] = SITUACAO_TOTAL
+    return situacao, compativeis
+
+
+def comparar(df_snisb, df_siout, raio_metros=RAIO_METROS, usar_poligonos=True, trabalhadores=None):
+    """Recalcula SITUACAO_COMPARACAO_SIOUT de cada barragem, retornando (tabela, estatísticas)
+
+    A tabela recebe as colunas do registro SIOUT escolhido, a situação, a
+    distância até ele e a explicação por campo (COMPARACAO_<CAMPO>).
+    """
+    extrato = ExtratoSiout(df_siout)
+    campos_snisb = {
+        campo: _normalizar_coluna(df_snisb, coluna, NORMALIZADORES[campo]) for campo, coluna, _ in CAMPOS
+    }
+    nao_analisados = juncao.descartados(df_snisb)
+    snisb, siout, geografico = candidatos(df_snisb, extrato, raio_metros, usar_poligonos)
+    analisados = ~nao_analisados[snisb]
+    snisb, siout, geografico = snisb[analisados], siout[analisados], geografico[analisados]
+    resultados, similaridade = pontuar(campos_snisb, extrato, snisb, siout, trabalhadores)
+    situacao, compativeis = classificar(resultados, geografico)
+    nivel = pd.Categorical(situacao, categories=ORDEM_SITUACOES).codes.astype(np.int64)
+
+    latitude, longitude = _coordenadas(df_snisb)
+    distancia = distancia_metros(latitude[snisb], longitude[snisb], extrato.latitude[siout], extrato.longitude[siout])
+
+    # Melhor candidato por barragem: melhor situação, mais campos compatíveis, proximidade, nome mais parecido, menor distância
+    ordem = np.lexsort((
+        np.nan_to_num(distancia, nan=np.inf), -np.nan_to_num(similaridade), -geografico.astype(np.int64),
+        -compativeis, nivel, snisb
+    ))
+    primeiros = ordem[np.r_[True, snisb[ordem][1:] != snisb[ordem][:-1]]] if len(ordem) else ordem
+    escolhidos = snisb[primeiros]
+
+    resultado = df_snisb.copy()
+    validos = np.isfinite(latitude) & np.isfinite(longitude)
+    situacao_final = np.where(validos & ~nao_analisados, SITUACAO_INCOMPATIVEL, SITUACAO_NAO_APLICADO).astype(object)
+    situacao_final[escolhidos] = situacao[primeiros]
+    for coluna in COLUNAS_SIOUT:
+        valores = np.full(len(df_snisb), None, dtype=object)
+        if coluna in extrato.df.columns:
+            valores[escolhidos] = extrato.df[coluna].to_numpy(dtype=object)[siout[primeiros]]
+        resultado[coluna] = valores
+    resultado[COLUNA_SITUACAO] = situacao_final
+    for campo, _, _ in CAMPOS:
+        explicacao = np.full(len(df_snisb), None, dtype=object)
+        explicacao[escolhidos] = resultados[campo][primeiros]
+        resultado[f'COMPARACAO_{campo.upper()}'] = explicacao
+    similaridade_final = np.full(len(df_snisb), np.nan)
+    similaridade_final[escolhidos] = similaridade[primeiros]
+    resultado['SIMILARIDADE_EMPREENDEDOR'] = similaridade_final.round(3)
+    distancia_final = np.full(len(df_snisb), np.nan)
+    distancia_final[escolhidos] = distancia[primeiros]
+    resultado['DISTANCIA_SIOUT_M'] = distancia_final.round(1)
+
+    estatisticas = {
+        "total": len(df_snisb),
+        "siout": len(extrato),
+        "pares": len(snisb),
+        "pares_geograficos": int(geografico.sum()),
+        "situacoes": pd.Series(situacao_final).value_counts().to_dict()
+    }
+    return resultado, estatisticas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula SITUACAO_COMPARACAO_SIOUT a partir dos extratos SNISB e SIOUT")
+    parser.add_argument("snisb", help="extrato do SNISB (CSV/XLSX)")
+    parser.add_argument("siout", help="extrato do SIOUT-RS (CSV/XLSX)")
+    parser.add_argument("--raio", type=float, default=RAIO_METROS, help="distância máxima (m) para registros próximos")
+    parser.add_argument("--sem-poligonos", action="store_true", help="não usa POLIGONO_ANA no bloqueio espacial")
+    parser.add_argument("--processos", type=int, help="processos para a similaridade de nomes (padrão: núcleos da máquina)")
+    parser.add_argument("--saida", help=f"CSV de saída (padrão: {ingestao.NOME_BASE}.comparacao.csv na pasta do SNISB)")
+    argumentos = parser.parse_args()
+
+    for caminho in (argumentos.snisb, argumentos.siout):
+        if not os.path.exists(caminho):
+            sys.exit(f"Arquivo não encontrado: {caminho}")
+    tabela_snisb = ingestao.ler_fonte(argumentos.snisb)
+    tabela_siout = ingestao.ler_fonte(argumentos.siout)
+
+    inicio = time.perf_counter()
+    tabela_comparacao, estatisticas_comparacao = comparar(
+        tabela_snisb, tabela_siout, argumentos.raio, not argumentos.sem_poligonos, argumentos.processos
+    )
+    tempo_comparacao = time.perf_counter() - inicio
+
+    saida = argumentos.saida or os.path.join(
+        os.path.dirname(os.path.abspath(argumentos.snisb)), f"{ingestao.NOME_BASE}.comparacao.csv"
+    )
+    tabela_comparacao.to_csv(saida, index=False, encoding='utf-8-sig')
+    print(
+        f"{estatisticas_comparacao['total']} barragens x {estatisticas_comparacao['siout']} registros SIOUT: "
+        f"{estatisticas_comparacao['pares']} pares candidatos ({estatisticas_comparacao['pares_geograficos']} próximos)"
+    )
+    for situacao_comparacao, quantidade in estatisticas_comparacao['situacoes'].items():
+        print(f"  {situacao_comparacao}: {quantidade}")
+    print(f"Comparação: {tempo_comparacao:.3f} s")
+    print(f"Resultado gravado em {saida}")
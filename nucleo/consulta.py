@@ -0,0 +1,173 @@
+"""Fluxo de consulta do aplicativo, sem interface: carregar, aplicar filtros, paginar, exportar e mapa.
+
+O app.py apenas desenha os widgets e chama estas funções a cada rerun; as
+mesmas chamadas podem ser feitas fora do Streamlit (benchmarks, scripts,
+outros front-ends). Os filtros escolhidos viram uma ``EspecificacaoFiltros``
+(valores por coluna e período), e o resultado de aplicá-la
+(``ResultadoFiltros``, apenas as posições das linhas) é a entrada da página
+da tabela, das exportações e dos payloads do mapa. Os caches continuam na
+base (``BaseDados``), por versão dos dados e estado normalizado dos filtros.
+"""
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from nucleo import atualizacao, cache, exportacao, paginacao
+
+# Pasta dos dados (origem CSV/XLSX e snapshots): a do aplicativo, salvo SIOUT_PASTA_DADOS
+PASTA_DADOS = os.environ.get("SIOUT_PASTA_DADOS") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Colunas filtradas por seleção de valores, na ordem da barra de filtros
+COLUNAS_FILTRO = [
+    'CODIGO_SNISB',
+    'SITUACAO_CADASTRO_SNISB',
+    'SITUACAO_MASSA_DAGUA',
+    'SITUACAO_COMPARACAO_SIOUT',
+    'USO_SNISB',
+    'AUTORIZACAO_NUM',
+    'EMPREENDEDOR_SNISB'
+]
+
+COLUNA_DATA = 'DATA_DO_CADASTRO'
+
+# Gerações do arquivo de exportação tentadas quando ele sai do cache antes de ser aberto
+TENTATIVAS_EXPORTACAO = 3
+
+
+@dataclass(frozen=True)
+class EspecificacaoFiltros:
+    """Estado dos filtros: valores selecionados por coluna (OU dentro da coluna, E entre colunas) e período"""
+    filtros: dict = field(default_factory=dict)
+    intervalo_datas: tuple = None
+
+    @property
+    def ativos(self):
+        """Colunas com filtro aplicado (o período conta como DATA_DO_CADASTRO)"""
+        ativos = [COLUNA_DATA] if self.intervalo_datas is not None else []
+        return ativos + [coluna for coluna, valores in self.filtros.items() if valores]
+
+    def chave(self, versao=None):
+        """Estado normalizado (chave dos caches da base)"""
+        return cache.normalizar_filtros(self.filtros, self.intervalo_datas, versao)
+
+
+@dataclass(frozen=True)
+class ResultadoFiltros:
+    """Posições (somente leitura) das linhas que atendem a uma especificação, e onde consultá-las"""
+    base: object
+    consultas: object
+    especificacao: EspecificacaoFiltros
+    posicoes: np.ndarray
+
+    @property
+    def total(self):
+        return len(self.posicoes)
+
+    def total_paginas(self, registros_por_pagina=paginacao.REGISTROS_POR_PAGINA):
+        return paginacao.contar_paginas(self.total, registros_por_pagina)
+
+
+def carregar(pasta=None):
+    """Fonte de dados da pasta (snapshot Arrow, convertido da origem se necessário; atualizada por delta)"""
+    return atualizacao.FonteDados(pasta or PASTA_DADOS)
+
+
+def limites_datas(base):
+    """Datas mínima e máxima de cadastro (datetime.date), ou None sem a coluna de data"""
+    if COLUNA_DATA not in base.tabela.columns:
+        return None
+    datas = base.tabela[COLUNA_DATA]
+    return pd.to_datetime(datas.min()).date(), pd.to_datetime(datas.max()).date()
+
+
+def especificar(base, selecoes, periodo=None):
+    """Especificação dos filtros a partir das seleções por coluna e do período (data inicial, data final)
+
+    Colunas ausentes da base são ignoradas; o período só é aplicado quando é mais
+    estreito que o intervalo de datas dos dados.
+    """
+    filtros = {coluna: list(valores) for coluna, valores in selecoes.items() if coluna in base.tabela.columns}
+    intervalo_datas = None
+    limites = limites_datas(base)
+    if periodo is not None and limites is not None:
+        inicio, fim = pd.to_datetime(periodo[0]), pd.to_datetime(periodo[1])
+        if inicio > pd.to_datetime(limites[0]) or fim < pd.to_datetime(limites[1]):
+            intervalo_datas = (inicio, fim)
+    return EspecificacaoFiltros(filtros, intervalo_datas)
+
+
+def consultas_vigentes(base, consulta_banco=None):
+    """Onde resolver filtros e páginas: o banco, se publicado na mesma versão dos dados, ou a própria base"""
+    if consulta_banco is not None and consulta_banco.versao == base.versao:
+        return consulta_banco
+    return base
+
+
+def aplicar_filtros(base, especificacao, consulta_banco=None):
+    """Resolve a especificação no índice invertido (ou no banco) e retorna o ResultadoFiltros"""
+    consultas = consultas_vigentes(base, consulta_banco)
+    posicoes = consultas.filtrar(especificacao.filtros, especificacao.intervalo_datas)
+    return ResultadoFiltros(base, consultas, especificacao, posicoes)
+
+
+def paginar(resultado, numero, registros_por_pagina=paginacao.REGISTROS_POR_PAGINA):
+    """Página da tabela (PaginaTabela) do resultado; o número é limitado às páginas existentes"""
+    numero = paginacao.limitar_pagina(numero, resultado.total_paginas(registros_por_pagina))
+    especificacao = resultado.especificacao
+    return resultado.consultas.pagina(especificacao.filtros, especificacao.intervalo_datas, numero, registros_por_pagina)
+
+
+def estilizar(pagina):
+    """Dados da página com as cores de status nas colunas de situação (Styler), ou o DataFrame sem estilos"""
+    if not pagina.colunas_estilo:
+        return pagina.dados
+    return pagina.dados.style.apply(lambda _: pagina.estilos, axis=None, subset=pagina.colunas_estilo)
+
+
+def exportar(resultado, formato, poligonos=exportacao.POLIGONOS_COMPLETOS):
+    """Arquivo de exportação (ArquivoExportado) do resultado no formato pedido, memorizado na base"""
+    especificacao = resultado.especificacao
+    return resultado.base.exportar(especificacao.filtros, especificacao.intervalo_datas, formato, poligonos)
+
+
+def abrir_exportacao(resultado, formato, poligonos=exportacao.POLIGONOS_COMPLETOS):
+    """(ArquivoExportado, arquivo binário aberto) da exportação do resultado; o chamador fecha o arquivo
+
+    Se o arquivo memorizado sair do cache entre a consulta e a abertura, é gerado de novo,
+    até TENTATIVAS_EXPORTACAO vezes.
+    """
+    for _ in range(TENTATIVAS_EXPORTACAO):
+        arquivo = exportar(resultado, formato, poligonos)
+        aberto = arquivo.abrir()
+        if aberto is not None:
+            return arquivo, aberto
+    raise RuntimeError(
+        f"O arquivo de exportação ({formato}) saiu do cache antes de ser lido em {TENTATIVAS_EXPORTACAO} tentativas"
+    )
+
+
+def ler_exportacao(resultado, formato, poligonos=exportacao.POLIGONOS_COMPLETOS):
+    """(ArquivoExportado, conteúdo em bytes) da exportação do resultado, com o arquivo já fechado"""
+    arquivo, aberto = abrir_exportacao(resultado, formato, poligonos)
+    with aberto:
+        return arquivo, aberto.read()
+
+
+def posicoes_mapa(resultado):
+    """Posições do resultado com coordenadas válidas (validadas no carregamento pela grade de agrupamento)"""
+    if 'LATITUDE' not in resultado.base.tabela.columns or 'LONGITUDE' not in resultado.base.tabela.columns:
+        return np.empty(0, dtype=np.int64)
+    return resultado.posicoes[resultado.base.grade.validos[resultado.posicoes]]
+
+
+def montar_payload_mapa(resultado, zoom, limites=None):
+    """Payloads serializados do mapa (PayloadMapa) do resultado para o zoom e a área visível (sul, oeste, norte, leste)
+
+    Com o banco vigente, os pontos e polígonos da área visível são consultados nele (índice GiST);
+    agrupamento e serialização continuam na base, memorizados como no caminho em memória.
+    """
+    especificacao = resultado.especificacao
+    consultas_area = resultado.consultas if resultado.consultas is not resultado.base else None
+    return resultado.base.payload_mapa(especificacao.filtros, especificacao.intervalo_datas, zoom, limites, consultas_area)
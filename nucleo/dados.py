@@ -0,0 +1,300 @@
+"""Base de dados carregada em memória: tabela de atributos, índice e catálogo de filtros, status e armazém de geometrias."""
+import threading
+import weakref
+
+import numpy as np
+
+from nucleo import agrupamento, analitico, cache, catalogo, espacial, exportacao, geometria, indice, ingestao, paginacao, payload, status
+
+# Limites do cache de resultados de filtros (posições das linhas)
+CAPACIDADE_CACHE_FILTROS = 256
+LIMITE_BYTES_CACHE_FILTROS = 64 * 1024 * 1024
+
+# Número de páginas da tabela preparadas mantidas em cache
+CAPACIDADE_CACHE_PAGINAS = 128
+
+# Limites do cache de arquivos exportados (gravados em disco, em pasta temporária)
+CAPACIDADE_CACHE_EXPORTACOES = 32
+LIMITE_BYTES_CACHE_EXPORTACOES = 512 * 1024 * 1024
+
+# Consultas do mapa mantidas em cache (agrupamentos, polígonos e payloads serializados, por filtros, zoom e área visível)
+CAPACIDADE_CACHE_MAPA = 256
+LIMITE_BYTES_CACHE_MAPA = 64 * 1024 * 1024
+
+
+class BaseDados:
+    """Tabela de atributos (sem WKT) + índice e catálogo de filtros + códigos de status + armazém de geometrias aberto sob demanda
+
+    A tabela usa RangeIndex: o rótulo de cada linha é a sua posição, o que permite
+    consultar status e índices a partir de qualquer recorte (df.take) da tabela.
+
+    anterior: base com as mesmas linhas nas mesmas posições (nova versão por delta), da qual
+    o índice e o catálogo das colunas fora de ``colunas_alteradas`` são reaproveitados.
+    Os arquivos exportados são apagados quando a base deixa de ser usada.
+    """
+
+    def __init__(self, tabela, caminho_geometrias, versao, caminho_snapshot=None, anterior=None, colunas_alteradas=()):
+        self.tabela = tabela
+        self.indice = indice.IndiceFiltros(
+            tabela, anterior=anterior.indice if anterior is not None else None, alteradas=colunas_alteradas
+        )
+        self.catalogo = catalogo.montar_catalogo(
+            tabela, anterior=anterior.catalogo if anterior is not None else None, alteradas=colunas_alteradas
+        )
+        self.status = status.ClassificacaoStatus(tabela)
+        self.cache_filtros = cache.CacheLRU(CAPACIDADE_CACHE_FILTROS, LIMITE_BYTES_CACHE_FILTROS)
+        self.cache_paginas = cache.CacheLRU(CAPACIDADE_CACHE_PAGINAS)
+        self.cache_exportacoes = cache.CacheLRU(
+            CAPACIDADE_CACHE_EXPORTACOES,
+            LIMITE_BYTES_CACHE_EXPORTACOES,
+            ao_remover=exportacao.ArquivoExportado.remover
+        )
+        self.cache_mapa = cache.CacheLRU(CAPACIDADE_CACHE_MAPA, LIMITE_BYTES_CACHE_MAPA)
+        weakref.finalize(self, self.cache_exportacoes.limpar)
+        self.caminho_geometrias = caminho_geometrias
+        self.caminho_snapshot = caminho_snapshot
+        self.versao = versao
+        self._geometrias = None
+        self._analitico = None
+        self._grade = None
+        self._espacial = None
+        self._trava = threading.Lock()
+
+    @property
+    def caches(self):
+        """Caches da base por nome (estatísticas de uso na instrumentação)"""
+        return {
+            "filtros": self.cache_filtros,
+            "paginas": self.cache_paginas,
+            "exportacoes": self.cache_exportacoes,
+            "mapa": self.cache_mapa
+        }
+
+    @property
+    def geometrias(self):
+        """Armazém de geometrias, aberto apenas no primeiro acesso"""
+        if self._geometrias is None:
+            with self._trava:
+                if self._geometrias is None:
+                    self._geometrias = geometria.ArmazemGeometrias.abrir(self.caminho_geometrias)
+        return self._geometrias
+
+    @property
+    def grade(self):
+        """Grade hierárquica dos pontos (agrupamento no mapa), montada apenas no primeiro acesso"""
+        if self._grade is None:
+            with self._trava:
+                if self._grade is None:
+                    self._grade = agrupamento.GradeHierarquica(self.tabela, self.status.ponto)
+        return self._grade
+
+    @property
+    def espacial(self):
+        """Índice espacial de pontos e polígonos, montado apenas no primeiro acesso"""
+        if self._espacial is None:
+            grade = self.grade
+            limites_poligonos = self.geometrias.limites()
+            with self._trava:
+                if self._espacial is None:
+                    self._espacial = espacial.IndiceEspacial(
+                        grade.latitude, grade.longitude, grade.validos, limites_poligonos
+                    )
+        return self._espacial
+
+    @property
+    def analitico(self):
+        """Motor analítico (DuckDB) sobre o snapshot, se habilitado (SIOUT_MOTOR=duckdb); aberto no primeiro acesso"""
+        if self._analitico is None and analitico.ATIVO and self.caminho_snapshot and analitico.disponivel():
+            armazem = self.geometrias
+            with self._trava:
+                if self._analitico is None:
+                    self._analitico = analitico.MotorAnalitico.abrir(self.caminho_snapshot, armazem)
+        return self._analitico
+
+    def filtrar(self, filtros, intervalo_datas=None):
+        """Posições das linhas que atendem aos filtros, memorizadas por estado normalizado dos filtros
+
+        Com o motor analítico habilitado, os filtros são resolvidos no DuckDB; senão, no índice invertido.
+        """
+        chave = cache.normalizar_filtros(filtros, intervalo_datas, self.versao)
+
+        def calcular():
+            motor = self.analitico
+            if motor is not None:
+                posicoes = motor.filtrar(filtros, intervalo_datas)
+            else:
+                posicoes = self.indice.filtrar(filtros, intervalo_datas)
+            # Resultado compartilhado entre sessões: somente leitura
+            posicoes.setflags(write=False)
+            return posicoes
+
+        return self.cache_filtros.obter(chave, calcular)
+
+    def contar(self, filtros, intervalo_datas=None):
+        """Número de linhas que atendem aos filtros (do resultado memorizado, ou contado no motor analítico)"""
+        chave = cache.normalizar_filtros(filtros, intervalo_datas, self.versao)
+        motor = self.analitico
+        if motor is not None and chave not in self.cache_filtros:
+            return motor.contar(filtros, intervalo_datas)
+        return len(self.filtrar(filtros, intervalo_datas))
+
+    def pagina(self, filtros, intervalo_datas, numero, registros_por_pagina=paginacao.REGISTROS_POR_PAGINA):
+        """Página da tabela (PaginaTabela) do resultado dos filtros; prepara as vizinhas em segundo plano"""
+        chave_filtros = cache.normalizar_filtros(filtros, intervalo_datas, self.versao)
+        posicoes = self.filtrar(filtros, intervalo_datas)
+        total_paginas = paginacao.contar_paginas(len(posicoes), registros_por_pagina)
+
+        def preparar(n):
+            return self.cache_paginas.obter(
+                (chave_filtros, registros_por_pagina, n),
+                lambda: paginacao.montar_pagina(
+                    self.tabela,
+                    self.geometrias,
+                    self.status,
+                    paginacao.recortar(posicoes, n, registros_por_pagina)
+                )
+            )
+
+        resultado = preparar(numero)
+        for vizinha in (numero + 1, numero - 1):
+            if 1 <= vizinha <= total_paginas and (chave_filtros, registros_por_pagina, vizinha) not in self.cache_paginas:
+                paginacao.preparar_em_segundo_plano(preparar, vizinha)
+        return resultado
+
+    def exportar(self, filtros, intervalo_datas, formato, poligonos=exportacao.POLIGONOS_COMPLETOS):
+        """Arquivo de exportação dos dados filtrados, gerado sob demanda (em lotes) e memorizado"""
+        chave = (cache.normalizar_filtros(filtros, intervalo_datas, self.versao), formato, poligonos)
+
+        def gerar():
+            motor = self.analitico
+            if motor is not None and formato in analitico.OPCOES_COPY:
+                # Filtro e escrita no DuckDB (COPY ... TO), sem DataFrames no processo (mesmos bytes do caminho em lotes)
+                return motor.exportar(filtros, intervalo_datas, formato, poligonos)
+            posicoes = self.filtrar(filtros, intervalo_datas)
+            # WKT da coluna POLIGONO_ANA resolvido lote a lote (memória limitada ao lote)
+            lotes = exportacao.gerar_lotes(self.tabela, posicoes, self.geometrias, poligonos)
+            return exportacao.exportar_arquivo(lotes, formato)
+
+        return self.cache_exportacoes.obter(chave, gerar)
+
+    def _area_visivel(self, zoom, limites):
+        """Área visível arredondada para as células da grade no zoom (chave de cache e limites da consulta)"""
+        if limites is None:
+            return None, None
+        area = agrupamento.celulas_visiveis(zoom, limites)
+        return area, agrupamento.limites_celulas(area)
+
+    def agrupar(self, filtros, intervalo_datas, zoom, limites=None, consultas_area=None):
+        """Pontos do resultado dos filtros agrupados para o zoom e a área visível (sul, oeste, norte, leste)
+
+        consultas_area: consultas da área visível no banco (ConsultaSQL, da mesma versão), usadas
+        no lugar do índice espacial em memória quando há limites
+        """
+        zoom = int(zoom)
+        area, limites_area = self._area_visivel(zoom, limites)
+        chave = ("agrupamento", cache.normalizar_filtros(filtros, intervalo_datas, self.versao), zoom, area)
+
+        def calcular():
+            if limites_area is None:
+                posicoes = self.filtrar(filtros, intervalo_datas)
+            elif consultas_area is not None:
+                posicoes = consultas_area.pontos_na_area(filtros, intervalo_datas, limites_area)
+            else:
+                posicoes = espacial.restringir(self.filtrar(filtros, intervalo_datas), self.espacial.pontos(limites_area))
+            return self.grade.agrupar(posicoes, zoom)
+
+        return self.cache_mapa.obter(chave, calcular)
+
+    def poligonos(self, filtros, intervalo_datas, zoom, limites=None, consultas_area=None):
+        """Ids dos polígonos ANA das linhas filtradas que aparecem na área visível (consultas_area: ver agrupar)"""
+        zoom = int(zoom)
+        area, limites_area = self._area_visivel(zoom, limites)
+        chave = ("poligonos", cache.normalizar_filtros(filtros, intervalo_datas, self.versao), area)
+
+        def calcular():
+            if geometria.COLUNA_ID not in self.tabela.columns:
+                return np.empty(0, dtype=np.int64)
+            if limites_area is not None and consultas_area is not None:
+                return consultas_area.poligonos_na_area(filtros, intervalo_datas, limites_area)
+            posicoes = self.filtrar(filtros, intervalo_datas)
+            ids = np.unique(self.tabela[geometria.COLUNA_ID].to_numpy()[posicoes]).astype(np.int64)
+            ids = ids[ids >= 0]
+            if limites_area is not None:
+                ids = espacial.restringir(ids, self.espacial.poligonos(limites_area))
+            return ids
+
+        return self.cache_mapa.obter(chave, calcular)
+
+
+    def payload_mapa(self, filtros, intervalo_datas, zoom, limites=None, consultas_area=None):
+        """Payloads serializados do mapa (polígonos, pontos isolados e grupos) para o zoom e a área visível
+
+        consultas_area: ver agrupar
+        """
+        zoom = int(zoom)
+        area, _ = self._area_visivel(zoom, limites)
+        chave = ("payload", cache.normalizar_filtros(filtros, intervalo_datas, self.versao), zoom, area)
+
+        def montar():
+            ids_poligonos = self.poligonos(filtros, intervalo_datas, zoom, limites, consultas_area)
+            colecao = self.geometrias.colecao_json(
+                ids_poligonos,
+                geometria.tolerancia_para_zoom(zoom),
+                propriedades={"tipo": "Polígono ANA"}
+            )
+            resultado = self.agrupar(filtros, intervalo_datas, zoom, limites, consultas_area)
+            individuais = resultado.individuais
+            colunas_popup = [coluna for coluna, _ in payload.CAMPOS_POPUP if coluna in self.tabela.columns]
+            df_pontos = self.tabela.iloc[individuais][colunas_popup].assign(
+                latitude=self.grade.latitude[individuais],
+                longitude=self.grade.longitude[individuais]
+            )
+            return payload.PayloadMapa(
+                poligonos=colecao.replace('</', '<\\/'),
+                pontos=payload.json_script(payload.payload_pontos(df_pontos, self.status.ponto[individuais])),
+                grupos=payload.json_script(payload.payload_grupos(resultado)),
+                total_poligonos=len(ids_poligonos),
+                total_grupos=len(resultado.total),
+                total_pontos=len(individuais)
+            )
+
+        return self.cache_mapa.obter(chave, montar)
+
+
+def colunas_alteradas(tabela_anterior, tabela, posicoes):
+    """Colunas com algum valor diferente nas posições informadas (as demais linhas são iguais)
+
+    None se as tabelas não têm as mesmas colunas e o mesmo número de linhas.
+    """
+    if len(tabela) != len(tabela_anterior) or list(tabela.columns) != list(tabela_anterior.columns):
+        return None
+    alteradas = []
+    for coluna in tabela.columns:
+        antes = tabela_anterior[coluna].iloc[posicoes].astype(object).reset_index(drop=True)
+        depois = tabela[coluna].iloc[posicoes].astype(object).reset_index(drop=True)
+        if not antes.equals(depois):
+            alteradas.append(coluna)
+    return alteradas
+
+
+def carregar(pasta, anterior=None, posicoes_alteradas=None):
+    """Garante o snapshot da pasta e carrega a base de dados correspondente
+
+    anterior e posicoes_alteradas: base vigente e posições da nova tabela que podem diferir dela
+    (atualização por delta); índice e catálogo das colunas sem mudanças são reaproveitados.
+    Os arquivos do snapshot ficam retidos enquanto a base estiver em uso no processo.
+    """
+    caminho_snapshot, versao = ingestao.garantir_snapshot(pasta)
+    tabela = ingestao.carregar_snapshot(caminho_snapshot)
+    caminho_geometrias = ingestao.caminho_geometrias(pasta, versao)
+    alteradas = None
+    if anterior is not None and posicoes_alteradas is not None:
+        alteradas = colunas_alteradas(anterior.tabela, tabela, posicoes_alteradas)
+    base = BaseDados(
+        tabela, caminho_geometrias, versao, caminho_snapshot,
+        anterior=anterior if alteradas is not None else None,
+        colunas_alteradas=alteradas or ()
+    )
+    ingestao.reter_snapshot(versao)
+    weakref.finalize(base, ingestao.liberar_snapshot, pasta, versao)
+    return base
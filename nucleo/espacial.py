@@ -0,0 +1,42 @@
+"""Índice espacial (STRtree) dos pontos das barragens e das caixas envolventes dos polígonos ANA.
+
+Montado uma vez por versão dos dados. Consultado com a área visível do mapa,
+devolve apenas as linhas e os polígonos dentro dela, para que o navegador
+receba só o que está na tela, qualquer que seja o tamanho do resultado dos filtros.
+"""
+import numpy as np
+import shapely
+
+
+def caixa(limites):
+    """Retângulo Shapely de limites (sul, oeste, norte, leste)"""
+    sul, oeste, norte, leste = limites
+    return shapely.box(oeste, sul, leste, norte)
+
+
+def restringir(posicoes, selecionadas):
+    """Interseção de dois arrays ordenados de posições (ou ids) sem repetição"""
+    return np.intersect1d(posicoes, selecionadas, assume_unique=True)
+
+
+class IndiceEspacial:
+    """STRtree sobre os pontos válidos da tabela e sobre as caixas envolventes dos polígonos"""
+
+    def __init__(self, latitude, longitude, validos, limites_poligonos):
+        self._posicoes = np.flatnonzero(validos)
+        self._arvore_pontos = shapely.STRtree(
+            shapely.points(longitude[self._posicoes], latitude[self._posicoes])
+        )
+        limites_poligonos = np.asarray(limites_poligonos, dtype=float).reshape(-1, 4)
+        self._ids_poligonos = np.flatnonzero(np.isfinite(limites_poligonos).all(axis=1))
+        self._arvore_poligonos = shapely.STRtree(shapely.box(*limites_poligonos[self._ids_poligonos].T))
+
+    def pontos(self, limites):
+        """Posições (ordenadas) das linhas cujo ponto está dentro dos limites"""
+        encontrados = self._arvore_pontos.query(caixa(limites))
+        return np.sort(self._posicoes[encontrados])
+
+    def poligonos(self, limites):
+        """Ids (ordenados) dos polígonos cuja caixa envolvente intersecta os limites"""
+        encontrados = self._arvore_poligonos.query(caixa(limites))
+        return np.sort(self._ids_poligonos[encontrados])
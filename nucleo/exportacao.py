@@ -0,0 +1,206 @@
+"""Geração dos arquivos de exportação dos dados filtrados, em lotes de linhas.
+
+Cada formato é escrito diretamente em um arquivo (CSV, JSON, JSON Lines,
+Parquet e XLSX em modo write-only do openpyxl), lote a lote, de modo que o pico de
+memória fica limitado ao tamanho de um lote, independentemente do número de
+linhas exportadas. A coluna POLIGONO_ANA pode ser mantida, truncada ou omitida.
+Resultados vazios geram um único lote sem linhas, para que o cabeçalho (ou o
+esquema, no Parquet) seja escrito mesmo assim.
+
+O arquivo gerado fica em disco enquanto estiver no cache; o botão de download
+do Streamlit recebe o conteúdo lido de uma vez (``consulta.ler_exportacao``,
+arquivo fechado antes de retornar) e guarda essa cópia no armazenamento de
+mídia da sessão.
+"""
+import codecs
+import math
+import os
+import tempfile
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from nucleo import geometria
+
+# Formatos disponíveis: extensão -> (rótulo do botão, MIME)
+FORMATOS = {
+    'xlsx': ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': ("CSV (.csv)", "text/csv"),
+    'json': ("JSON (.json)", "application/json"),
+    'jsonl': ("JSON Lines (.jsonl)", "application/x-ndjson"),
+    'parquet': ("Parquet (.parquet)", "application/vnd.apache.parquet")
+}
+
+# Tratamento da coluna POLIGONO_ANA (WKT) na exportação
+POLIGONOS_COMPLETOS = 'completo'
+POLIGONOS_TRUNCADOS = 'truncar'
+POLIGONOS_OMITIDOS = 'omitir'
+
+# Limite de caracteres por célula do Excel (usado ao truncar os polígonos)
+LIMITE_CARACTERES_EXCEL = 32767
+
+# Linhas por lote
+TAMANHO_LOTE = 2000
+
+
+def gerar_lotes(tabela, posicoes, armazem, poligonos=POLIGONOS_COMPLETOS, tamanho_lote=TAMANHO_LOTE):
+    """Gera DataFrames com as linhas das posições informadas, lote a lote, com o WKT resolvido por lote
+
+    Sem posições, gera um único lote vazio com as colunas da exportação.
+    """
+    for inicio in range(0, max(len(posicoes), 1), tamanho_lote):
+        lote = tabela.take(posicoes[inicio:inicio + tamanho_lote])
+        if poligonos == POLIGONOS_OMITIDOS:
+            yield lote.drop(columns=[geometria.COLUNA_ID], errors='ignore')
+            continue
+        lote = geometria.anexar_geometrias(lote, armazem)
+        if poligonos == POLIGONOS_TRUNCADOS and geometria.COLUNA_GEOMETRIA in lote.columns:
+            lote[geometria.COLUNA_GEOMETRIA] = lote[geometria.COLUNA_GEOMETRIA].str.slice(0, LIMITE_CARACTERES_EXCEL)
+        yield lote
+
+
+def _escrever_csv(lotes, arquivo):
+    arquivo.write(codecs.BOM_UTF8)
+    for numero, lote in enumerate(lotes):
+        arquivo.write(lote.to_csv(index=False, sep=';', header=numero == 0).encode('utf-8'))
+
+
+def _escrever_json(lotes, arquivo):
+    # Mesmo layout de DataFrame.to_json(orient='records', indent=2), montado lote a lote
+    arquivo.write(b'[')
+    primeiro = True
+    for lote in lotes:
+        if lote.empty:
+            continue
+        registros = lote.to_json(orient='records', force_ascii=False, indent=2, date_format='iso').strip()[1:-1].rstrip('\n')
+        arquivo.write((registros if primeiro else ',' + registros).encode('utf-8'))
+        primeiro = False
+    arquivo.write(b'\n]' if not primeiro else b']')
+
+
+def _escrever_jsonl(lotes, arquivo):
+    for lote in lotes:
+        if not lote.empty:
+            arquivo.write(lote.to_json(orient='records', lines=True, force_ascii=False, date_format='iso').rstrip('\n').encode('utf-8') + b'\n')
+
+
+def _escrever_parquet(lotes, arquivo):
+    escritor = None
+    for lote in lotes:
+        if escritor is None:
+            # Colunas vazias no primeiro lote (tipo nulo) são gravadas como texto
+            esquema = pa.Schema.from_pandas(lote, preserve_index=False)
+            for i, campo in enumerate(esquema):
+                if pa.types.is_null(campo.type):
+                    esquema = esquema.set(i, campo.with_type(pa.string()))
+            escritor = pq.ParquetWriter(arquivo, esquema, compression='zstd')
+        escritor.write_table(pa.Table.from_pandas(lote, schema=esquema, preserve_index=False))
+    if escritor is None:
+        pq.write_table(pa.table({}), arquivo)
+    else:
+        escritor.close()
+
+
+def _valor_excel(valor):
+    """Converte valores do pandas para tipos aceitos pelo openpyxl"""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)) or valor is pd.NaT:
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.to_pydatetime()
+    return valor
+
+
+def _escrever_xlsx(lotes, arquivo):
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet('Dados')
+    cabecalho_escrito = False
+    for lote in lotes:
+        if not cabecalho_escrito:
+            planilha.append(list(lote.columns))
+            cabecalho_escrito = True
+        for linha in lote.astype(object).itertuples(index=False, name=None):
+            planilha.append([_valor_excel(valor) for valor in linha])
+    livro.save(arquivo)
+
+
+ESCRITORES = {
+    'csv': _escrever_csv,
+    'json': _escrever_json,
+    'jsonl': _escrever_jsonl,
+    'parquet': _escrever_parquet,
+    'xlsx': _escrever_xlsx
+}
+
+
+def escrever(lotes, formato, arquivo):
+    """Escreve os lotes no arquivo binário aberto, no formato informado"""
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    ESCRITORES[formato](lotes, arquivo)
+
+
+# Arquivos que não puderam ser removidos por estarem abertos (Windows), tentados de novo na próxima exportação
+_remocoes_pendentes = set()
+_trava_remocoes = threading.Lock()
+
+
+def _remover_arquivo(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        with _trava_remocoes:
+            _remocoes_pendentes.add(caminho)
+
+
+def remover_pendentes():
+    """Tenta de novo remover os arquivos descartados que ainda estavam abertos"""
+    with _trava_remocoes:
+        pendentes = list(_remocoes_pendentes)
+        _remocoes_pendentes.clear()
+    for caminho in pendentes:
+        _remover_arquivo(caminho)
+
+
+class ArquivoExportado:
+    """Arquivo de exportação gravado em disco (removido quando sai do cache)
+
+    Quem já abriu o arquivo continua lendo depois da remoção: ``abrir`` e
+    ``remover`` são exclusivos, e o arquivo removido segue acessível pelo
+    descritor aberto (no Windows, a remoção é adiada até a próxima exportação).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.nbytes = os.path.getsize(caminho)
+        self._removido = False
+        self._trava = threading.Lock()
+
+    def abrir(self):
+        """Arquivo aberto para leitura binária (o chamador fecha), ou None se já foi removido"""
+        with self._trava:
+            if self._removido:
+                return None
+            return open(self.caminho, 'rb')
+
+    def remover(self):
+        with self._trava:
+            self._removido = True
+            _remover_arquivo(self.caminho)
+
+
+def exportar_arquivo(lotes, formato, pasta=None):
+    """Escreve os lotes em um arquivo temporário e retorna o ArquivoExportado"""
+    remover_pendentes()
+    descritor, caminho = tempfile.mkstemp(suffix=f".{formato}", prefix="exportacao_", dir=pasta)
+    try:
+        with os.fdopen(descritor, 'wb') as arquivo:
+            escrever(lotes, formato, arquivo)
+    except BaseException:
+        os.remove(caminho)
+        raise
+    return ArquivoExportado(caminho)
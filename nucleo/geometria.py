@@ -0,0 +1,192 @@
+"""Armazém de geometrias dos polígonos ANA, separado da tabela de atributos.
+
+Cada WKT distinto de POLIGONO_ANA recebe um id inteiro; a tabela guarda apenas
+esse id (ID_POLIGONO_ANA) e as geometrias ficam em um arquivo Arrow próprio,
+lido sob demanda quando o mapa ou uma exportação precisam delas. Na ingestão
+cada polígono é interpretado uma única vez e gravado em WKB e em GeoJSON já
+simplificado em vários níveis de tolerância, para consulta direta pelo mapa,
+junto com a caixa envolvente de cada polígono (usada pelo índice espacial).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+# Coluna original com a geometria em WKT
+COLUNA_GEOMETRIA = 'POLIGONO_ANA'
+
+# Coluna com o id do polígono na tabela de atributos (-1 = sem polígono)
+COLUNA_ID = 'ID_POLIGONO_ANA'
+
+SEM_POLIGONO = -1
+
+# Tolerâncias de simplificação pré-calculadas (graus), da mais detalhada à mais grosseira
+TOLERANCIAS_SIMPLIFICACAO = (0.0005, 0.002, 0.008)
+
+# Zoom mínimo do mapa para cada tolerância acima
+ZOOM_MINIMO_TOLERANCIA = (10, 7, 0)
+
+# Colunas com a caixa envolvente de cada polígono (NaN quando não há geometria)
+COLUNAS_LIMITES = ('xmin', 'ymin', 'xmax', 'ymax')
+
+
+def tolerancia_para_zoom(zoom):
+    """Retorna a tolerância de simplificação pré-calculada adequada ao nível de zoom"""
+    for tolerancia, zoom_minimo in zip(TOLERANCIAS_SIMPLIFICACAO, ZOOM_MINIMO_TOLERANCIA):
+        if zoom >= zoom_minimo:
+            return tolerancia
+    return TOLERANCIAS_SIMPLIFICACAO[-1]
+
+
+def _coluna_geojson(tolerancia):
+    """Nome da coluna com o GeoJSON simplificado na tolerância informada"""
+    return f"geojson_{TOLERANCIAS_SIMPLIFICACAO.index(tolerancia)}"
+
+
+def separar_geometrias(df):
+    """Substitui POLIGONO_ANA por ID_POLIGONO_ANA e retorna (tabela, lista de WKT únicos)"""
+    if COLUNA_GEOMETRIA not in df.columns:
+        return df, []
+
+    codigos, wkts_unicos = pd.factorize(df[COLUNA_GEOMETRIA], use_na_sentinel=True)
+    posicao = df.columns.get_loc(COLUNA_GEOMETRIA)
+    tabela = df.drop(columns=[COLUNA_GEOMETRIA])
+    tabela.insert(posicao, COLUNA_ID, codigos.astype(np.int32))
+    return tabela, [str(wkt) for wkt in wkts_unicos]
+
+
+def preparar_geometrias(wkts):
+    """Interpreta cada WKT uma única vez e gera WKB, caixa envolvente e GeoJSON simplificado por tolerância
+
+    Polígonos truncados (ex.: limite de 32.767 caracteres do Excel) ou inválidos
+    ficam marcados com valido=False e sem geometria.
+    """
+    wkts = np.asarray(wkts, dtype=object)
+    completos = np.array([str(wkt).endswith('))') for wkt in wkts], dtype=bool)
+    geoms = np.full(len(wkts), None, dtype=object)
+    if completos.any():
+        geoms[completos] = shapely.from_wkt(wkts[completos], on_invalid='ignore')
+    validos = ~shapely.is_missing(geoms)
+
+    colunas = {
+        'wkt': pa.array(wkts, type=pa.large_string()),
+        'valido': pa.array(validos),
+        'wkb': pa.array(shapely.to_wkb(geoms), type=pa.large_binary())
+    }
+    limites = shapely.bounds(geoms).reshape(len(wkts), 4)
+    for i, coluna in enumerate(COLUNAS_LIMITES):
+        colunas[coluna] = pa.array(limites[:, i], type=pa.float64())
+    for tolerancia in TOLERANCIAS_SIMPLIFICACAO:
+        simplificadas = shapely.simplify(geoms, tolerancia, preserve_topology=True)
+        colunas[_coluna_geojson(tolerancia)] = pa.array(shapely.to_geojson(simplificadas), type=pa.large_string())
+    return pa.table(colunas)
+
+
+def gravar_armazem(wkts, destino):
+    """Grava as geometrias únicas (indexadas pelo id) em um arquivo Arrow IPC"""
+    gravar_tabela(preparar_geometrias(wkts), destino)
+
+
+def gravar_tabela(tabela, destino):
+    """Grava uma tabela de geometrias (preparar_geometrias) em um arquivo Arrow IPC"""
+    temporario = destino + ".tmp"
+    with pa.OSFile(temporario, "wb") as sink:
+        with pa.ipc.new_file(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+    os.replace(temporario, destino)
+
+
+class ArmazemGeometrias:
+    """Acesso por id às geometrias dos polígonos ANA (arquivo Arrow em memory-map)"""
+
+    def __init__(self, tabela):
+        self._tabela = tabela
+        self._wkt = tabela.column('wkt')
+        self._valido = tabela.column('valido').to_numpy()
+
+    @classmethod
+    def abrir(cls, caminho):
+        """Abre o armazém gravado por gravar_armazem"""
+        if not os.path.exists(caminho):
+            return cls(preparar_geometrias([]))
+        with pa.memory_map(caminho, "r") as fonte:
+            tabela = pa.ipc.open_file(fonte).read_all()
+        return cls(tabela)
+
+    def __len__(self):
+        return len(self._wkt)
+
+    def wkt(self, ids):
+        """Retorna os WKT dos ids informados (None para ids sem polígono)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        validos = ids >= 0
+        resultado = np.full(len(ids), None, dtype=object)
+        if validos.any():
+            resultado[validos] = self._wkt.take(pa.array(ids[validos])).to_numpy(zero_copy_only=False)
+        return resultado
+
+    def ids_validos(self, ids):
+        """Filtra os ids, mantendo apenas polígonos existentes e com geometria válida"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self))]
+        return ids[self._valido[ids]]
+
+    def geometrias(self, ids):
+        """Retorna as geometrias Shapely (resolução completa) dos ids válidos"""
+        ids = self.ids_validos(ids)
+        return shapely.from_wkb(self._tabela.column('wkb').take(pa.array(ids)).to_numpy(zero_copy_only=False))
+
+    def ampliar(self, wkts):
+        """Ids dos WKT informados e a tabela do armazém com os WKT ainda ausentes acrescentados ao final
+
+        Os ids existentes não mudam; apenas os polígonos novos são interpretados e simplificados.
+        """
+        wkts = np.asarray(wkts, dtype=object)
+        ids = pd.Index(self._wkt.to_numpy(zero_copy_only=False)).get_indexer(wkts).astype(np.int64)
+        ausentes = ids < 0
+        if not ausentes.any():
+            return ids, self._tabela
+        novos = pd.unique(wkts[ausentes])
+        ids[ausentes] = len(self) + pd.Index(novos).get_indexer(wkts[ausentes])
+        return ids, pa.concat_tables([self._tabela, preparar_geometrias(novos)])
+
+    def tabela_wkt(self):
+        """Tabela Arrow (id, wkt) de todos os polígonos, para consultas SQL"""
+        return pa.table({'id': pa.array(np.arange(len(self), dtype=np.int64)), 'wkt': self._wkt})
+
+    def limites(self):
+        """Caixas envolventes (xmin, ymin, xmax, ymax) de todos os polígonos, na ordem dos ids"""
+        return np.column_stack([self._tabela.column(coluna).to_numpy() for coluna in COLUNAS_LIMITES])
+
+    def geojson(self, ids, tolerancia):
+        """Retorna o GeoJSON (texto) pré-simplificado dos ids válidos na tolerância informada"""
+        ids = self.ids_validos(ids)
+        coluna = self._tabela.column(_coluna_geojson(tolerancia))
+        return coluna.take(pa.array(ids)).to_pylist()
+
+    def colecao_json(self, ids, tolerancia, propriedades=None):
+        """Texto da FeatureCollection GeoJSON com os polígonos dos ids, sem reinterpretar WKT"""
+        propriedades_json = json.dumps(propriedades or {}, ensure_ascii=False)
+        features = ",".join(
+            '{"type":"Feature","geometry":' + geom + ',"properties":' + propriedades_json + '}'
+            for geom in self.geojson(ids, tolerancia)
+        )
+        return '{"type":"FeatureCollection","features":[' + features + ']}'
+
+    def colecao(self, ids, tolerancia, propriedades=None):
+        """Monta uma FeatureCollection GeoJSON (dict) com os polígonos dos ids"""
+        return json.loads(self.colecao_json(ids, tolerancia, propriedades))
+
+
+def anexar_geometrias(df, armazem):
+    """Recoloca a coluna POLIGONO_ANA (WKT) no lugar de ID_POLIGONO_ANA, para exibição e exportação"""
+    if COLUNA_ID not in df.columns:
+        return df
+    posicao = df.columns.get_loc(COLUNA_ID)
+    wkts = armazem.wkt(df[COLUNA_ID].to_numpy())
+    resultado = df.drop(columns=[COLUNA_ID])
+    resultado.insert(posicao, COLUNA_GEOMETRIA, wkts)
+    return resultado
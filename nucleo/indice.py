@@ -0,0 +1,126 @@
+"""Índice invertido das colunas filtráveis, construído uma vez no carregamento.
+
+Para cada coluna indexada guardamos o código de cada linha (valor fatorizado) e
+as listas de posições por código (formato CSR). Um filtro resolve-se assim:
+as posições da coluna mais seletiva são obtidas diretamente (OU entre os
+valores selecionados) e as demais colunas são verificadas apenas nessas
+posições por uma tabela booleana de códigos (E entre colunas). O custo é
+proporcional às linhas selecionadas, não ao tamanho da base.
+"""
+import numpy as np
+import pandas as pd
+
+# Colunas dos filtros de múltipla seleção
+COLUNAS_INDEXADAS = [
+    'CODIGO_SNISB',
+    'SITUACAO_CADASTRO_SNISB',
+    'SITUACAO_MASSA_DAGUA',
+    'SITUACAO_COMPARACAO_SIOUT',
+    'USO_SNISB',
+    'AUTORIZACAO_NUM',
+    'EMPREENDEDOR_SNISB'
+]
+
+# Coluna do filtro de período
+COLUNA_DATA = 'DATA_DO_CADASTRO'
+
+
+class ColunaIndexada:
+    """Códigos por linha e listas de posições por valor de uma coluna"""
+
+    def __init__(self, serie):
+        codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+        self.codigos = codigos.astype(np.int32)
+        self.codigo_por_valor = {valor: codigo for codigo, valor in enumerate(valores)}
+
+        # Posições ordenadas por código (linhas sem valor, código -1, ficam de fora)
+        ordem = np.argsort(self.codigos, kind='stable')
+        contagens = np.bincount(self.codigos[self.codigos >= 0], minlength=len(valores))
+        self.posicoes = ordem[len(ordem) - contagens.sum():].astype(np.int64)
+        self.inicios = np.concatenate(([0], np.cumsum(contagens)))
+
+    def codigos_de(self, valores):
+        """Converte valores selecionados em códigos (valores ausentes na base são ignorados)"""
+        codigos = []
+        for valor in valores:
+            codigo = self.codigo_por_valor.get(valor)
+            if codigo is None:
+                codigo = self.codigo_por_valor.get(str(valor))
+            if codigo is not None:
+                codigos.append(codigo)
+        return np.unique(np.asarray(codigos, dtype=np.int64))
+
+    def contar(self, codigos):
+        """Número de linhas com algum dos códigos"""
+        return int((self.inicios[codigos + 1] - self.inicios[codigos]).sum())
+
+    def linhas(self, codigos):
+        """Posições (ordenadas) das linhas com algum dos códigos"""
+        partes = [self.posicoes[self.inicios[c]:self.inicios[c + 1]] for c in codigos]
+        if not partes:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(partes))
+
+    def contem(self, linhas, codigos):
+        """Máscara das linhas informadas cujo código está entre os selecionados"""
+        selecionados = np.zeros(len(self.inicios), dtype=bool)
+        selecionados[codigos] = True
+        # Código -1 (sem valor) aponta para a última posição, sempre False
+        return selecionados[self.codigos[linhas]]
+
+
+class IndiceFiltros:
+    """Índice de todas as colunas filtráveis da tabela
+
+    anterior: índice de uma tabela com as mesmas linhas nas mesmas posições; as colunas
+    fora de ``alteradas`` são reaproveitadas dele em vez de indexadas de novo.
+    """
+
+    def __init__(self, df, colunas=None, anterior=None, alteradas=()):
+        self.total = len(df)
+        self.colunas = {}
+        for coluna in (colunas or COLUNAS_INDEXADAS):
+            if coluna not in df.columns:
+                continue
+            if anterior is not None and coluna in anterior.colunas and coluna not in alteradas:
+                self.colunas[coluna] = anterior.colunas[coluna]
+            else:
+                self.colunas[coluna] = ColunaIndexada(df[coluna])
+        self.datas = None
+        if COLUNA_DATA in df.columns:
+            if anterior is not None and anterior.datas is not None and COLUNA_DATA not in alteradas:
+                self.datas = anterior.datas
+            else:
+                self.datas = pd.to_datetime(df[COLUNA_DATA]).to_numpy()
+
+    def filtrar(self, filtros, intervalo_datas=None):
+        """Retorna as posições (ordenadas) das linhas que atendem a todos os filtros
+
+        filtros: {coluna: [valores]} (OU dentro da coluna, E entre colunas; listas vazias são ignoradas)
+        intervalo_datas: (inicio, fim) inclusivo sobre DATA_DO_CADASTRO, ou None
+        """
+        ativos = []
+        for coluna, valores in filtros.items():
+            if valores and coluna in self.colunas:
+                indexada = self.colunas[coluna]
+                codigos = indexada.codigos_de(valores)
+                ativos.append((indexada.contar(codigos), indexada, codigos))
+
+        if ativos:
+            # Começar pela coluna mais seletiva e verificar as demais só nas linhas restantes
+            ativos.sort(key=lambda item: item[0])
+            _, indexada, codigos = ativos[0]
+            linhas = indexada.linhas(codigos)
+            for _, indexada, codigos in ativos[1:]:
+                if len(linhas) == 0:
+                    break
+                linhas = linhas[indexada.contem(linhas, codigos)]
+        else:
+            linhas = np.arange(self.total, dtype=np.int64)
+
+        if intervalo_datas is not None and self.datas is not None:
+            inicio, fim = (np.datetime64(pd.Timestamp(data)) for data in intervalo_datas)
+            datas = self.datas[linhas]
+            linhas = linhas[(datas >= inicio) & (datas <= fim)]
+
+        return linhas
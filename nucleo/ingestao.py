@@ -0,0 +1,285 @@
+"""Etapa de ingestão: converte o relatório CSV/XLSX em um snapshot colunar Arrow.
+
+O snapshot é gravado ao lado do arquivo de origem, identificado pelo hash do
+conteúdo da origem, e é lido via memory-map pelo aplicativo. Os WKT de
+POLIGONO_ANA são separados em um armazém de geometrias próprio (ver
+``nucleo.geometria``). Pode ser gerado antecipadamente com
+``python -m nucleo.ingestao [pasta]``.
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from nucleo import geometria
+
+# Nome base do relatório (sem extensão)
+NOME_BASE = "RELATORIO_FINAL_SNISB_SIOUT"
+
+# Formatos de origem aceitos, em ordem de preferência
+EXTENSOES_FONTE = [".csv", ".xlsx"]
+
+# Colunas que devem ser lidas sempre como texto
+DTYPE_TEXTO = {
+    'POLIGONO_ANA': str,
+    'CODIGO_SNISB': str,
+    'CODIGO_BARRAGEM_ENTIDADE': str,
+    'AUTORIZACAO_NUM': str,
+    'AUTORIZACAO_SIOUT': str
+}
+
+# Colunas de texto com proporção de valores distintos abaixo deste limite
+# são codificadas como dicionário (pd.Categorical / pa.DictionaryArray)
+LIMITE_CARDINALIDADE_DICIONARIO = 0.5
+
+# Tipo das colunas de texto no DataFrame: string apoiada em Arrow (o "str" do pandas 3), que
+# aponta para os buffers do snapshot em vez de copiar cada valor para um objeto Python
+TIPO_TEXTO = pd.StringDtype("pyarrow", na_value=np.nan)
+TIPOS_ARROW_TEXTO = {pa.string(): TIPO_TEXTO, pa.large_string(): TIPO_TEXTO}
+
+# Versão do formato do snapshot (incrementar ao mudar a conversão)
+VERSAO_FORMATO = 4
+
+# Versões com bases carregadas no processo (contagem de referências): seus arquivos não são removidos
+_versoes_em_uso = Counter()
+_trava_versoes = threading.Lock()
+
+
+def localizar_fonte(pasta):
+    """Retorna o caminho do arquivo de origem (CSV preferencial, XLSX alternativo) ou None"""
+    for extensao in EXTENSOES_FONTE:
+        caminho = os.path.join(pasta, NOME_BASE + extensao)
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+
+def calcular_hash(caminho, tamanho_bloco=1 << 20):
+    """Calcula o SHA-256 do conteúdo do arquivo lendo em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def caminho_manifesto(pasta):
+    """Caminho do manifesto que associa a origem ao snapshot vigente"""
+    return os.path.join(pasta, f"{NOME_BASE}.snapshot.json")
+
+
+def caminho_snapshot(pasta, hash_fonte):
+    """Caminho do snapshot correspondente a um hash de origem"""
+    return os.path.join(pasta, f"{NOME_BASE}.{hash_fonte[:16]}.arrow")
+
+
+def caminho_geometrias(pasta, hash_fonte):
+    """Caminho do armazém de geometrias correspondente a um hash de origem"""
+    return os.path.join(pasta, f"{NOME_BASE}.{hash_fonte[:16]}.geometrias.arrow")
+
+
+def ler_manifesto(pasta):
+    """Lê o manifesto do snapshot, retornando None se ausente ou inválido"""
+    try:
+        with open(caminho_manifesto(pasta), encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifesto.get("formato") != VERSAO_FORMATO:
+        return None
+    return manifesto
+
+
+def hash_fonte(caminho_fonte, manifesto=None):
+    """Retorna o hash da origem, reaproveitando o manifesto se tamanho e mtime não mudaram"""
+    stat = os.stat(caminho_fonte)
+    if (
+        manifesto is not None
+        and manifesto.get("fonte") == os.path.basename(caminho_fonte)
+        and manifesto.get("tamanho") == stat.st_size
+        and manifesto.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return manifesto["hash"]
+    return calcular_hash(caminho_fonte)
+
+
+def ler_fonte(caminho_fonte):
+    """Lê o relatório de origem (CSV ou XLSX) com os tipos esperados"""
+    if caminho_fonte.lower().endswith(".xlsx"):
+        df = pd.read_excel(caminho_fonte, dtype=DTYPE_TEXTO)
+        if 'DATA_DO_CADASTRO' in df.columns:
+            df['DATA_DO_CADASTRO'] = pd.to_datetime(df['DATA_DO_CADASTRO'], errors='coerce')
+        return df
+
+    colunas = pd.read_csv(caminho_fonte, nrows=0, encoding='utf-8-sig').columns
+    return pd.read_csv(
+        caminho_fonte,
+        dtype=DTYPE_TEXTO,
+        encoding='utf-8-sig',
+        parse_dates=['DATA_DO_CADASTRO'] if 'DATA_DO_CADASTRO' in colunas else False
+    )
+
+
+def otimizar_tipos(df):
+    """Converte colunas de texto de baixa cardinalidade em categorias (codificação por dicionário)"""
+    df = df.copy()
+    total = max(len(df), 1)
+    for coluna in df.columns:
+        serie = df[coluna]
+        if not (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+            continue
+        if serie.nunique(dropna=True) / total < LIMITE_CARDINALIDADE_DICIONARIO:
+            df[coluna] = serie.astype('category')
+    return df
+
+
+def gravar_snapshot(df, destino):
+    """Grava o DataFrame como arquivo Arrow IPC sem compressão (permite memory-map)"""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    temporario = destino + ".tmp"
+    with pa.OSFile(temporario, "wb") as sink:
+        with pa.ipc.new_file(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+    os.replace(temporario, destino)
+
+
+def converter_para_snapshot(caminho_fonte, hash_origem=None, tabela_fonte=None):
+    """Converte a origem em snapshot Arrow, atualiza o manifesto e remove snapshots antigos
+
+    tabela_fonte: conteúdo da origem já lido com ler_fonte (evita uma segunda leitura)
+    """
+    pasta = os.path.dirname(os.path.abspath(caminho_fonte))
+    if hash_origem is None:
+        hash_origem = calcular_hash(caminho_fonte)
+
+    destino = caminho_snapshot(pasta, hash_origem)
+    destino_geometrias = caminho_geometrias(pasta, hash_origem)
+    if not (os.path.exists(destino) and os.path.exists(destino_geometrias)):
+        tabela, wkts = geometria.separar_geometrias(
+            tabela_fonte if tabela_fonte is not None else ler_fonte(caminho_fonte)
+        )
+        geometria.gravar_armazem(wkts, destino_geometrias)
+        gravar_snapshot(otimizar_tipos(tabela), destino)
+
+    registrar_snapshot(caminho_fonte, hash_origem)
+    return destino, hash_origem
+
+
+def registrar_snapshot(caminho_fonte, hash_origem):
+    """Aponta o manifesto para o snapshot do hash informado e remove snapshots de outras versões"""
+    pasta = os.path.dirname(os.path.abspath(caminho_fonte))
+    stat = os.stat(caminho_fonte)
+    destino = caminho_snapshot(pasta, hash_origem)
+    destino_geometrias = caminho_geometrias(pasta, hash_origem)
+    manifesto = {
+        "formato": VERSAO_FORMATO,
+        "fonte": os.path.basename(caminho_fonte),
+        "tamanho": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": hash_origem,
+        "snapshot": os.path.basename(destino),
+        "geometrias": os.path.basename(destino_geometrias)
+    }
+    temporario = caminho_manifesto(pasta) + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2)
+    os.replace(temporario, caminho_manifesto(pasta))
+    remover_snapshots_antigos(pasta)
+
+
+def _versao_arquivo(caminho):
+    """Prefixo do hash no nome de um arquivo de snapshot ou de geometrias"""
+    return os.path.basename(caminho)[len(NOME_BASE) + 1:].split(".")[0]
+
+
+def remover_snapshots_antigos(pasta):
+    """Remove snapshots de versões que não são a do manifesto nem estão em uso por bases do processo"""
+    manifesto = ler_manifesto(pasta)
+    with _trava_versoes:
+        mantidas = {versao[:16] for versao in _versoes_em_uso}
+    if manifesto is not None:
+        mantidas.add(manifesto["hash"][:16])
+    for antigo in glob.glob(os.path.join(pasta, f"{NOME_BASE}.*.arrow")):
+        if _versao_arquivo(antigo) not in mantidas:
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+
+
+def reter_snapshot(versao):
+    """Marca a versão como em uso (uma base carregada): seus arquivos não são removidos"""
+    with _trava_versoes:
+        _versoes_em_uso[versao] += 1
+
+
+def liberar_snapshot(pasta, versao):
+    """Libera uma base da versão; sem outras bases em uso, os arquivos de versões antigas são removidos"""
+    with _trava_versoes:
+        _versoes_em_uso[versao] -= 1
+        if _versoes_em_uso[versao] > 0:
+            return
+        del _versoes_em_uso[versao]
+    remover_snapshots_antigos(pasta)
+
+
+def garantir_snapshot(pasta):
+    """Garante um snapshot atualizado para a origem da pasta e retorna (caminho, hash)
+
+    Se não houver arquivo de origem, usa o último snapshot registrado no manifesto
+    (permite publicar apenas o snapshot).
+    """
+    manifesto = ler_manifesto(pasta)
+    caminho_fonte = localizar_fonte(pasta)
+
+    if caminho_fonte is None:
+        if manifesto is not None:
+            destino = os.path.join(pasta, manifesto["snapshot"])
+            if os.path.exists(destino):
+                return destino, manifesto["hash"]
+        raise FileNotFoundError(
+            f"Arquivo de dados não encontrado. Procure por {NOME_BASE}.csv na pasta do aplicativo."
+        )
+
+    hash_origem = hash_fonte(caminho_fonte, manifesto)
+    destino = caminho_snapshot(pasta, hash_origem)
+    if (
+        manifesto is not None
+        and manifesto.get("hash") == hash_origem
+        and manifesto.get("fonte") == os.path.basename(caminho_fonte)
+        and os.path.exists(destino)
+        and os.path.exists(caminho_geometrias(pasta, hash_origem))
+    ):
+        return destino, hash_origem
+    return converter_para_snapshot(caminho_fonte, hash_origem)
+
+
+def abrir_snapshot(caminho):
+    """Lê o snapshot Arrow via memory-map e retorna a tabela Arrow (sem cópia dos buffers)"""
+    with pa.memory_map(caminho, "r") as fonte:
+        return pa.ipc.open_file(fonte).read_all()
+
+
+def carregar_snapshot(caminho):
+    """Lê o snapshot Arrow via memory-map e retorna um DataFrame
+
+    Perfil de memória: colunas de texto (string Arrow) e numéricas sem nulos
+    continuam nos buffers mapeados do arquivo (páginas do cache do sistema, não
+    memória anônima do processo); colunas com nulos são copiadas e as colunas
+    de dicionário viram Categorical, com códigos e categorias copiados (as
+    categorias de alta cardinalidade, como EMPREENDEDOR_*, são a maior parte).
+    """
+    return abrir_snapshot(caminho).to_pandas(split_blocks=True, types_mapper=TIPOS_ARROW_TEXTO.get)
+
+
+if __name__ == "__main__":
+    pasta_dados = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    caminho_gerado, hash_gerado = garantir_snapshot(pasta_dados)
+    print(f"Snapshot: {caminho_gerado} (hash {hash_gerado[:16]})")
@@ -0,0 +1,191 @@
+"""Instrumentação dos reruns: tempo de cada etapa, tamanhos dos payloads e acertos dos caches.
+
+Cada rerun do aplicativo abre uma ``MedicaoRerun``; as etapas (carga,
+filtros, página, tabela, mapa...) são cronometradas com ``medicao.etapa(nome)``
+e os tamanhos dos payloads registrados com ``medicao.registrar_bytes``. Ao
+final, ``concluir`` calcula os acertos e falhas de cada cache da base durante
+o rerun (diferença dos contadores da thread do rerun, sem as consultas de
+outras sessões nem das threads de pré-cálculo) e emite um log JSON por rerun
+no logger ``siout.reruns``. Reruns de um único
+fragmento (ver ``medicao_fragmento``) geram eventos próprios, com o nome do
+fragmento. As exportações, geradas
+fora do rerun (no clique do download), viram eventos próprios.
+
+Os logs são gravados com ``SIOUT_LOG_RERUNS=1`` (stderr) ou
+``SIOUT_LOG_RERUNS=caminho.jsonl`` (arquivo); o painel de depuração na barra
+lateral é aberto com ``?depuracao=1`` na URL ou ``SIOUT_DEPURACAO=1``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Destino dos logs JSON ("1" = stderr, outro valor = caminho de arquivo); vazio desativa
+DESTINO_LOG = os.environ.get("SIOUT_LOG_RERUNS", "")
+
+# Painel de depuração aberto para todas as sessões
+DEPURACAO = os.environ.get("SIOUT_DEPURACAO", "") == "1"
+
+# Exportações recentes do processo exibidas no painel
+LIMITE_EXPORTACOES = 10
+
+log = logging.getLogger("siout.reruns")
+
+_exportacoes = deque(maxlen=LIMITE_EXPORTACOES)
+_trava_log = threading.Lock()
+
+
+def configurar_log(destino=DESTINO_LOG):
+    """Instala (uma única vez) o handler dos logs JSON, uma linha por evento"""
+    if not destino:
+        return
+    with _trava_log:
+        if log.handlers:
+            return
+        handler = logging.StreamHandler() if destino == "1" else logging.FileHandler(destino, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+
+
+def emitir(evento):
+    """Emite um evento (dict) como uma linha JSON"""
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+
+def _contadores(caches):
+    """Acertos e falhas de cada cache na thread atual (a do rerun da sessão)"""
+    return {nome: cache.contadores_thread() for nome, cache in caches.items()}
+
+
+class MedicaoRerun:
+    """Etapas cronometradas, tamanhos de payload e uso dos caches de um rerun"""
+
+    def __init__(self, sessao=None, caches=None):
+        self.sessao = sessao
+        self.etapas = {}
+        self.bytes = {}
+        self.caches = {}
+        self._caches = caches or {}
+        self._inicio_caches = _contadores(self._caches)
+        self._inicio = time.perf_counter()
+        self.total = None
+
+    def acompanhar_caches(self, caches):
+        """Passa a acompanhar os caches informados (ex.: os da base carregada durante o rerun)"""
+        self._caches = caches
+        self._inicio_caches = _contadores(caches)
+
+    def registrar_etapa(self, nome, segundos):
+        """Soma a duração a uma etapa (etapas repetidas no mesmo rerun são somadas)"""
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    @contextmanager
+    def etapa(self, nome):
+        """Cronometra o bloco como uma etapa do rerun"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_etapa(nome, time.perf_counter() - inicio)
+
+    def registrar_bytes(self, nome, tamanho):
+        self.bytes[nome] = int(tamanho)
+
+    def concluir(self, **campos):
+        """Fecha a medição, calcula o uso dos caches no rerun e emite o log; retorna o evento"""
+        self.total = time.perf_counter() - self._inicio
+        for nome, (acertos, falhas) in _contadores(self._caches).items():
+            acertos_inicio, falhas_inicio = self._inicio_caches.get(nome, (0, 0))
+            acertos, falhas = acertos - acertos_inicio, falhas - falhas_inicio
+            self.caches[nome] = {
+                "acertos": acertos,
+                "falhas": falhas,
+                "taxa_acerto": round(acertos / (acertos + falhas), 3) if acertos + falhas else None
+            }
+        evento = {
+            "evento": "rerun",
+            "momento": pd.Timestamp.now().isoformat(timespec="milliseconds"),
+            "sessao": self.sessao,
+            "segundos": round(self.total, 6),
+            "etapas": {nome: round(segundos, 6) for nome, segundos in self.etapas.items()},
+            "bytes": self.bytes,
+            "caches": self.caches,
+            **campos
+        }
+        emitir(evento)
+        return evento
+
+
+@contextmanager
+def medicao_fragmento(medicao_script, fragmento, caches=None):
+    """Medição de um fragmento: a do rerun do script, se ainda aberta; senão (rerun só do fragmento) uma própria
+
+    A medição própria é concluída ao final do bloco, mesmo se ele for interrompido (exceção,
+    ``st.rerun``), com o nome do fragmento no evento.
+    """
+    if medicao_script.total is None:
+        yield medicao_script
+        return
+    medicao = MedicaoRerun(medicao_script.sessao, caches)
+    interrompido = True
+    try:
+        yield medicao
+        interrompido = False
+    finally:
+        medicao.concluir(fragmento=fragmento, interrompido=interrompido)
+
+
+def registrar_exportacao(sessao, formato, segundos, tamanho, **campos):
+    """Evento de uma exportação (gerada no clique do download), guardado também para o painel"""
+    evento = {
+        "evento": "exportacao",
+        "momento": pd.Timestamp.now().isoformat(timespec="milliseconds"),
+        "sessao": sessao,
+        "formato": formato,
+        "segundos": round(segundos, 6),
+        "bytes": int(tamanho),
+        **campos
+    }
+    _exportacoes.append(evento)
+    emitir(evento)
+    return evento
+
+
+def exportacoes_recentes():
+    """Últimas exportações do processo (mais recente primeiro)"""
+    return list(reversed(_exportacoes))
+
+
+def tabela_etapas(evento):
+    """DataFrame das etapas de um evento de rerun (para o painel)"""
+    return pd.DataFrame(
+        [(nome, segundos * 1000) for nome, segundos in evento["etapas"].items()],
+        columns=["etapa", "ms"]
+    )
+
+
+def tabela_caches(evento, estatisticas):
+    """DataFrame de acertos/falhas no rerun e ocupação acumulada de cada cache (estatisticas: nome -> dict)"""
+    linhas = []
+    for nome, uso in evento["caches"].items():
+        total = estatisticas.get(nome, {})
+        linhas.append({
+            "cache": nome,
+            "acertos": uso["acertos"],
+            "falhas": uso["falhas"],
+            "taxa (processo)": round(total.get("taxa_acerto", 0.0), 3),
+            "entradas": total.get("entradas"),
+            "MB": round(total.get("bytes", 0) / 2**20, 2)
+        })
+    return pd.DataFrame(linhas)
+
+
+configurar_log()
@@ -0,0 +1,206 @@
+"""Junção espacial ponto-em-polígono: recalcula POLIGONO_ANA e SITUACAO_MASSA_DAGUA.
+
+Cada barragem (LATITUDE/LONGITUDE) é localizada na camada de polígonos ANA
+por uma consulta vetorizada em STRtree (predicado ``within``). Quando mais de
+um polígono contém o ponto, vale o de menor área (massa d'água mais
+específica); barragens analisadas fora de qualquer polígono ficam "Sem
+polígono ANA" (salvo as já marcadas com indício de água por satélite, que a
+junção não tem como refutar), e "Não aplicado" fica para as não analisadas:
+descartadas no cadastro (SITUACAO_CADASTRO_SNISB) ou sem coordenadas válidas.
+A camada pode vir de um arquivo (shapefile, GeoPackage, GeoJSON,
+lido com geopandas) ou dos polígonos distintos já presentes na origem.
+
+Execuções incrementais recebem o resultado anterior: barragens com o mesmo
+CODIGO_SNISB e as mesmas coordenadas reaproveitam o polígono e a situação já
+calculados, e apenas as novas ou alteradas são consultadas no índice.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from nucleo import geometria, ingestao
+
+# Situações atribuídas pela junção
+SITUACAO_COMPATIVEL = 'Compatível com polígono ANA'
+SITUACAO_SEM_POLIGONO = 'Sem polígono ANA'
+SITUACAO_INDICIO_SATELITE = 'forte_inidicio_agua_satelite'
+SITUACAO_NAO_APLICADO = 'Não aplicado'
+
+COLUNA_SITUACAO = 'SITUACAO_MASSA_DAGUA'
+COLUNA_CADASTRO = 'SITUACAO_CADASTRO_SNISB'
+
+# Casas decimais na comparação de coordenadas entre execuções (~1 cm; tolera arredondamentos do CSV)
+CASAS_COMPARACAO = 7
+
+# Sistema de referência dos dados (SIRGAS 2000)
+CRS_DADOS = "EPSG:4674"
+
+
+def carregar_camada(caminho):
+    """Lê uma camada de polígonos ANA (formatos do geopandas) no CRS dos dados; retorna (geometrias, None)"""
+    try:
+        import geopandas
+    except ImportError as erro:
+        raise RuntimeError("A leitura de camadas requer o pacote 'geopandas'") from erro
+    camada = geopandas.read_file(caminho)
+    if camada.crs is not None and camada.crs != CRS_DADOS:
+        camada = camada.to_crs(CRS_DADOS)
+    geometrias = camada.geometry.to_numpy()
+    return geometrias[~shapely.is_missing(geometrias) & ~shapely.is_empty(geometrias)], None
+
+
+def camada_da_fonte(df):
+    """Polígonos distintos da coluna POLIGONO_ANA da origem; retorna (geometrias, WKT originais)"""
+    if geometria.COLUNA_GEOMETRIA not in df.columns:
+        return np.empty(0, dtype=object), np.empty(0, dtype=object)
+    wkts = df[geometria.COLUNA_GEOMETRIA].dropna().astype(str).unique()
+    # WKT truncados (ex.: limite do Excel) não são polígonos válidos
+    wkts = wkts[np.array([wkt.endswith('))') for wkt in wkts], dtype=bool)]
+    geometrias = shapely.from_wkt(wkts, on_invalid='ignore')
+    validas = ~shapely.is_missing(geometrias)
+    return geometrias[validas], wkts[validas]
+
+
+class IndicePoligonos:
+    """STRtree sobre a camada de polígonos ANA, com o WKT de cada polígono para gravação"""
+
+    def __init__(self, geometrias, wkts=None):
+        self.geometrias = np.asarray(geometrias, dtype=object)
+        self.wkts = np.asarray(wkts if wkts is not None else shapely.to_wkt(self.geometrias), dtype=object)
+        self.areas = shapely.area(self.geometrias)
+        shapely.prepare(self.geometrias)
+        self._arvore = shapely.STRtree(self.geometrias)
+
+    def __len__(self):
+        return len(self.geometrias)
+
+    def localizar(self, latitude, longitude):
+        """Índice do polígono que contém cada ponto (-1 quando nenhum contém ou a coordenada é inválida)"""
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        resultado = np.full(len(latitude), -1, dtype=np.int64)
+        validos = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+        if len(validos) == 0 or len(self) == 0:
+            return resultado
+
+        pontos = shapely.points(longitude[validos], latitude[validos])
+        indice_ponto, indice_poligono = self._arvore.query(pontos, predicate='within')
+        if len(indice_ponto) == 0:
+            return resultado
+        # Para cada ponto, o polígono de menor área entre os que o contêm
+        ordem = np.lexsort((self.areas[indice_poligono], indice_ponto))
+        indice_ponto, indice_poligono = indice_ponto[ordem], indice_poligono[ordem]
+        primeiros = np.flatnonzero(np.r_[True, indice_ponto[1:] != indice_ponto[:-1]])
+        resultado[validos[indice_ponto[primeiros]]] = indice_poligono[primeiros]
+        return resultado
+
+
+def descartados(df):
+    """Máscara das barragens descartadas no cadastro (duplicidade, hierarquia), que não são analisadas"""
+    if COLUNA_CADASTRO not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    situacao = df[COLUNA_CADASTRO].astype(object).to_numpy()
+    return np.array([isinstance(valor, str) and 'descartado' in valor.lower() for valor in situacao], dtype=bool)
+
+
+def _reaproveitaveis(df, anterior):
+    """Posições de df cuja barragem (mesmo CODIGO_SNISB e coordenadas) já está em anterior, e a linha correspondente"""
+    chaves = ['CODIGO_SNISB', 'LATITUDE', 'LONGITUDE']
+    if anterior is None or any(coluna not in df.columns or coluna not in anterior.columns for coluna in chaves):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    atual = df[chaves].reset_index(drop=True).assign(_posicao=np.arange(len(df)))
+    previa = anterior[chaves].reset_index(drop=True).assign(_anterior=np.arange(len(anterior)))
+    for coluna in ('LATITUDE', 'LONGITUDE'):
+        atual[coluna] = pd.to_numeric(atual[coluna], errors='coerce').round(CASAS_COMPARACAO)
+        previa[coluna] = pd.to_numeric(previa[coluna], errors='coerce').round(CASAS_COMPARACAO)
+    previa = previa.drop_duplicates(subset=chaves, keep='last')
+    pares = atual.merge(previa, on=chaves, how='inner')
+    return pares['_posicao'].to_numpy(), pares['_anterior'].to_numpy()
+
+
+def juntar(df, indice, anterior=None):
+    """Recalcula POLIGONO_ANA e SITUACAO_MASSA_DAGUA das barragens, retornando (tabela, estatísticas)
+
+    anterior: resultado de uma junção anterior com a mesma camada (execução incremental)
+    """
+    resultado = df.copy()
+    poligono = np.full(len(df), None, dtype=object)
+    situacao = np.full(len(df), SITUACAO_NAO_APLICADO, dtype=object)
+    nao_analisados = descartados(df)
+
+    posicoes_reaproveitadas, linhas_anteriores = _reaproveitaveis(df, anterior)
+    if len(posicoes_reaproveitadas):
+        poligono[posicoes_reaproveitadas] = anterior[geometria.COLUNA_GEOMETRIA].to_numpy(dtype=object)[linhas_anteriores]
+        situacao[posicoes_reaproveitadas] = anterior[COLUNA_SITUACAO].to_numpy(dtype=object)[linhas_anteriores]
+
+    pendentes = np.setdiff1d(np.arange(len(df)), posicoes_reaproveitadas, assume_unique=True)
+    pendentes = pendentes[~nao_analisados[pendentes]]
+    latitude = pd.to_numeric(df['LATITUDE'], errors='coerce').to_numpy(dtype=float)[pendentes]
+    longitude = pd.to_numeric(df['LONGITUDE'], errors='coerce').to_numpy(dtype=float)[pendentes]
+    encontrados = indice.localizar(latitude, longitude)
+    dentro = encontrados >= 0
+    poligono[pendentes[dentro]] = indice.wkts[encontrados[dentro]]
+    situacao[pendentes[dentro]] = SITUACAO_COMPATIVEL
+
+    # Analisadas fora de qualquer polígono (coordenadas válidas); o indício por satélite da origem é mantido
+    fora = pendentes[~dentro & np.isfinite(latitude) & np.isfinite(longitude)]
+    situacao[fora] = SITUACAO_SEM_POLIGONO
+    if COLUNA_SITUACAO in df.columns:
+        satelite = df[COLUNA_SITUACAO].astype(object).to_numpy()[fora] == SITUACAO_INDICIO_SATELITE
+        situacao[fora[satelite]] = SITUACAO_INDICIO_SATELITE
+
+    # Descartadas no cadastro não são analisadas, mesmo que reaproveitadas de uma execução anterior
+    poligono[nao_analisados] = None
+    situacao[nao_analisados] = SITUACAO_NAO_APLICADO
+
+    resultado[geometria.COLUNA_GEOMETRIA] = poligono
+    resultado[COLUNA_SITUACAO] = situacao
+    estatisticas = {
+        "total": len(df),
+        "consultadas": len(pendentes),
+        "reaproveitadas": len(posicoes_reaproveitadas),
+        "com_poligono": int(pd.notna(poligono).sum()),
+        "sem_poligono": int((situacao == SITUACAO_SEM_POLIGONO).sum()),
+        "nao_aplicado": int((situacao == SITUACAO_NAO_APLICADO).sum())
+    }
+    return resultado, estatisticas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula POLIGONO_ANA e SITUACAO_MASSA_DAGUA por junção espacial")
+    parser.add_argument("pasta", nargs="?", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--camada", help="arquivo com a camada de polígonos ANA (padrão: polígonos já presentes na origem)")
+    parser.add_argument("--anterior", help="CSV de uma junção anterior com a mesma camada (execução incremental)")
+    parser.add_argument("--saida", help="CSV de saída (padrão: <origem>.juncao.csv na mesma pasta)")
+    argumentos = parser.parse_args()
+
+    caminho_fonte = ingestao.localizar_fonte(argumentos.pasta)
+    if caminho_fonte is None:
+        sys.exit(f"Nenhum arquivo {ingestao.NOME_BASE}.csv/.xlsx encontrado em {argumentos.pasta}")
+    tabela_fonte = ingestao.ler_fonte(caminho_fonte)
+
+    inicio = time.perf_counter()
+    geometrias, wkts = carregar_camada(argumentos.camada) if argumentos.camada else camada_da_fonte(tabela_fonte)
+    indice_poligonos = IndicePoligonos(geometrias, wkts)
+    tempo_indice = time.perf_counter() - inicio
+
+    tabela_anterior = ingestao.ler_fonte(argumentos.anterior) if argumentos.anterior else None
+    inicio = time.perf_counter()
+    tabela_juncao, estatisticas_juncao = juntar(tabela_fonte, indice_poligonos, tabela_anterior)
+    tempo_juncao = time.perf_counter() - inicio
+
+    saida = argumentos.saida or os.path.join(argumentos.pasta, f"{ingestao.NOME_BASE}.juncao.csv")
+    tabela_juncao.to_csv(saida, index=False, encoding='utf-8-sig')
+    print(
+        f"{estatisticas_juncao['total']} barragens x {len(indice_poligonos)} polígonos: "
+        f"{estatisticas_juncao['consultadas']} consultadas, {estatisticas_juncao['reaproveitadas']} reaproveitadas, "
+        f"{estatisticas_juncao['com_poligono']} dentro de um polígono, {estatisticas_juncao['sem_poligono']} fora, "
+        f"{estatisticas_juncao['nao_aplicado']} não aplicadas"
+    )
+    print(f"Índice: {tempo_indice:.3f} s | junção: {tempo_juncao:.3f} s")
+    print(f"Resultado gravado em {saida}")
@@ -0,0 +1,123 @@
+"""Montagem do mapa Folium de um resultado de filtros (sem Streamlit).
+
+O mapa recebe a imagem de satélite como base fixa, o grupo de polígonos ANA
+e o grupo de pontos das barragens (a partir dos tiles vetoriais da versão dos
+dados, quando existem, ou dos payloads memorizados na base), o estilo do
+controle de camadas e a legenda. O componente st_folium fica no app.py.
+"""
+from dataclasses import dataclass
+
+import folium
+
+from nucleo import camadas, consulta, geometria, tiles
+
+# Zoom inicial do mapa (enquadra o Rio Grande do Sul)
+ZOOM_INICIAL = 7
+
+URL_SATELITE = 'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}'
+
+# CSS do controle de camadas (mais transparente)
+CSS_CONTROLE_CAMADAS = """
+<style>
+.leaflet-control-layers {
+    background-color: rgba(255, 255, 255, 0.85) !important;
+    border: 1px solid grey !important;
+    border-radius: 5px !important;
+}
+.leaflet-control-layers-expanded {
+    padding: 6px 8px 6px 6px !important;
+}
+</style>
+"""
+
+LEGENDA_HTML = """
+<div style="position: fixed;
+            bottom: 30px; right: 30px; width: 200px;
+            background-color: rgba(255, 255, 255, 0.9); z-index:9999;
+            border:1px solid grey; border-radius: 5px;
+            padding: 8px; font-size: 10px;
+            font-family: Arial;">
+    <h4 style="margin: 0 0 6px 0; text-align: center; font-size: 11px;">Legenda</h4>
+    <p style="margin: 3px 0;"><span style="background-color: #28A745; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Totalmente Compatível</p>
+    <p style="margin: 3px 0;"><span style="background-color: #FFC107; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Parcialmente Compatível</p>
+    <p style="margin: 3px 0;"><span style="background-color: #FF8C00; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Compatível Geo</p>
+    <p style="margin: 3px 0;"><span style="background-color: #8B0000; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Incompatível</p>
+    <p style="margin: 3px 0;"><span style="background-color: #DC143C; width: 12px; height: 12px; display: inline-block; border-radius: 50%; border: 1px solid white;"></span> Descartado</p>
+    <hr style="margin: 6px 0; border: 0; border-top: 1px solid #ccc;">
+    <p style="margin: 3px 0;"><span style="background-color: #4A90E2; width: 12px; height: 12px; display: inline-block; border: 1px solid #2E5C8A;"></span> Polígonos ANA</p>
+</div>
+"""
+
+
+@dataclass
+class MapaMontado:
+    """Mapa Folium e grupos atualizados dinamicamente pelo st_folium (sem recarregar o mapa)
+
+    grupos_dinamicos: grupos que acompanham a área visível (vazio com tiles vetoriais);
+    payload: PayloadMapa usado nas camadas (None com tiles vetoriais).
+    """
+    mapa: folium.Map
+    grupos_dinamicos: list
+    payload: object = None
+
+
+def montar_mapa(resultado, zoom=None, limites=None, zoom_inicial=ZOOM_INICIAL):
+    """Mapa das barragens do resultado com coordenadas válidas, ou None se não houver nenhuma
+
+    zoom e limites: última visão do mapa (área visível em (sul, oeste, norte, leste)), usadas nas camadas
+    sem tiles vetoriais; o mapa é sempre criado centrado nos dados, no zoom inicial.
+    """
+    base = resultado.base
+    posicoes = consulta.posicoes_mapa(resultado)
+    if len(posicoes) == 0:
+        return None
+
+    mapa = folium.Map(
+        location=[base.grade.latitude[posicoes].mean(), base.grade.longitude[posicoes].mean()],
+        zoom_start=zoom_inicial,
+        tiles=None  # Não usar tiles padrão
+    )
+    # Satélite Esri como base fixa, sem aparecer no controle de camadas
+    folium.TileLayer(tiles=URL_SATELITE, attr='Esri World Imagery', name='Satélite Esri', overlay=False, control=False).add_to(mapa)
+
+    grupo_poligonos = folium.FeatureGroup(name='🗺️ Polígonos ANA', show=True)
+    grupo_pontos = folium.FeatureGroup(name='🔵 Pontos das Barragens', show=True)
+    grupos_dinamicos = []
+    payload_mapa = None
+
+    if tiles.disponiveis(base.versao):
+        # Geometrias vêm dos tiles vetoriais da versão; o mapa recebe apenas os ids visíveis
+        if geometria.COLUNA_ID in base.tabela.columns:
+            camadas.CamadaTilesVetoriais(
+                tiles.url(base.versao, tiles.CAMADA_POLIGONOS),
+                tiles.CAMADA_POLIGONOS,
+                base.tabela[geometria.COLUNA_ID].to_numpy()[posicoes],
+                len(base.geometrias),
+                pontos=False,
+                zoom_minimo=tiles.ZOOM_MINIMO,
+                zoom_maximo=tiles.ZOOM_MAXIMO
+            ).add_to(grupo_poligonos)
+        camadas.CamadaTilesVetoriais(
+            tiles.url(base.versao, tiles.CAMADA_PONTOS),
+            tiles.CAMADA_PONTOS,
+            posicoes,
+            len(base.tabela),
+            pontos=True,
+            zoom_minimo=tiles.ZOOM_MINIMO,
+            zoom_maximo=tiles.ZOOM_MAXIMO
+        ).add_to(grupo_pontos)
+        grupo_poligonos.add_to(mapa)
+        grupo_pontos.add_to(mapa)
+    else:
+        # Payloads (polígonos da área visível, grupos e pontos isolados) já serializados e memorizados
+        # na base: reruns que não mudam filtros, zoom ou área apenas reaproveitam o texto pronto
+        payload_mapa = consulta.montar_payload_mapa(resultado, zoom or zoom_inicial, limites)
+        if payload_mapa.total_poligonos:
+            camadas.CamadaPoligonos(payload_mapa.poligonos).add_to(grupo_poligonos)
+        camadas.CamadaAgrupamentos(payload_mapa.pontos, payload_mapa.grupos).add_to(grupo_pontos)
+        # Grupos que acompanham a área visível, atualizados pelo st_folium sem recarregar o mapa
+        grupos_dinamicos = [grupo_poligonos, grupo_pontos]
+
+    mapa.get_root().html.add_child(folium.Element(CSS_CONTROLE_CAMADAS))
+    mapa.get_root().html.add_child(folium.Element(LEGENDA_HTML))
+    return MapaMontado(mapa, grupos_dinamicos, payload_mapa)
@@ -0,0 +1,86 @@
+"""Paginação da tabela a partir das posições do resultado dos filtros.
+
+Apenas as linhas da página pedida são buscadas na tabela (com o WKT dos
+polígonos e os estilos de status), sem materializar o recorte filtrado
+inteiro. Páginas preparadas ficam em cache e as vizinhas são preparadas em
+segundo plano, para que a troca de página seja imediata.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from nucleo import geometria
+from nucleo.status import COLUNAS_SITUACAO
+
+REGISTROS_POR_PAGINA = 50
+
+# Threads para preparar as páginas vizinhas em segundo plano
+_preparador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="paginas_vizinhas")
+
+
+@dataclass(frozen=True)
+class PaginaTabela:
+    """Linhas de uma página da tabela e os estilos CSS das colunas de situação"""
+    dados: pd.DataFrame
+    estilos: pd.DataFrame
+    colunas_estilo: list
+
+
+def contar_paginas(total, registros_por_pagina=REGISTROS_POR_PAGINA):
+    """Número de páginas para o total de registros (mínimo 1)"""
+    return max(1, (total - 1) // registros_por_pagina + 1)
+
+
+def limitar_pagina(pagina, total_paginas):
+    """Mantém o número da página dentro do intervalo válido"""
+    return min(max(1, pagina), total_paginas)
+
+
+def recortar(posicoes, pagina, registros_por_pagina=REGISTROS_POR_PAGINA):
+    """Posições das linhas de uma página (numerada a partir de 1)"""
+    inicio = (pagina - 1) * registros_por_pagina
+    return posicoes[inicio:inicio + registros_por_pagina]
+
+
+def montar_pagina(tabela, armazem, status, posicoes_pagina):
+    """Busca apenas as linhas da página, recoloca o WKT e calcula os estilos pelos códigos de status"""
+    dados = geometria.anexar_geometrias(tabela.take(posicoes_pagina), armazem)
+    colunas_estilo = [coluna for coluna in COLUNAS_SITUACAO if coluna in dados.columns]
+    estilos = status.estilos(dados.index, colunas_estilo)
+    return PaginaTabela(dados, estilos, colunas_estilo)
+
+
+def preparar_em_segundo_plano(funcao, *args):
+    """Agenda a preparação de uma página vizinha"""
+    _preparador.submit(funcao, *args)
+
+
+def paginas_visiveis(pagina_atual, total_paginas):
+    """Gera lista de páginas visíveis com reticências"""
+    paginas = []
+    
+    # Sempre mostrar primeira página
+    paginas.append(1)
+    
+    # Mostrar páginas ao redor da atual
+    inicio_range = max(2, pagina_atual - 2)
+    fim_range = min(total_paginas - 1, pagina_atual + 2)
+    
+    # Adicionar reticências antes se necessário
+    if inicio_range > 2:
+        paginas.append('...')
+    
+    # Adicionar páginas do range
+    for p in range(inicio_range, fim_range + 1):
+        paginas.append(p)
+    
+    # Adicionar reticências depois se necessário
+    if fim_range < total_paginas - 1:
+        paginas.append('...')
+    
+    # Sempre mostrar última página se houver mais de uma
+    if total_paginas > 1:
+        paginas.append(total_paginas)
+    
+    return paginas
@@ -0,0 +1,99 @@
+"""Payloads JSON das camadas do mapa, independentes do Folium.
+
+Os dados de cada camada (pontos, grupos e polígonos) são serializados uma
+única vez por estado de filtros, zoom e área visível e guardados já como texto
+no cache da base (ver ``BaseDados.payload_mapa``). As camadas de
+``nucleo.camadas`` apenas interpolam esse texto no JavaScript, de modo que
+reconstruir o mapa em um rerun (ex.: trocar a página da tabela) não refaz
+consultas nem serialização.
+"""
+import base64
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from nucleo.status import CORES_STATUS, ROTULOS_STATUS
+
+# Campos exibidos no popup de cada ponto: (coluna, rótulo)
+CAMPOS_POPUP = [
+    ('CODIGO_SNISB', 'Código'),
+    ('SITUACAO_CADASTRO_SNISB', 'Cadastro SNISB'),
+    ('SITUACAO_MASSA_DAGUA', "Massa D'água"),
+    ('SITUACAO_COMPARACAO_SIOUT', 'Comparação SIOUT')
+]
+
+# Casas decimais das coordenadas no payload (~1 m)
+CASAS_DECIMAIS = 5
+
+
+def json_script(dados):
+    """JSON para embutir em <script>, sem permitir o fechamento prematuro da tag"""
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def _coluna_dicionario(serie):
+    """Codifica uma coluna como (valores distintos, códigos por linha); ausentes viram 'N/A'"""
+    codigos, valores = pd.factorize(serie.astype(object).where(serie.notna(), 'N/A'))
+    return [str(valor) for valor in valores], codigos.tolist()
+
+
+def payload_pontos(df_mapa, status):
+    """Monta o payload colunar dos pontos (colunas 'latitude' e 'longitude' já validadas)
+
+    status: código de status (índice em CORES_STATUS) de cada linha de df_mapa
+    """
+    campos = []
+    for coluna, rotulo in CAMPOS_POPUP:
+        if coluna in df_mapa.columns:
+            valores, codigos = _coluna_dicionario(df_mapa[coluna])
+        else:
+            valores, codigos = ['N/A'], [0] * len(df_mapa)
+        campos.append({"rotulo": rotulo, "valores": valores, "codigos": codigos})
+    return {
+        "lat": np.round(df_mapa['latitude'].to_numpy(dtype=float), CASAS_DECIMAIS).tolist(),
+        "lon": np.round(df_mapa['longitude'].to_numpy(dtype=float), CASAS_DECIMAIS).tolist(),
+        "status": np.asarray(status).tolist(),
+        "cores": CORES_STATUS,
+        "campos": campos
+    }
+
+
+def payload_grupos(resultado):
+    """Monta o payload dos grupos de um Agrupamento: centro, total, status predominante e contagens por status"""
+    return {
+        "lat": np.round(resultado.latitude, CASAS_DECIMAIS).tolist(),
+        "lon": np.round(resultado.longitude, CASAS_DECIMAIS).tolist(),
+        "total": resultado.total.tolist(),
+        "predominante": resultado.contagens.argmax(axis=1).tolist(),
+        "contagens": resultado.contagens.tolist(),
+        "rotulos": ROTULOS_STATUS
+    }
+
+
+def bitset_base64(ids, total):
+    """Codifica um conjunto de ids inteiros (0..total-1) como bitset em base64"""
+    mascara = np.zeros(total, dtype=bool)
+    ids = np.asarray(ids, dtype=np.int64)
+    mascara[ids[(ids >= 0) & (ids < total)]] = True
+    return base64.b64encode(np.packbits(mascara).tobytes()).decode('ascii')
+
+
+@dataclass(frozen=True)
+class PayloadMapa:
+    """Payloads serializados das camadas do mapa para um estado de filtros, zoom e área visível
+
+    poligonos: FeatureCollection GeoJSON dos polígonos ANA;
+    pontos: payload colunar dos pontos isolados; grupos: payload dos grupos de pontos.
+    """
+    poligonos: str
+    pontos: str
+    grupos: str
+    total_poligonos: int
+    total_grupos: int
+    total_pontos: int
+
+    @property
+    def nbytes(self):
+        return len(self.poligonos) + len(self.pontos) + len(self.grupos)
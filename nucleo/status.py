@@ -0,0 +1,117 @@
+"""Classificação de status das barragens, calculada uma vez no carregamento.
+
+As regras de cor (células da tabela e pontos do mapa) são avaliadas apenas
+sobre os valores distintos de cada coluna e depois propagadas para as linhas
+pelos códigos fatorizados. O resultado fica em arrays int8 alinhados às
+posições da tabela, consumidos tanto pelo Styler quanto pela camada de pontos.
+"""
+import numpy as np
+import pandas as pd
+
+# Colunas de situação coloridas na tabela
+COLUNAS_SITUACAO = ['SITUACAO_CADASTRO_SNISB', 'SITUACAO_MASSA_DAGUA', 'SITUACAO_COMPARACAO_SIOUT']
+
+# Estilos das células, na ordem dos códigos (0 = sem cor, 1 = verde, 2 = amarelo, 3 = vermelho)
+ESTILOS_CELULA = [
+    '',
+    'background-color: #d4edda; color: #155724',
+    'background-color: #fff3cd; color: #856404',
+    'background-color: #f8d7da; color: #721c24'
+]
+
+# Cores dos pontos do mapa, na ordem dos códigos de status (hierarquia de cores)
+CORES_STATUS = ['#DC143C', '#28A745', '#FFC107', '#FF8C00', '#8B0000', '#007BFF', '#808080']
+STATUS_SEM_CLASSIFICACAO = len(CORES_STATUS) - 1
+
+# Rótulos dos códigos de status, na mesma ordem de CORES_STATUS
+ROTULOS_STATUS = [
+    'Descartado',
+    'Totalmente Compatível',
+    'Parcialmente Compatível',
+    'Compatível Geo',
+    'Incompatível',
+    'Selecionado',
+    'Sem classificação'
+]
+
+
+def classificar_situacao(valor):
+    """Código de cor da célula (índice em ESTILOS_CELULA) para um valor de situação"""
+    if pd.isna(valor):
+        return 0
+    val_str = str(valor).lower()
+    if 'totalmente compatível' in val_str or 'selecionado' in val_str or 'compatível com polígono' in val_str:
+        return 1
+    elif 'parcialmente' in val_str or 'apenas geograficamente' in val_str:
+        return 2
+    elif 'incompatível' in val_str or 'descartado' in val_str:
+        return 3
+    return 0
+
+
+def classificar_ponto(situacao_cadastro, situacao_comparacao):
+    """Código de status do ponto (índice em CORES_STATUS) pela hierarquia de cores do mapa"""
+    situacao_cadastro = str(situacao_cadastro).lower()
+    situacao_comparacao = str(situacao_comparacao).lower()
+    if 'descartado' in situacao_cadastro:
+        return 0
+    elif 'totalmente compatível' in situacao_comparacao:
+        return 1
+    elif 'compatível parcialmente' in situacao_comparacao:
+        return 2
+    elif 'compatível apenas geograficamente' in situacao_comparacao:
+        return 3
+    elif 'incompatível' in situacao_comparacao:
+        return 4
+    elif 'selecionado para validação' in situacao_cadastro:
+        return 5
+    return STATUS_SEM_CLASSIFICACAO
+
+
+def _fatorizar(df, coluna):
+    """Códigos por linha e valores distintos de uma coluna (coluna ausente = tudo nulo)"""
+    if coluna not in df.columns:
+        return np.full(len(df), -1, dtype=np.int64), []
+    codigos, valores = pd.factorize(df[coluna], use_na_sentinel=True)
+    return codigos, list(valores)
+
+
+def _por_valor(codigos, valores, funcao):
+    """Aplica a função a cada valor distinto (e ao nulo) e propaga o resultado para as linhas"""
+    # Última posição representa o nulo (código -1)
+    tabela = np.array([funcao(valor) for valor in valores] + [funcao(None)], dtype=np.int8)
+    return tabela[codigos]
+
+
+class ClassificacaoStatus:
+    """Códigos de status por linha: cor de cada coluna de situação e cor do ponto no mapa"""
+
+    def __init__(self, df):
+        self.celulas = {}
+        for coluna in COLUNAS_SITUACAO:
+            if coluna in df.columns:
+                codigos, valores = _fatorizar(df, coluna)
+                self.celulas[coluna] = _por_valor(codigos, valores, classificar_situacao)
+
+        # Ponto: combinação (cadastro, comparação), avaliada por par distinto
+        codigos_cadastro, valores_cadastro = _fatorizar(df, 'SITUACAO_CADASTRO_SNISB')
+        codigos_comparacao, valores_comparacao = _fatorizar(df, 'SITUACAO_COMPARACAO_SIOUT')
+        # Deslocar os códigos em 1 para que o nulo (-1) vire a posição 0
+        valores_cadastro = [''] + valores_cadastro
+        valores_comparacao = [''] + valores_comparacao
+        pares = (codigos_cadastro + 1) * len(valores_comparacao) + (codigos_comparacao + 1)
+        pares_unicos, inverso = np.unique(pares, return_inverse=True)
+        tabela = np.array([
+            classificar_ponto(valores_cadastro[par // len(valores_comparacao)], valores_comparacao[par % len(valores_comparacao)])
+            for par in pares_unicos
+        ], dtype=np.int8)
+        self.ponto = tabela[inverso.reshape(-1)] if len(pares) else np.empty(0, dtype=np.int8)
+
+    def estilos(self, posicoes, colunas):
+        """DataFrame de estilos CSS (para Styler.apply com axis=None) das linhas e colunas informadas"""
+        posicoes = np.asarray(posicoes)
+        estilos = np.asarray(ESTILOS_CELULA, dtype=object)
+        return pd.DataFrame(
+            {coluna: estilos[self.celulas[coluna][posicoes]] for coluna in colunas},
+            index=posicoes
+        )
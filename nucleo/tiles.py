@@ -0,0 +1,255 @@
+"""Geração de tiles vetoriais (MVT) dos polígonos ANA e das barragens.
+
+Etapa offline: recorta os polígonos e os pontos em uma pirâmide de zoom de
+arquivos ``{z}/{x}/{y}.pbf`` (um conjunto por camada), gravada em
+``static/tiles/<versão>/``. Com ``server.enableStaticServing`` ativo o
+Streamlit serve essa pasta em ``/app/static/``; fora dele é possível usar o
+servidor local deste módulo. O mapa então carrega apenas os tiles visíveis,
+no nível de detalhe do zoom atual.
+
+Uso::
+
+    python -m nucleo.tiles gerar [pasta_dados]
+    python -m nucleo.tiles servir [--porta 8765]
+
+Requer o pacote opcional ``mapbox-vector-tile`` (apenas para gerar).
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import shapely
+
+# Pasta do aplicativo (app.py) e raiz dos tiles (servida pelo Streamlit em /app/static/tiles)
+PASTA_APLICATIVO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_TILES = os.path.join(PASTA_APLICATIVO, "static", "tiles")
+
+# URL dos tiles vista pelo navegador; {versao} e {camada} são preenchidos pelo aplicativo
+URL_TILES = os.environ.get("SIOUT_URL_TILES", "/app/static/tiles/{versao}/{camada}/{z}/{x}/{y}.pbf")
+
+# Pirâmide de zoom gerada (acima do máximo o mapa amplia os tiles do último nível)
+ZOOM_MINIMO = 5
+ZOOM_MAXIMO = 12
+
+CAMADA_POLIGONOS = "poligonos"
+CAMADA_PONTOS = "barragens"
+
+# Resolução interna do tile e margem de recorte (em unidades do tile)
+EXTENSAO = 4096
+MARGEM = 64
+
+# Campos do popup gravados nos tiles de pontos
+CAMPOS_PONTOS = ['CODIGO_SNISB', 'SITUACAO_CADASTRO_SNISB', 'SITUACAO_MASSA_DAGUA', 'SITUACAO_COMPARACAO_SIOUT']
+
+# Limites do Web Mercator (EPSG:3857)
+_RAIO_TERRA = 6378137.0
+_ORIGEM = math.pi * _RAIO_TERRA
+
+
+def pasta_versao(versao, raiz=PASTA_TILES):
+    """Pasta dos tiles de uma versão dos dados"""
+    return os.path.join(raiz, versao[:16])
+
+
+def disponiveis(versao, raiz=PASTA_TILES):
+    """Indica se os tiles da versão já foram gerados"""
+    return os.path.exists(os.path.join(pasta_versao(versao, raiz), "metadados.json"))
+
+
+def url(versao, camada):
+    """Modelo de URL ({z}/{x}/{y}) dos tiles de uma camada"""
+    return URL_TILES.replace("{versao}", versao[:16]).replace("{camada}", camada)
+
+
+def para_mercator(coordenadas):
+    """Converte um array (N, 2) de lon/lat em graus para metros Web Mercator"""
+    coordenadas = np.asarray(coordenadas, dtype=float)
+    x = np.radians(coordenadas[:, 0]) * _RAIO_TERRA
+    lat = np.clip(coordenadas[:, 1], -85.0511, 85.0511)
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * _RAIO_TERRA
+    return np.column_stack([x, y])
+
+
+def tamanho_tile(zoom):
+    """Lado do tile em metros Web Mercator"""
+    return 2 * _ORIGEM / (1 << zoom)
+
+
+def indices_tile(x, y, zoom):
+    """Índices (coluna, linha) XYZ dos tiles que contêm as coordenadas Mercator"""
+    tamanho = tamanho_tile(zoom)
+    limite = (1 << zoom) - 1
+    coluna = np.clip(np.floor((np.asarray(x) + _ORIGEM) / tamanho), 0, limite).astype(np.int64)
+    linha = np.clip(np.floor((_ORIGEM - np.asarray(y)) / tamanho), 0, limite).astype(np.int64)
+    return coluna, linha
+
+
+def limites_tile(zoom, coluna, linha, margem=0.0):
+    """Limites (minx, miny, maxx, maxy) do tile em metros, com margem opcional"""
+    tamanho = tamanho_tile(zoom)
+    minx = -_ORIGEM + coluna * tamanho
+    maxy = _ORIGEM - linha * tamanho
+    return (minx - margem, maxy - tamanho - margem, minx + tamanho + margem, maxy + margem)
+
+
+def _gravar_tile(destino, camada, zoom, coluna, linha, features, codificar):
+    if not features:
+        return 0
+    conteudo = codificar(
+        [{"name": camada, "features": features}],
+        default_options={"quantize_bounds": limites_tile(zoom, coluna, linha), "extents": EXTENSAO}
+    )
+    caminho = os.path.join(destino, camada, str(zoom), str(coluna), f"{linha}.pbf")
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return 1
+
+
+def _tiles_poligonos(armazem, destino, zoom_minimo, zoom_maximo, codificar):
+    """Recorta os polígonos válidos do armazém em tiles, simplificando pela resolução de cada zoom"""
+    ids = armazem.ids_validos(np.arange(len(armazem)))
+    if len(ids) == 0:
+        return 0
+    geoms = shapely.transform(armazem.geometrias(ids), para_mercator)
+    limites = shapely.bounds(geoms)
+    total = 0
+    for zoom in range(zoom_minimo, zoom_maximo + 1):
+        # Tolerância de ~1 unidade interna do tile
+        simplificadas = shapely.simplify(geoms, tamanho_tile(zoom) / EXTENSAO, preserve_topology=True)
+        col_min, lin_max = indices_tile(limites[:, 0], limites[:, 1], zoom)
+        col_max, lin_min = indices_tile(limites[:, 2], limites[:, 3], zoom)
+        por_tile = {}
+        for i in range(len(ids)):
+            for coluna in range(col_min[i], col_max[i] + 1):
+                for linha in range(lin_min[i], lin_max[i] + 1):
+                    por_tile.setdefault((coluna, linha), []).append(i)
+        margem = tamanho_tile(zoom) * MARGEM / EXTENSAO
+        for (coluna, linha), membros in por_tile.items():
+            recortes = shapely.clip_by_rect(simplificadas[membros], *limites_tile(zoom, coluna, linha, margem))
+            features = [
+                {"geometry": recorte, "properties": {"pid": int(ids[i])}}
+                for i, recorte in zip(membros, recortes)
+                if not recorte.is_empty
+            ]
+            total += _gravar_tile(destino, CAMADA_POLIGONOS, zoom, coluna, linha, features, codificar)
+    return total
+
+
+def _tiles_pontos(tabela, status, destino, zoom_minimo, zoom_maximo, codificar):
+    """Distribui os pontos das barragens em tiles, com status e campos do popup como propriedades"""
+    latitude = pd.to_numeric(tabela['LATITUDE'], errors='coerce').to_numpy()
+    longitude = pd.to_numeric(tabela['LONGITUDE'], errors='coerce').to_numpy()
+    validos = np.flatnonzero(
+        (latitude >= -34) & (latitude <= 6) & (longitude >= -74) & (longitude <= -28)
+    )
+    if len(validos) == 0:
+        return 0
+    xy = para_mercator(np.column_stack([longitude[validos], latitude[validos]]))
+    campos = {
+        coluna: tabela[coluna].astype(object).where(tabela[coluna].notna(), 'N/A').to_numpy()[validos]
+        for coluna in CAMPOS_PONTOS
+        if coluna in tabela.columns
+    }
+    total = 0
+    for zoom in range(zoom_minimo, zoom_maximo + 1):
+        colunas, linhas = indices_tile(xy[:, 0], xy[:, 1], zoom)
+        chaves = colunas * (1 << zoom) + linhas
+        ordem = np.argsort(chaves, kind='stable')
+        chaves_unicas, inicios = np.unique(chaves[ordem], return_index=True)
+        fins = np.append(inicios[1:], len(ordem))
+        for chave, inicio, fim in zip(chaves_unicas, inicios, fins):
+            coluna, linha = divmod(int(chave), 1 << zoom)
+            features = []
+            for i in ordem[inicio:fim]:
+                propriedades = {"pos": int(validos[i]), "status": int(status[validos[i]])}
+                propriedades.update({coluna_popup: str(valores[i]) for coluna_popup, valores in campos.items()})
+                features.append({"geometry": shapely.Point(xy[i]), "properties": propriedades})
+            total += _gravar_tile(destino, CAMADA_PONTOS, zoom, coluna, linha, features, codificar)
+    return total
+
+
+def gerar_tiles(base, raiz=PASTA_TILES, zoom_minimo=ZOOM_MINIMO, zoom_maximo=ZOOM_MAXIMO):
+    """Gera a pirâmide de tiles vetoriais da base e retorna a pasta gerada"""
+    try:
+        from mapbox_vector_tile import encode as codificar
+    except ImportError as erro:
+        raise RuntimeError("A geração de tiles requer o pacote 'mapbox-vector-tile' (pip install mapbox-vector-tile)") from erro
+
+    destino = pasta_versao(base.versao, raiz)
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    quantidade_poligonos = _tiles_poligonos(base.geometrias, temporario, zoom_minimo, zoom_maximo, codificar)
+    quantidade_pontos = 0
+    if 'LATITUDE' in base.tabela.columns and 'LONGITUDE' in base.tabela.columns:
+        quantidade_pontos = _tiles_pontos(base.tabela, base.status.ponto, temporario, zoom_minimo, zoom_maximo, codificar)
+
+    metadados = {
+        "versao": base.versao,
+        "zoom_minimo": zoom_minimo,
+        "zoom_maximo": zoom_maximo,
+        "camadas": {CAMADA_POLIGONOS: quantidade_poligonos, CAMADA_PONTOS: quantidade_pontos},
+        "total_poligonos": len(base.geometrias),
+        "total_pontos": len(base.tabela)
+    }
+    with open(os.path.join(temporario, "metadados.json"), "w", encoding="utf-8") as f:
+        json.dump(metadados, f, indent=2)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+
+    # Remover tiles de versões anteriores
+    for nome in os.listdir(raiz):
+        caminho = os.path.join(raiz, nome)
+        if os.path.isdir(caminho) and caminho != destino:
+            shutil.rmtree(caminho, ignore_errors=True)
+    return destino
+
+
+class _ManipuladorTiles(SimpleHTTPRequestHandler):
+    """Serve os arquivos .pbf com CORS liberado e o MIME de tiles vetoriais"""
+
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".pbf": "application/x-protobuf"}
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=86400")
+        super().end_headers()
+
+
+def servir(raiz=PASTA_TILES, porta=8765):
+    """Servidor HTTP local dos tiles (alternativa ao static serving do Streamlit)
+
+    Use com SIOUT_URL_TILES=http://localhost:<porta>/{versao}/{camada}/{z}/{x}/{y}.pbf
+    """
+    servidor = ThreadingHTTPServer(("", porta), partial(_ManipuladorTiles, directory=raiz))
+    print(f"Servindo tiles de {raiz} em http://localhost:{porta}/")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    from nucleo import dados
+
+    parser = argparse.ArgumentParser(description="Tiles vetoriais dos polígonos ANA e das barragens")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    parser_gerar = subcomandos.add_parser("gerar", help="gera a pirâmide de tiles da versão atual dos dados")
+    parser_gerar.add_argument("pasta", nargs="?", default=PASTA_APLICATIVO)
+    parser_gerar.add_argument("--zoom-minimo", type=int, default=ZOOM_MINIMO)
+    parser_gerar.add_argument("--zoom-maximo", type=int, default=ZOOM_MAXIMO)
+    parser_servir = subcomandos.add_parser("servir", help="serve os tiles gerados via HTTP")
+    parser_servir.add_argument("--porta", type=int, default=8765)
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "gerar":
+        pasta_gerada = gerar_tiles(dados.carregar(argumentos.pasta), zoom_minimo=argumentos.zoom_minimo, zoom_maximo=argumentos.zoom_maximo)
+        print(f"Tiles gerados em {pasta_gerada}")
+    else:
+        servir(porta=argumentos.porta)
@@ -0,0 +1,27 @@
+"""Fixtures dos testes: relatório sintético pequeno (benchmark.sintetico) e a base carregada dele."""
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmark import sintetico  # noqa: E402
+from nucleo import consulta  # noqa: E402
+
+# Barragens do relatório sintético dos testes (mais de uma página e vários grupos no mapa)
+LINHAS = 2000
+
+
+@pytest.fixture(scope="session")
+def pasta_dados(tmp_path_factory):
+    """Pasta com o relatório sintético e o extrato SIOUT (o snapshot é gerado na primeira carga)"""
+    return sintetico.garantir_dados(LINHAS, 0, pasta=str(tmp_path_factory.mktemp("dados")))
+
+
+@pytest.fixture(scope="session")
+def base(pasta_dados):
+    """Base em memória da versão vigente da pasta (compartilhada entre os testes, como no aplicativo)"""
+    return consulta.carregar(pasta_dados).base
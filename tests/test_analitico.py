@@ -0,0 +1,41 @@
+"""Motor analítico (DuckDB): filtros, contagens e arquivos exportados iguais aos do caminho em memória."""
+import io
+import zipfile
+
+import pytest
+
+from nucleo import analitico, dados, exportacao
+
+pytest.importorskip("duckdb")
+
+CASOS = 20
+
+# Metadados do XLSX com o horário da gravação
+MEMBROS_VARIAVEIS = {'docProps/core.xml'}
+
+
+def _conteudo(base, filtros, formato):
+    arquivo = base.exportar(filtros, None, formato)
+    with open(arquivo.caminho, 'rb') as aberto:
+        conteudo = aberto.read()
+    if formato != 'xlsx':
+        return conteudo
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+        return {nome: pacote.read(nome) for nome in pacote.namelist() if nome not in MEMBROS_VARIAVEIS}
+
+
+def test_verificar_equivalencia_sem_divergencias(base):
+    motor = analitico.MotorAnalitico.abrir(base.caminho_snapshot, base.geometrias)
+    assert analitico.verificar_equivalencia(base, motor, casos=CASOS) == []
+
+
+@pytest.mark.parametrize("formato", list(exportacao.FORMATOS))
+def test_exportacao_igual_com_e_sem_motor(pasta_dados, monkeypatch, formato):
+    em_memoria = dados.carregar(pasta_dados)
+    filtros = {'USO_SNISB': em_memoria.catalogo['USO_SNISB'].valores[:2]}
+    esperado = _conteudo(em_memoria, filtros, formato)
+
+    monkeypatch.setattr(analitico, "ATIVO", True)
+    com_motor = dados.carregar(pasta_dados)
+    assert com_motor.analitico is not None
+    assert _conteudo(com_motor, filtros, formato) == esperado
@@ -0,0 +1,113 @@
+"""Camada de interface (app.py) sob o AppTest do Streamlit: tabela, contador, filtros e paginação."""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmark import interface, sessoes
+from nucleo import consulta, paginacao
+
+from conftest import LINHAS
+
+CAMINHO_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Tempo máximo de um rerun no AppTest (segundos)
+TEMPO_LIMITE = 120
+
+# Multiplica os orçamentos de benchmark.interface (máquinas de CI mais lentas e compartilhadas)
+FATOR_ORCAMENTO = float(os.environ.get("SIOUT_FATOR_ORCAMENTO_TESTES", "3.0"))
+
+
+@pytest.fixture
+def app(pasta_dados, monkeypatch):
+    """Aplicativo já executado uma vez sobre os dados sintéticos"""
+    monkeypatch.setattr(consulta, "PASTA_DADOS", pasta_dados)
+    st.cache_resource.clear()
+    aplicativo = AppTest.from_file(CAMINHO_APP, default_timeout=TEMPO_LIMITE)
+    executar(aplicativo, "primeira_execucao")
+    return aplicativo
+
+
+def executar(aplicativo, interacao=None):
+    """Executa um rerun; com a interação, confere o tempo contra o orçamento de benchmark.interface"""
+    inicio = time.perf_counter()
+    aplicativo.run()
+    segundos = time.perf_counter() - inicio
+    assert not aplicativo.exception, aplicativo.exception[0].value if aplicativo.exception else None
+    assert not aplicativo.error, aplicativo.error[0].value if aplicativo.error else None
+    if interacao is not None:
+        limite = interface.orcamento(interacao, LINHAS, FATOR_ORCAMENTO)
+        assert segundos <= limite, f"rerun '{interacao}' levou {segundos:.2f} s (orçamento {limite:.2f} s)"
+
+
+def contador(aplicativo):
+    """Texto do contador de registros filtrados"""
+    return next(markdown.value for markdown in aplicativo.markdown if "Mostrando" in markdown.value)
+
+
+def test_primeira_execucao_mostra_tabela_completa(app, base):
+    total = len(base.tabela)
+    assert f"<strong>{total:,}</strong> registros de um total de <strong>{total:,}</strong>" in contador(app)
+
+    tabela = app.dataframe[0].value
+    np.testing.assert_array_equal(tabela.index, np.arange(paginacao.REGISTROS_POR_PAGINA))
+    assert tabela['CODIGO_SNISB'].astype(str).tolist() == (
+        base.tabela['CODIGO_SNISB'].iloc[:paginacao.REGISTROS_POR_PAGINA].astype(str).tolist()
+    )
+    assert app.session_state.especificacao_filtros == consulta.especificar(base, {coluna: [] for coluna in consulta.COLUNAS_FILTRO})
+
+
+def test_filtro_e_paginacao(app, base):
+    seletor = app.multiselect(key="filtro_uso_snisb")
+    valor = seletor.options[0]
+    seletor.select(valor)
+    executar(app, "filtro")
+
+    esperado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'USO_SNISB': [valor]}))
+    assert f"<strong>{esperado.total:,}</strong> registros" in contador(app)
+    por_pagina = paginacao.REGISTROS_POR_PAGINA
+    np.testing.assert_array_equal(app.dataframe[0].value.index, esperado.posicoes[:por_pagina])
+    assert (app.dataframe[0].value['USO_SNISB'] == valor).all()
+
+    app.button(key="next").click()
+    executar(app, "pagina")
+    assert app.session_state.pagina_atual == 2
+    np.testing.assert_array_equal(app.dataframe[0].value.index, esperado.posicoes[por_pagina:2 * por_pagina])
+
+    executar(app, "sem_mudancas")
+    assert app.session_state.pagina_atual == 2
+    np.testing.assert_array_equal(app.dataframe[0].value.index, esperado.posicoes[por_pagina:2 * por_pagina])
+
+    # Limpar o filtro volta à tabela completa (já em cache)
+    app.multiselect(key="filtro_uso_snisb").set_value([])
+    executar(app, "filtro_em_cache")
+    total = len(base.tabela)
+    assert f"<strong>{total:,}</strong> registros de um total" in contador(app)
+
+
+def test_sessao_guarda_apenas_estado_leve(app):
+    app.multiselect(key="filtro_uso_snisb").select(app.multiselect(key="filtro_uso_snisb").options[0])
+    executar(app)
+    app.button(key="next").click()
+    executar(app)
+
+    estado = {chave: app.session_state[chave] for chave in app.session_state}
+    assert isinstance(estado['especificacao_filtros'], consulta.EspecificacaoFiltros)
+    assert sessoes.valores_pesados(estado) == []
+
+
+def test_valores_pesados_detecta_dados_na_sessao(base):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros())
+    estado = {
+        'especificacao_filtros': resultado.especificacao,
+        'pagina_atual': 1,
+        'tabela': base.tabela.head(),
+        'posicoes': resultado.posicoes,
+        'resultado': resultado,
+        'selecoes': [pd.DataFrame()]
+    }
+    assert sessoes.valores_pesados(estado) == ['posicoes', 'resultado', 'selecoes', 'tabela']
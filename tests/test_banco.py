@@ -0,0 +1,97 @@
+"""Backend em banco: filtros, contagens, páginas (keyset e OFFSET) e área do mapa equivalentes à base em memória.
+
+Roda sempre em SQLite; a variante PostGIS roda com SIOUT_URL_BANCO_TESTES apontando para um
+PostgreSQL descartável (as tabelas publicadas são substituídas).
+"""
+import os
+
+import numpy as np
+import pytest
+
+from nucleo import consulta, mapa
+
+sa = pytest.importorskip("sqlalchemy")
+
+from nucleo import banco  # noqa: E402
+
+URL_POSTGRES = os.environ.get("SIOUT_URL_BANCO_TESTES")
+
+CASOS = 30
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def consulta_banco(request, base, tmp_path_factory):
+    """ConsultaSQL sobre a base de teste publicada no banco"""
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path_factory.mktemp('banco') / 'siout.db'}"
+    elif URL_POSTGRES:
+        url = URL_POSTGRES
+    else:
+        pytest.skip("SIOUT_URL_BANCO_TESTES não definida (PostgreSQL/PostGIS)")
+    engine = banco.criar_engine(url)
+    banco.publicar(base, engine)
+    yield banco.ConsultaSQL(engine)
+    engine.dispose()
+
+
+def test_verificar_equivalencia_sem_divergencias(base, consulta_banco):
+    assert banco.verificar_equivalencia(base, consulta_banco, casos=CASOS) == []
+
+
+def test_casos_aleatorios_pelo_fluxo_de_consulta(base, consulta_banco):
+    assert consulta.consultas_vigentes(base, consulta_banco) is consulta_banco
+    for filtros, intervalo_datas in banco.casos_aleatorios(base, CASOS, semente=1):
+        especificacao = consulta.EspecificacaoFiltros(filtros, intervalo_datas)
+        no_banco = consulta.aplicar_filtros(base, especificacao, consulta_banco)
+        em_memoria = consulta.aplicar_filtros(base, especificacao)
+        assert no_banco.consultas is consulta_banco
+        np.testing.assert_array_equal(no_banco.posicoes, em_memoria.posicoes)
+        assert consulta_banco.contar(filtros, intervalo_datas) == em_memoria.total
+
+        # Páginas em sequência (keyset a partir da anterior) e a última direto (OFFSET)
+        total_paginas = em_memoria.total_paginas()
+        for numero in sorted({1, 2, 3, total_paginas}):
+            if numero > total_paginas:
+                continue
+            np.testing.assert_array_equal(
+                consulta.paginar(no_banco, numero).dados.index, consulta.paginar(em_memoria, numero).dados.index
+            )
+
+
+def test_pagina_sem_limite_anterior_usa_offset(base, consulta_banco):
+    consulta_banco.pagina({}, None, 1)
+    sequencial = consulta_banco.pagina({}, None, 2).dados
+    # Limites descartados (ex.: saíram do cache): a mesma página vem por OFFSET
+    consulta_banco._limites_paginas.limpar()
+    direta = consulta_banco.pagina({}, None, 2).dados
+    assert direta.index.equals(sequencial.index)
+    em_memoria = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros())
+    np.testing.assert_array_equal(direta.index, consulta.paginar(em_memoria, 2).dados.index)
+
+
+def test_payload_do_mapa_igual_ao_da_memoria(base, consulta_banco):
+    validos = np.flatnonzero(base.grade.validos)
+    centro = validos[len(validos) // 2]
+    latitude, longitude = base.grade.latitude[centro], base.grade.longitude[centro]
+    limites = (latitude - 0.5, longitude - 0.5, latitude + 0.5, longitude + 0.5)
+    especificacao = consulta.EspecificacaoFiltros()
+
+    base.cache_mapa.limpar()
+    esperado = consulta.montar_payload_mapa(consulta.aplicar_filtros(base, especificacao), mapa.ZOOM_INICIAL + 3, limites)
+    base.cache_mapa.limpar()
+    obtido = consulta.montar_payload_mapa(
+        consulta.aplicar_filtros(base, especificacao, consulta_banco), mapa.ZOOM_INICIAL + 3, limites
+    )
+    base.cache_mapa.limpar()
+    assert esperado.total_pontos + esperado.total_grupos > 0
+    assert (obtido.poligonos, obtido.pontos, obtido.grupos) == (esperado.poligonos, esperado.pontos, esperado.grupos)
+
+
+def test_nova_publicacao_e_relida(base, consulta_banco, monkeypatch):
+    monkeypatch.setattr(banco, "INTERVALO_VERSAO_S", 0.0)
+    with consulta_banco.engine.begin() as conexao:
+        conexao.execute(sa.text(f"UPDATE {banco.TABELA_METADADOS} SET versao = 'outra'"))
+    assert consulta.consultas_vigentes(base, consulta_banco) is base
+    with consulta_banco.engine.begin() as conexao:
+        conexao.execute(sa.text(f"UPDATE {banco.TABELA_METADADOS} SET versao = :versao"), {"versao": base.versao})
+    assert consulta.consultas_vigentes(base, consulta_banco) is consulta_banco
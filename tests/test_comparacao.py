@@ -0,0 +1,127 @@
+"""Comparação SNISB × SIOUT: uma situação por caso de teste e bloqueio equivalente à comparação de todos os pares."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import sintetico
+from nucleo import comparacao, ingestao
+
+# Deslocamentos em graus de latitude (~111 km por grau)
+PERTO = 0.0009  # ~100 m, dentro de RAIO_METROS
+LONGE = 0.45  # ~50 km
+
+SELECIONADO = 'Selecionado para validação'
+DESCARTADO = 'Descartado por duplicidade'
+
+
+def _par(caso, campos_iguais, deslocamento, cadastro=SELECIONADO, latitude=None):
+    """Barragem SNISB e registro SIOUT de um caso; campos fora de campos_iguais divergem
+
+    Cada caso fica 1 grau ao norte do anterior e usa nomes, códigos e autorizações próprios,
+    para que os casos não sejam candidatos uns dos outros.
+    """
+    base_latitude = -27.0 - caso
+    snisb = {
+        'CODIGO_SNISB': f'S{caso}',
+        'SITUACAO_CADASTRO_SNISB': cadastro,
+        'EMPREENDEDOR_SNISB': f'Fazenda Caso {caso} Ltda',
+        'USO_SNISB': 'Irrigação',
+        'CODIGO_BARRAGEM_ENTIDADE': f'{caso}01',
+        'AUTORIZACAO_NUM': f'{caso}/2020',
+        'LATITUDE': base_latitude if latitude is None else latitude,
+        'LONGITUDE': -53.0
+    }
+    divergentes = {
+        'empreendedor': f'Agropecuaria Outra {caso}',
+        'uso': 'Paisagismo',
+        'codigo': f'{caso}99',
+        'autorizacao': f'{caso}9/2011'
+    }
+    iguais = {
+        'empreendedor': f'FAZENDA CASO {caso}',
+        'uso': 'IRRIGACAO',
+        'codigo': f'00{caso}01',
+        'autorizacao': f'{caso}/20'
+    }
+    valores = {campo: (iguais if campo in campos_iguais else divergentes)[campo] for campo in divergentes}
+    siout = {
+        'ID_SIOUT': caso,
+        'CODIGO_SIOUT': valores['codigo'],
+        'AUTORIZACAO_SIOUT': valores['autorizacao'],
+        'USO_SIOUT': valores['uso'],
+        'EMPREENDEDOR_SIOUT': valores['empreendedor'],
+        'LATITUDE': base_latitude + deslocamento,
+        'LONGITUDE': -53.0
+    }
+    return snisb, siout
+
+
+TODOS = ('empreendedor', 'uso', 'codigo', 'autorizacao')
+
+# (descrição, campos iguais, deslocamento do SIOUT, cadastro, latitude da barragem, situação esperada, com SIOUT escolhido)
+CASOS = [
+    ("todos os campos, perto", TODOS, PERTO, SELECIONADO, None, comparacao.SITUACAO_TOTAL, True),
+    ("todos os campos, longe (bloqueio por código)", TODOS, LONGE, SELECIONADO, None, comparacao.SITUACAO_TOTAL, True),
+    ("uso igual, perto", ('uso',), PERTO, SELECIONADO, None, comparacao.SITUACAO_PARCIAL, True),
+    ("código e autorização iguais, perto", ('codigo', 'autorizacao'), PERTO, SELECIONADO, None, comparacao.SITUACAO_PARCIAL, True),
+    # Sem proximidade, campos compatíveis não bastam para "parcialmente"
+    ("código igual, longe", ('codigo',), LONGE, SELECIONADO, None, comparacao.SITUACAO_INCOMPATIVEL, True),
+    ("nenhum campo, perto", (), PERTO, SELECIONADO, None, comparacao.SITUACAO_GEOGRAFICA, True),
+    ("nenhum campo, longe", (), LONGE, SELECIONADO, None, comparacao.SITUACAO_INCOMPATIVEL, False),
+    ("descartada no cadastro", TODOS, PERTO, DESCARTADO, None, comparacao.SITUACAO_NAO_APLICADO, False),
+    ("sem coordenadas e sem candidato", (), PERTO, SELECIONADO, np.nan, comparacao.SITUACAO_NAO_APLICADO, False)
+]
+
+
+@pytest.fixture(scope="module")
+def comparados():
+    pares = [_par(caso, iguais, deslocamento, cadastro, latitude) for caso, (_, iguais, deslocamento, cadastro, latitude, _, _) in enumerate(CASOS)]
+    df_snisb = pd.DataFrame([snisb for snisb, _ in pares])
+    df_siout = pd.DataFrame([siout for _, siout in pares])
+    resultado, _ = comparacao.comparar(df_snisb, df_siout, usar_poligonos=False, trabalhadores=1)
+    return resultado
+
+
+@pytest.mark.parametrize("caso", range(len(CASOS)), ids=[descricao for descricao, *_ in CASOS])
+def test_situacao_por_caso(comparados, caso):
+    _, iguais, _, _, _, situacao, escolhido = CASOS[caso]
+    linha = comparados.iloc[caso]
+    assert linha[comparacao.COLUNA_SITUACAO] == situacao
+    if escolhido:
+        assert linha['ID_SIOUT'] == caso
+        for campo in TODOS:
+            esperado = comparacao.CAMPO_COMPATIVEL if campo in iguais else comparacao.CAMPO_DIVERGENTE
+            assert linha[f'COMPARACAO_{campo.upper()}'] == esperado
+    else:
+        assert linha['ID_SIOUT'] is None
+
+
+def test_normalizacao_dos_campos():
+    assert comparacao.normalizar_autorizacao('Port. 0123-19') == '123/2019'
+    assert comparacao.normalizar_codigo('00123.0') == '123'
+    assert comparacao.normalizar_uso('Irrigação ') == 'IRRIGACAO'
+    assert comparacao.normalizar_nome('Fazenda da Serra LTDA') == 'FAZENDA SERRA'
+
+
+def _todos_os_pares(df_snisb, extrato, raio_metros=comparacao.RAIO_METROS, usar_poligonos=True):
+    """Candidatos sem bloqueio: todos os pares, próximos pela distância exata"""
+    latitude, longitude = comparacao._coordenadas(df_snisb)
+    snisb, siout = np.divmod(np.arange(len(df_snisb) * len(extrato), dtype=np.int64), len(extrato))
+    distancia = comparacao.distancia_metros(latitude[snisb], longitude[snisb], extrato.latitude[siout], extrato.longitude[siout])
+    return snisb, siout, distancia <= raio_metros
+
+
+def test_bloqueio_equivale_a_todos_os_pares(pasta_dados, monkeypatch):
+    df_snisb = ingestao.ler_fonte(ingestao.localizar_fonte(pasta_dados)).iloc[:300].reset_index(drop=True)
+    df_siout = pd.read_csv(f"{pasta_dados}/{sintetico.NOME_EXTRATO_SIOUT}", dtype=str, encoding='utf-8-sig')
+
+    bloqueado, _ = comparacao.comparar(df_snisb, df_siout, usar_poligonos=False, trabalhadores=1)
+    monkeypatch.setattr(comparacao, "candidatos", _todos_os_pares)
+    referencia, _ = comparacao.comparar(df_snisb, df_siout, usar_poligonos=False, trabalhadores=1)
+
+    situacoes = bloqueado[comparacao.COLUNA_SITUACAO]
+    pd.testing.assert_series_equal(situacoes, referencia[comparacao.COLUNA_SITUACAO])
+    assert situacoes.nunique() > 2
+    # Fora de "Incompatível" (qualquer par distante empata), o registro escolhido também é o mesmo
+    compativeis = ~situacoes.isin([comparacao.SITUACAO_INCOMPATIVEL, comparacao.SITUACAO_NAO_APLICADO])
+    assert bloqueado.loc[compativeis, 'ID_SIOUT'].tolist() == referencia.loc[compativeis, 'ID_SIOUT'].tolist()
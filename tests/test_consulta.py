@@ -0,0 +1,156 @@
+"""Fluxo de consulta sem interface: filtros, páginas, exportações e payload do mapa conferidos contra o pandas."""
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nucleo import consulta, exportacao, mapa, paginacao
+
+
+def _ler_exportacao(resultado, formato):
+    _, conteudo = consulta.ler_exportacao(resultado, formato)
+    if formato == 'csv':
+        return pd.read_csv(io.BytesIO(conteudo), sep=';', encoding='utf-8-sig', dtype=str)
+    if formato == 'xlsx':
+        return pd.read_excel(io.BytesIO(conteudo), dtype=str)
+    if formato == 'parquet':
+        return pd.read_parquet(io.BytesIO(conteudo))
+    if formato == 'json':
+        return pd.DataFrame(json.loads(conteudo))
+    return pd.read_json(io.BytesIO(conteudo), lines=True, dtype=False) if conteudo else pd.DataFrame()
+
+
+def test_filtro_por_coluna_equivale_a_mascara(base):
+    valores = base.catalogo['USO_SNISB'].valores[:2]
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'USO_SNISB': valores}))
+
+    esperadas = np.flatnonzero(base.tabela['USO_SNISB'].isin(valores).to_numpy())
+    assert resultado.total > 0
+    np.testing.assert_array_equal(resultado.posicoes, esperadas)
+    # Compartilhado entre sessões: somente leitura
+    assert not resultado.posicoes.flags.writeable
+
+
+def test_filtros_combinados_e_periodo(base):
+    tabela = base.tabela
+    inicio, fim = consulta.limites_datas(base)
+    meio = inicio + (fim - inicio) / 2
+    selecoes = {
+        'SITUACAO_MASSA_DAGUA': base.catalogo['SITUACAO_MASSA_DAGUA'].valores[:2],
+        'USO_SNISB': base.catalogo['USO_SNISB'].valores[:3],
+        'COLUNA_INEXISTENTE': ['x']
+    }
+    especificacao = consulta.especificar(base, selecoes, (inicio, meio))
+    assert 'COLUNA_INEXISTENTE' not in especificacao.filtros
+    assert especificacao.intervalo_datas is not None
+
+    resultado = consulta.aplicar_filtros(base, especificacao)
+    datas = tabela[consulta.COLUNA_DATA]
+    mascara = (
+        tabela['SITUACAO_MASSA_DAGUA'].isin(selecoes['SITUACAO_MASSA_DAGUA'])
+        & tabela['USO_SNISB'].isin(selecoes['USO_SNISB'])
+        & datas.between(pd.Timestamp(inicio), pd.Timestamp(meio))
+    )
+    np.testing.assert_array_equal(resultado.posicoes, np.flatnonzero(mascara.to_numpy()))
+
+
+def test_periodo_completo_nao_filtra(base):
+    especificacao = consulta.especificar(base, {}, consulta.limites_datas(base))
+    assert especificacao.intervalo_datas is None
+    assert especificacao.ativos == []
+    assert consulta.aplicar_filtros(base, especificacao).total == len(base.tabela)
+
+
+def test_paginas_recortam_o_resultado(base):
+    valores = base.catalogo['USO_SNISB'].valores[:1]
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'USO_SNISB': valores}))
+    por_pagina = paginacao.REGISTROS_POR_PAGINA
+    total_paginas = resultado.total_paginas()
+    assert total_paginas == -(-resultado.total // por_pagina)
+
+    primeira = consulta.paginar(resultado, 1)
+    np.testing.assert_array_equal(primeira.dados.index, resultado.posicoes[:por_pagina])
+    assert (primeira.dados['USO_SNISB'] == valores[0]).all()
+
+    ultima = consulta.paginar(resultado, total_paginas)
+    np.testing.assert_array_equal(ultima.dados.index, resultado.posicoes[(total_paginas - 1) * por_pagina:])
+    # Número acima do total é limitado à última página
+    np.testing.assert_array_equal(consulta.paginar(resultado, total_paginas + 10).dados.index, ultima.dados.index)
+
+    # Estilos alinhados às linhas e às colunas de situação da página
+    assert primeira.estilos.index.equals(primeira.dados.index)
+    assert list(primeira.estilos.columns) == primeira.colunas_estilo
+
+
+def test_resultado_vazio(base):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'CODIGO_SNISB': ['inexistente']}))
+    assert resultado.total == 0
+    assert resultado.total_paginas() == 1
+    assert consulta.paginar(resultado, 1).dados.empty
+    assert mapa.montar_mapa(resultado) is None
+
+
+@pytest.mark.parametrize("formato", ['csv', 'xlsx', 'json', 'jsonl', 'parquet'])
+def test_exportacao_contem_linhas_filtradas(base, formato):
+    valores = base.catalogo['USO_SNISB'].valores[:1]
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'USO_SNISB': valores}))
+
+    exportadas = _ler_exportacao(resultado, formato)
+    assert len(exportadas) == resultado.total
+    esperados = base.tabela['CODIGO_SNISB'].iloc[resultado.posicoes]
+    assert exportadas['CODIGO_SNISB'].astype(str).tolist() == esperados.astype(str).tolist()
+    assert (exportadas['USO_SNISB'] == valores[0]).all()
+    # A coluna de ids volta a ser o WKT dos polígonos
+    assert 'POLIGONO_ANA' in exportadas.columns
+
+
+@pytest.mark.parametrize("formato", ['csv', 'xlsx', 'parquet'])
+def test_exportacao_vazia_mantem_cabecalho(base, formato):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'CODIGO_SNISB': ['inexistente']}))
+    exportadas = _ler_exportacao(resultado, formato)
+    assert exportadas.empty
+    assert {'CODIGO_SNISB', 'USO_SNISB', 'POLIGONO_ANA'} <= set(exportadas.columns)
+
+
+def test_exportacao_sem_poligonos(base):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros())
+    _, conteudo = consulta.ler_exportacao(resultado, 'csv', exportacao.POLIGONOS_OMITIDOS)
+    cabecalho = conteudo.decode('utf-8-sig').split('\n', 1)[0].strip().split(';')
+    assert 'POLIGONO_ANA' not in cabecalho
+    assert 'CODIGO_SNISB' in cabecalho
+
+
+def test_leitura_da_exportacao_fecha_o_arquivo(base):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros())
+    consulta.ler_exportacao(resultado, 'csv')
+    descritores = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    arquivo, conteudo = consulta.ler_exportacao(resultado, 'csv')
+    assert len(conteudo) == arquivo.nbytes
+    if descritores is not None:
+        assert len(os.listdir('/proc/self/fd')) == descritores
+
+
+def test_exportacao_removida_sempre_desiste(base, monkeypatch):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros({'CODIGO_SNISB': ['inexistente']}))
+    chamadas = []
+    monkeypatch.setattr(exportacao.ArquivoExportado, "abrir", lambda arquivo: chamadas.append(arquivo))
+    with pytest.raises(RuntimeError):
+        consulta.abrir_exportacao(resultado, 'csv')
+    assert len(chamadas) == consulta.TENTATIVAS_EXPORTACAO
+
+
+def test_payload_mapa_cobre_os_pontos_validos(base):
+    resultado = consulta.aplicar_filtros(base, consulta.EspecificacaoFiltros())
+    validas = consulta.posicoes_mapa(resultado)
+    assert 0 < len(validas) <= resultado.total
+
+    payload_mapa = consulta.montar_payload_mapa(resultado, mapa.ZOOM_INICIAL)
+    agrupamento = base.agrupar({}, None, mapa.ZOOM_INICIAL)
+    # Cada ponto válido aparece uma única vez: isolado ou dentro de um grupo
+    assert int(agrupamento.total.sum()) + len(agrupamento.individuais) == len(validas)
+    assert payload_mapa.total_pontos == len(agrupamento.individuais)
+    assert payload_mapa.total_grupos == len(agrupamento.total)
+    assert json.loads(payload_mapa.poligonos)["type"] == "FeatureCollection"
@@ -0,0 +1,50 @@
+"""Instrumentação dos reruns: uso dos caches por sessão e eventos de fragmentos interrompidos."""
+import threading
+
+import pytest
+
+from nucleo import instrumentacao
+from nucleo.cache import CacheLRU
+
+
+def test_caches_contam_apenas_a_thread_do_rerun():
+    cache = CacheLRU()
+    medicao = instrumentacao.MedicaoRerun("sessao", {"posicoes": cache})
+    cache.obter("a", lambda: 1)
+    cache.obter("a", lambda: 1)
+
+    # Outra sessão (outra thread) usando o mesmo cache no meio do rerun
+    def outra_sessao():
+        for _ in range(5):
+            cache.obter("a", lambda: 1)
+        cache.ler("b")
+
+    thread = threading.Thread(target=outra_sessao)
+    thread.start()
+    thread.join()
+
+    evento = medicao.concluir()
+    assert evento["caches"]["posicoes"] == {"acertos": 1, "falhas": 1, "taxa_acerto": 0.5}
+    assert (cache.acertos, cache.falhas) == (6, 2)
+
+
+def test_fragmento_interrompido_emite_evento(monkeypatch):
+    eventos = []
+    monkeypatch.setattr(instrumentacao, "emitir", eventos.append)
+    medicao_script = instrumentacao.MedicaoRerun("sessao")
+    medicao_script.concluir()
+    eventos.clear()
+
+    with pytest.raises(RuntimeError):
+        with instrumentacao.medicao_fragmento(medicao_script, "mapa") as medicao:
+            with medicao.etapa("payload_mapa"):
+                raise RuntimeError("falha no fragmento")
+
+    assert len(eventos) == 1
+    assert eventos[0]["fragmento"] == "mapa"
+    assert eventos[0]["interrompido"] is True
+    assert "payload_mapa" in eventos[0]["etapas"]
+
+    with instrumentacao.medicao_fragmento(medicao_script, "tabela"):
+        pass
+    assert eventos[-1]["interrompido"] is False
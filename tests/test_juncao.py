@@ -0,0 +1,107 @@
+"""Junção ponto-em-polígono: situação da massa d'água por barragem e execução incremental."""
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from nucleo import geometria, ingestao, juncao
+
+# Camada de teste: dois quadrados disjuntos e um menor dentro do primeiro
+CAMADA = [shapely.box(0, 0, 1, 1), shapely.box(0.2, 0.2, 0.4, 0.4), shapely.box(2, 0, 3, 1)]
+
+
+@pytest.fixture
+def indice():
+    return juncao.IndicePoligonos(CAMADA)
+
+
+def _barragens(linhas):
+    """DataFrame de barragens a partir de (código, cadastro, situação de origem, latitude, longitude)"""
+    return pd.DataFrame(linhas, columns=['CODIGO_SNISB', juncao.COLUNA_CADASTRO, juncao.COLUNA_SITUACAO, 'LATITUDE', 'LONGITUDE'])
+
+
+BARRAGENS = [
+    ('dentro', 'Selecionado para validação', None, 0.8, 0.8),
+    ('aninhada', 'Selecionado para validação', None, 0.3, 0.3),
+    ('segundo', 'Selecionado para validação', None, 0.5, 2.5),
+    ('fora', 'Selecionado para validação', None, 5.0, 5.0),
+    ('satelite', 'Selecionado para validação', juncao.SITUACAO_INDICIO_SATELITE, 5.0, 6.0),
+    ('duplicidade', 'Descartado por duplicidade', None, 0.8, 0.8),
+    ('hierarquia', 'Descartado por hierarquia', juncao.SITUACAO_INDICIO_SATELITE, 5.0, 5.0),
+    ('sem_coordenadas', 'Selecionado para validação', None, np.nan, np.nan)
+]
+
+# (código, situação esperada, índice do polígono na camada ou None)
+ESPERADO = [
+    ('dentro', juncao.SITUACAO_COMPATIVEL, 0),
+    ('aninhada', juncao.SITUACAO_COMPATIVEL, 1),
+    ('segundo', juncao.SITUACAO_COMPATIVEL, 2),
+    ('fora', juncao.SITUACAO_SEM_POLIGONO, None),
+    ('satelite', juncao.SITUACAO_INDICIO_SATELITE, None),
+    ('duplicidade', juncao.SITUACAO_NAO_APLICADO, None),
+    ('hierarquia', juncao.SITUACAO_NAO_APLICADO, None),
+    ('sem_coordenadas', juncao.SITUACAO_NAO_APLICADO, None)
+]
+
+
+@pytest.mark.parametrize("codigo,situacao,poligono", ESPERADO)
+def test_situacao_por_barragem(indice, codigo, situacao, poligono):
+    resultado, _ = juncao.juntar(_barragens(BARRAGENS), indice)
+    linha = resultado.set_index('CODIGO_SNISB').loc[codigo]
+    assert linha[juncao.COLUNA_SITUACAO] == situacao
+    if poligono is None:
+        assert pd.isna(linha[geometria.COLUNA_GEOMETRIA])
+    else:
+        # Ponto contido em mais de um polígono: vale o de menor área
+        assert linha[geometria.COLUNA_GEOMETRIA] == indice.wkts[poligono]
+
+
+def test_estatisticas(indice):
+    _, estatisticas = juncao.juntar(_barragens(BARRAGENS), indice)
+    assert estatisticas == {
+        "total": 8,
+        "consultadas": 6,
+        "reaproveitadas": 0,
+        "com_poligono": 3,
+        "sem_poligono": 1,
+        "nao_aplicado": 3
+    }
+
+
+def test_incremental_reaproveita_e_equivale_a_completa(indice):
+    anterior, _ = juncao.juntar(_barragens(BARRAGENS), indice)
+    alteradas = list(BARRAGENS)
+    # Barragem movida para dentro do segundo polígono, outra passou a ser descartada e uma nova
+    alteradas[3] = ('fora', 'Selecionado para validação', None, 0.5, 2.2)
+    alteradas[0] = ('dentro', 'Descartado por duplicidade', None, 0.8, 0.8)
+    alteradas.append(('nova', 'Selecionado para validação', None, 0.9, 0.1))
+    df = _barragens(alteradas)
+
+    incremental, estatisticas = juncao.juntar(df, indice, anterior)
+    completa, _ = juncao.juntar(df, indice)
+    pd.testing.assert_frame_equal(incremental, completa)
+    # Mesmo código e coordenadas: reaproveitadas (inclusive a descartada, que volta a "Não aplicado")
+    assert estatisticas["reaproveitadas"] == len(BARRAGENS) - 1
+    assert incremental.set_index('CODIGO_SNISB').loc['fora', juncao.COLUNA_SITUACAO] == juncao.SITUACAO_COMPATIVEL
+    assert incremental.set_index('CODIGO_SNISB').loc['dentro', juncao.COLUNA_SITUACAO] == juncao.SITUACAO_NAO_APLICADO
+
+
+def test_incremental_na_fonte_sintetica(pasta_dados):
+    fonte = ingestao.ler_fonte(ingestao.localizar_fonte(pasta_dados))
+    indice_fonte = juncao.IndicePoligonos(*juncao.camada_da_fonte(fonte))
+    anterior, _ = juncao.juntar(fonte, indice_fonte)
+
+    alterada = fonte.copy()
+    movidas = np.arange(0, len(fonte), 100)
+    alterada.loc[movidas, 'LATITUDE'] = alterada.loc[movidas[::-1], 'LATITUDE'].to_numpy()
+    alterada.loc[movidas, 'LONGITUDE'] = alterada.loc[movidas[::-1], 'LONGITUDE'].to_numpy()
+
+    incremental, estatisticas = juncao.juntar(alterada, indice_fonte, anterior)
+    completa, _ = juncao.juntar(alterada, indice_fonte)
+    pd.testing.assert_frame_equal(incremental, completa)
+    assert estatisticas["reaproveitadas"] >= len(fonte) - len(movidas)
+    # Descartadas no cadastro nunca recebem polígono
+    descartadas = juncao.descartados(alterada)
+    assert descartadas.any()
+    assert (completa.loc[descartadas, juncao.COLUNA_SITUACAO] == juncao.SITUACAO_NAO_APLICADO).all()
+    assert completa.loc[descartadas, geometria.COLUNA_GEOMETRIA].isna().all()
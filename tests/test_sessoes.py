@@ -0,0 +1,16 @@
+"""Memória do processo com várias sessões sobre a mesma base (benchmark.sessoes) nos dados sintéticos dos testes."""
+from benchmark import sessoes
+
+from conftest import LINHAS
+
+SESSOES = [1, 10, 50]
+ESTADOS = 4
+
+
+def test_rss_nao_cresce_com_as_sessoes(pasta_dados):
+    medidas, bytes_tabela = sessoes.medir(LINHAS, SESSOES, ESTADOS, 0, pasta=pasta_dados)
+    assert [medida["sessoes"] for medida in medidas] == SESSOES
+    crescimento, dentro = sessoes.verificar(medidas)
+    assert dentro, f"RSS cresceu {crescimento:.1f} MB de {SESSOES[0]} para {SESSOES[-1]} sessões: {medidas}"
+    # Estado por sessão: especificação dos filtros e escalares, nunca uma cópia da tabela
+    assert all(medida["bytes_por_sessao"] < bytes_tabela / 100 for medida in medidas)